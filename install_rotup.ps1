@@ -53,14 +53,16 @@ $INSTALL_DIR = "C:\Program Files\ROTUP"
 Write-Host "📁 Creating installation directory: $INSTALL_DIR" -ForegroundColor Yellow
 New-Item -ItemType Directory -Force -Path $INSTALL_DIR | Out-Null
 
-# Download rotup.py
+# Download ROTUP files (entry point, backup core, GUI)
 Write-Host "⬇️  Downloading ROTUP..." -ForegroundColor Yellow
-$rotupUrl = "https://raw.githubusercontent.com/bejusxd/Rotup/main/rotup.py"
+$rotupBaseUrl = "https://raw.githubusercontent.com/bejusxd/Rotup/main"
 $rotupPath = Join-Path $INSTALL_DIR "rotup.py"
 
 try {
-    Invoke-WebRequest -Uri $rotupUrl -OutFile $rotupPath -UseBasicParsing
-    Write-Host "✅ Downloaded rotup.py" -ForegroundColor Green
+    foreach ($file in @("rotup.py", "rotup_core.py", "rotup_archive.py", "rotup_journal.py", "rotup_repository.py", "rotup_backup.py", "rotup_preflight.py", "rotup_logic.py", "rotup_service.py", "rotup_bench.py", "rotup_gui.py")) {
+        Invoke-WebRequest -Uri "$rotupBaseUrl/$file" -OutFile (Join-Path $INSTALL_DIR $file) -UseBasicParsing
+        Write-Host "✅ Downloaded $file" -ForegroundColor Green
+    }
 } catch {
     Write-Host "❌ Error downloading file: $_" -ForegroundColor Red
     Write-Host "Please check your internet connection or the repository URL" -ForegroundColor Yellow
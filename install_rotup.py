@@ -56,6 +56,7 @@ def build_exe():
         "--add-data=config.json;." if os.path.exists("config.json") else "",
         "--hidden-import=tkinter",
         "--hidden-import=psutil",
+        "--hidden-import=rotup_gui",  # Imported only when the GUI starts
         "--clean",  # Clean cache
         "rotup.py"
     ]
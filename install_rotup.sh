@@ -34,19 +34,19 @@ echo "📦 Installing dependencies..."
 case $DISTRO in
     ubuntu|debian|linuxmint|pop)
         apt-get update
-        apt-get install -y python3 python3-pip python3-tk zip ntfs-3g curl wget
+        apt-get install -y python3 python3-pip python3-tk ntfs-3g curl wget
         ;;
     fedora|rhel|centos)
-        dnf install -y python3 python3-pip python3-tkinter zip ntfs-3g curl wget
+        dnf install -y python3 python3-pip python3-tkinter ntfs-3g curl wget
         ;;
     arch|manjaro)
-        pacman -Sy --noconfirm python python-pip tk zip ntfs-3g curl wget
+        pacman -Sy --noconfirm python python-pip tk ntfs-3g curl wget
         ;;
     *)
         echo "⚠️  Unknown distribution, attempting universal install..."
-        apt-get install -y python3 python3-pip python3-tk zip ntfs-3g curl wget || \
-        dnf install -y python3 python3-pip python3-tkinter zip ntfs-3g curl wget || \
-        pacman -Sy --noconfirm python python-pip tk zip ntfs-3g curl wget
+        apt-get install -y python3 python3-pip python3-tk ntfs-3g curl wget || \
+        dnf install -y python3 python3-pip python3-tkinter ntfs-3g curl wget || \
+        pacman -Sy --noconfirm python python-pip tk ntfs-3g curl wget
         ;;
 esac
 
@@ -59,16 +59,18 @@ INSTALL_DIR="/opt/rotup"
 echo "📁 Creating installation directory: $INSTALL_DIR"
 mkdir -p "$INSTALL_DIR"
 
-# Download rotup.py file
+# Download ROTUP files (entry point, backup core, GUI)
 echo "⬇️  Downloading ROTUP..."
-if command -v curl &> /dev/null; then
-    curl -sSL https://raw.githubusercontent.com/bejusxd/Rotup/main/rotup.py -o "$INSTALL_DIR/rotup.py"
-elif command -v wget &> /dev/null; then
-    wget -q https://raw.githubusercontent.com/bejusxd/Rotup/main/rotup.py -O "$INSTALL_DIR/rotup.py"
-else
-    echo "❌ Error: Neither curl nor wget found. Install one of them."
-    exit 1
-fi
+for FILE in rotup.py rotup_core.py rotup_archive.py rotup_journal.py rotup_repository.py rotup_backup.py rotup_preflight.py rotup_logic.py rotup_service.py rotup_bench.py rotup_gui.py; do
+    if command -v curl &> /dev/null; then
+        curl -sSL "https://raw.githubusercontent.com/bejusxd/Rotup/main/$FILE" -o "$INSTALL_DIR/$FILE"
+    elif command -v wget &> /dev/null; then
+        wget -q "https://raw.githubusercontent.com/bejusxd/Rotup/main/$FILE" -O "$INSTALL_DIR/$FILE"
+    else
+        echo "❌ Error: Neither curl nor wget found. Install one of them."
+        exit 1
+    fi
+done
 
 # Grant execution permissions
 chmod +x "$INSTALL_DIR/rotup.py"
@@ -0,0 +1,1421 @@
+import platform
+import json
+import os
+import datetime
+import threading
+import stat
+import zipfile
+import zlib
+import collections
+import hashlib
+import gzip
+import random
+import itertools
+import time
+import concurrent.futures
+import queue
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+try:
+    import lzma
+except ImportError:
+    lzma = None
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+import rotup_core as core
+from rotup_core import (add_progress, BackupCancelled, BASE_DIR, cache_get, cache_put, CANCEL_EVENT,
+                        check_cancelled, CONFIG, flush_log, log_message, set_progress_phase,
+                        update_config_file)
+
+# --- SOURCE SCAN ---
+
+SCAN_CACHE_FILE = "scan_cache.json.gz"
+SCAN_CACHE_VERSION = 2
+DEFAULT_SCAN_WORKERS = 8  # Directory reads wait on I/O (network shares) - more threads than CPUs help
+SCAN_RACY_WINDOW_NS = 2 * 10**9  # Directories changed this recently are not trusted next time (mtime granularity)
+
+
+def get_scan_cache_path():
+    """Scan cache lives next to config.json (scan_cache_file to change)"""
+    return CONFIG.get('scan_cache_file', os.path.join(BASE_DIR, SCAN_CACHE_FILE))
+
+
+def get_scan_workers():
+    """Returns number of directory scanning threads from config"""
+    workers = CONFIG.get('scan_workers', DEFAULT_SCAN_WORKERS)
+    try:
+        workers = int(workers)
+    except (TypeError, ValueError):
+        log_message(f"Invalid scan_workers '{workers}', using {DEFAULT_SCAN_WORKERS}", "WARN")
+        workers = DEFAULT_SCAN_WORKERS
+    return max(1, workers)
+
+
+def load_scan_cache():
+    """Per-directory results of the previous scan: {dir: [mtime_ns, inode, [[name, size, mtime_ns]...], [subdir names]]}"""
+    path = get_scan_cache_path()
+    dirs = cache_get('scan', path)
+    if dirs is not None:
+        return dirs
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"[DEBUG] Cannot read scan cache {path}: {e}")
+        return {}
+    if data.get('version') != SCAN_CACHE_VERSION:
+        return {}
+    dirs = data.get('dirs', {})
+    cache_put('scan', path, dirs)
+    return dirs
+
+
+def save_scan_cache(dirs):
+    """Atomically writes scan cache, failures only cost a full scan next time"""
+    path = get_scan_cache_path()
+    tmp_path = path + ".tmp"
+    try:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+            json.dump({'version': SCAN_CACHE_VERSION, 'dirs': dirs}, f, separators=(',', ':'), ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[DEBUG] Cannot write scan cache {path}: {e}")
+        return
+    cache_put('scan', path, dirs)
+
+
+def scan_directory(path, cached, now_ns):
+    """Lists one directory (worker thread), returns (cache entry, True when taken from cache)"""
+    st = os.stat(path)
+    # Unchanged mtime: no entry was added, removed or renamed - reuse the listing
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_ino:
+        add_progress(files=len(cached[2]))
+        return cached, True
+    files = []
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                # Symlinked directories are not followed (like iter_source_entries)
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.name)
+                    continue
+                # DirEntry caches the result (and gets it from readdir on Windows)
+                entry_st = entry.stat()
+            except OSError:
+                continue
+            if stat.S_ISREG(entry_st.st_mode):
+                files.append([entry.name, entry_st.st_size, entry_st.st_mtime_ns])
+    add_progress(files=len(files))
+    mtime = st.st_mtime_ns if now_ns - st.st_mtime_ns > SCAN_RACY_WINDOW_NS else None
+    return [mtime, st.st_ino, files, subdirs], False
+
+
+def scan_sources(source_dirs, use_cache=True):
+    """Scans source directories on a thread pool, returns ({dir: cache entry}, cached dir count)"""
+    previous = load_scan_cache() if use_cache else {}
+    scan = {}
+    hits = 0
+    now_ns = time.time_ns()
+    finished = queue.SimpleQueue()  # (path, future) of completed directories
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=get_scan_workers(),
+                                               thread_name_prefix="rotup-scan") as pool:
+        def submit(path):
+            future = pool.submit(scan_directory, path, previous.get(path), now_ns)
+            future.add_done_callback(lambda done, path=path: finished.put((path, done)))
+
+        pending = 0
+        for source in source_dirs:
+            if os.path.isdir(source):
+                submit(source)
+                pending += 1
+        while pending:
+            path, future = finished.get()
+            pending -= 1
+            try:
+                entry, cached = future.result()
+            except OSError:
+                continue  # Archive run reports unreadable directories
+            scan[path] = entry
+            hits += cached
+            for name in entry[3]:
+                submit(os.path.join(path, name))
+                pending += 1
+    # Only directories seen now are kept - removed ones drop out of the cache
+    if use_cache and (hits < len(scan) or len(scan) != len(previous)):
+        save_scan_cache(scan)
+    return scan, hits
+
+
+def iter_scanned_files(scan):
+    """Yields (path, size) of every regular file in a scan_sources() result"""
+    for dirpath, entry in scan.items():
+        for name, size, mtime_ns in entry[2]:
+            yield os.path.join(dirpath, name), size
+
+
+def iter_scanned_file_states(scan):
+    """Yields (path, size, mtime_ns) of every regular file in a scan_sources() result"""
+    for dirpath, entry in scan.items():
+        for name, size, mtime_ns in entry[2]:
+            yield os.path.join(dirpath, name), size, mtime_ns
+
+
+def scan_source_totals(source_dirs, use_cache=True):
+    """Counts regular files and bytes under source directories (progress totals)"""
+    # Sizes of files in directories with unchanged mtime come from the cache, so
+    # a file rewritten in place may be counted with its old size. Only totals use
+    # the cache - the archive run stats every file itself.
+    start = time.monotonic()
+    scan, hits = scan_sources(source_dirs, use_cache)
+    files = sum(len(entry[2]) for entry in scan.values())
+    total = sum(size for path, size in iter_scanned_files(scan))
+    for source in source_dirs:
+        if os.path.isfile(source):
+            files += 1
+            total += os.path.getsize(source)
+    log_message(f"Scanned {len(scan)} directories ({hits} unchanged since last scan) "
+                f"in {time.monotonic() - start:.1f}s: {files} files, {total / 1048576:.1f} MB", "INFO")
+    return files, total
+
+# --- ARCHIVE ENGINE ---
+
+ARCHIVE_CHUNK_SIZE = 1024 * 1024  # Read/compress files in 1 MB blocks
+ARCHIVE_WRITE_BUFFER = 8 * 1024 * 1024  # Large writes are much cheaper on USB disks
+DEFAULT_COMPRESSION_LEVEL = 3
+PARALLEL_MEMBER_LIMIT = 8 * 1024 * 1024  # Bigger files are streamed by the writer thread
+DEFAULT_BLOCK_THRESHOLD_MB = 64  # Bigger files are split into blocks compressed in parallel
+COMPRESSION_BLOCK_SIZE = 4 * 1024 * 1024
+DEFLATE_WINDOW = 32 * 1024
+DEFLATE_END_BLOCK = zlib.compressobj(1, zlib.DEFLATED, -15).flush()  # Empty final block
+SMALL_FILE_LIMIT = 64 * 1024  # Smaller files are read and compressed in batches
+SMALL_BATCH_FILES = 256
+SMALL_BATCH_BYTES = 4 * 1024 * 1024
+ZIP_MIN_DATE_TIME = (1980, 1, 1, 0, 0, 0)  # Range of ZIP member timestamps
+ZIP_MAX_DATE_TIME = (2107, 12, 31, 23, 59, 59)
+# Already compressed formats - deflating them only burns CPU
+DEFAULT_STORE_EXTENSIONS = [
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".mp3", ".aac", ".ogg", ".flac", ".m4a",
+    ".mp4", ".m4v", ".mkv", ".avi", ".mov", ".wmv", ".webm", ".zip", ".7z", ".rar", ".gz", ".tgz",
+    ".bz2", ".xz", ".zst", ".lz4", ".cab", ".jar", ".docx", ".xlsx", ".pptx", ".odt", ".pdf",
+]
+STORE_EXTENSIONS = frozenset()
+COMPRESSIBILITY_SAMPLE_SIZE = 64 * 1024  # Trial-compress this much of the file start
+COMPRESSIBILITY_MIN_SAMPLE = 4096  # Smaller files are just compressed
+STORE_RATIO_THRESHOLD = 0.95  # Store when level 1 saves less than 5% on the sample
+CHECKSUMS_MEMBER = ".rotup/checksums.b2"  # "<blake2b-256>  <member>" lines (b2sum -l 256 format)
+
+
+DEFAULT_CODEC = "deflate"
+DEFAULT_AUTO_TARGET_MB_S = 50
+AUTO_SAMPLE_SIZE = 32 * 1024 * 1024  # Data read from sources for the codec benchmark
+AUTO_SAMPLE_FILE_LIMIT = 1024 * 1024  # Per-file part of the sample
+AUTO_SCAN_LIMIT = 5000  # Files looked at when picking the sample
+AUTO_CANDIDATES = [("deflate", 1), ("deflate", 3), ("deflate", 6), ("deflate", 9),
+                   ("bzip2", 9), ("lzma", 6), ("zstd", 3), ("zstd", 9), ("zstd", 19)]
+
+# name -> (ZIP compress_type, default level, min level, max level)
+CODECS = {
+    "store": (zipfile.ZIP_STORED, 0, 0, 0),
+    "deflate": (zipfile.ZIP_DEFLATED, DEFAULT_COMPRESSION_LEVEL, 1, 9),
+}
+if bz2:
+    CODECS["bzip2"] = (zipfile.ZIP_BZIP2, 9, 1, 9)
+if lzma:
+    # zipfile writes LZMA members with its own fixed preset
+    CODECS["lzma"] = (zipfile.ZIP_LZMA, 6, 6, 6)
+if zstd and hasattr(zipfile, "ZIP_ZSTANDARD"):
+    CODECS["zstd"] = (zipfile.ZIP_ZSTANDARD, 3, 1, 22)
+
+Codec = collections.namedtuple("Codec", "name compress_type level")
+STORE_CODEC = Codec("store", zipfile.ZIP_STORED, 0)
+
+
+class SourceReadError(OSError):
+    """Source file could not be read - file is skipped, backup continues"""
+
+
+
+
+
+def make_codec(name, level=None):
+    """Returns Codec for name with level clamped to the codec's range"""
+    compress_type, default_level, min_level, max_level = CODECS[name]
+    if level is None:
+        level = default_level
+    if name == "deflate" and level == 0:
+        # compression_level 0 always meant "store only"
+        return STORE_CODEC
+    return Codec(name, compress_type, min(max(level, min_level), max_level))
+
+
+def get_compression_level():
+    """Returns compression level from config (None = codec default)"""
+    level = CONFIG.get('compression_level')
+    if level is None:
+        return None
+    try:
+        return int(level)
+    except (TypeError, ValueError):
+        log_message(f"Invalid compression_level '{level}', using codec default", "WARN")
+        return None
+
+
+def get_compression_codec(source_dirs):
+    """Returns Codec configured by compression_codec/compression_level ('auto' benchmarks once per host)"""
+    if core.CODEC_OVERRIDE is not None:
+        return core.CODEC_OVERRIDE  # Denser codec picked by preflight_check() for this run
+    name = str(CONFIG.get('compression_codec', DEFAULT_CODEC)).lower()
+    if name == "auto":
+        return resolve_auto_codec(source_dirs)
+    if name not in CODECS:
+        log_message(f"Compression codec '{name}' is not available here, using {DEFAULT_CODEC}", "WARN")
+        name = DEFAULT_CODEC
+    return make_codec(name, get_compression_level())
+
+
+def collect_codec_sample(source_dirs):
+    """Reads a deterministic sample of compressible source data for the codec benchmark"""
+    paths = []
+    for path, is_dir, entry in iter_source_entries(source_dirs):
+        if is_dir or os.path.splitext(path)[1].lower() in STORE_EXTENSIONS:
+            continue
+        # Never open FIFOs or devices - reading them may block forever
+        if os.path.isfile(path) and not os.path.islink(path):
+            paths.append(path)
+            if len(paths) >= AUTO_SCAN_LIMIT:
+                break
+    random.Random(0).shuffle(paths)
+
+    sample = []
+    sample_size = 0
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read(AUTO_SAMPLE_FILE_LIMIT)
+        except OSError:
+            continue
+        if not data or is_incompressible(path, data):
+            continue
+        sample.append(data)
+        sample_size += len(data)
+        if sample_size >= AUTO_SAMPLE_SIZE:
+            break
+    return sample
+
+
+def benchmark_codec(codec, sample):
+    """Compresses sample in one thread, returns (MB/s, compressed/original ratio)"""
+    start = time.perf_counter()
+    packed = 0
+    for data in sample:
+        compressor = zipfile._get_compressor(codec.compress_type, codec.level)
+        packed += len(compressor.compress(data)) + len(compressor.flush())
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    total = sum(len(data) for data in sample)
+    return total / 1048576 / elapsed, packed / max(total, 1)
+
+
+def resolve_auto_codec(source_dirs):
+    """Returns codec picked by benchmark on this host, benchmarks and saves it to config.json when needed"""
+    try:
+        target = float(CONFIG.get('auto_target_mb_s', DEFAULT_AUTO_TARGET_MB_S))
+    except (TypeError, ValueError):
+        target = DEFAULT_AUTO_TARGET_MB_S
+    workers = get_compression_workers()
+
+    saved = CONFIG.get('auto_codec') or {}
+    if (saved.get('host') == platform.node() and saved.get('target_mb_s') == target
+            and saved.get('workers') == workers and saved.get('codec') in CODECS):
+        codec = make_codec(saved['codec'], saved.get('level'))
+        log_message(f"Auto codec: {codec.name} {codec.level} (benchmarked {saved.get('date', '?')})", "INFO")
+        return codec
+
+    refresh_store_extensions()
+    sample = collect_codec_sample(source_dirs)
+    if not sample:
+        log_message(f"Auto codec: no compressible sample data, using {DEFAULT_CODEC}", "INFO")
+        return make_codec(DEFAULT_CODEC)
+
+    log_message(f"Auto codec: benchmarking on {sum(len(d) for d in sample) / 1048576:.1f} MB sample, "
+                f"target {target:g} MB/s with {workers} threads", "INFO")
+    results = []
+    for name, level in AUTO_CANDIDATES:
+        if name not in CODECS:
+            continue
+        codec = make_codec(name, level)
+        if codec in (r[0] for r in results):
+            continue
+        speed, ratio = benchmark_codec(codec, sample)
+        # Members are compressed on all workers at once, so throughput scales with them
+        speed *= workers
+        results.append((codec, speed, ratio))
+        log_message(f"  {codec.name} {codec.level}: {speed:.1f} MB/s, ratio {ratio:.1%}", "INFO")
+
+    fast_enough = [r for r in results if r[1] >= target]
+    if fast_enough:
+        codec, speed, ratio = min(fast_enough, key=lambda r: r[2])
+    else:
+        codec, speed, ratio = max(results, key=lambda r: r[1])
+    log_message(f"Auto codec: selected {codec.name} {codec.level} ({speed:.1f} MB/s, ratio {ratio:.1%})", "INFO")
+
+    # Saved so scheduled (--cron) runs reuse the choice instead of benchmarking again
+    CONFIG['auto_codec'] = {
+        'codec': codec.name, 'level': codec.level, 'host': platform.node(),
+        'target_mb_s': target, 'workers': workers, 'measured_mb_s': round(speed, 1),
+        'ratio': round(ratio, 4), 'date': datetime.date.today().isoformat(),
+    }
+    # Picked on the synthetic tree - kept for this benchmark only, never reused by real runs
+    if core.BENCH_RUN:
+        return codec
+    # Only this key - CONFIG may hold temporary values
+    update_config_file('auto_codec', CONFIG['auto_codec'])
+    return codec
+
+
+def get_compression_workers():
+    """Returns number of compression threads from config (0 = one per CPU)"""
+    workers = CONFIG.get('compression_workers', 0)
+    try:
+        workers = int(workers)
+    except (TypeError, ValueError):
+        log_message(f"Invalid compression_workers '{workers}', using all CPUs", "WARN")
+        workers = 0
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def get_block_threshold():
+    """Returns file size (bytes) above which block-parallel compression is used"""
+    threshold = CONFIG.get('block_compression_threshold_mb', DEFAULT_BLOCK_THRESHOLD_MB)
+    try:
+        threshold = float(threshold)
+    except (TypeError, ValueError):
+        log_message(f"Invalid block_compression_threshold_mb '{threshold}', "
+                    f"using {DEFAULT_BLOCK_THRESHOLD_MB}", "WARN")
+        threshold = DEFAULT_BLOCK_THRESHOLD_MB
+    return int(threshold * 1024 * 1024)
+
+
+def inode_order(entry):
+    """Sort key for directory entries: inode number (free from readdir on POSIX)"""
+    try:
+        return entry.inode()
+    except OSError:
+        return 0
+
+
+def iter_source_entries(source_dirs):
+    """Yields (path, is_dir, DirEntry or None) for every entry under source directories"""
+    # Subdirectories by name like zip -r, files of each directory by inode number:
+    # on most filesystems that follows on-disk layout, so spinning disks seek less
+    sort_files_by_inode = os.name != 'nt'  # inode() costs an extra stat on Windows
+
+    for source in source_dirs:
+        if os.path.isfile(source):
+            yield source, False, None
+            continue
+        if not os.path.isdir(source):
+            log_message(f"Source does not exist, skipping: {source}", "WARN")
+            continue
+
+        yield source, True, None
+        pending_dirs = [source]
+        while pending_dirs:
+            dirpath = pending_dirs.pop()
+            try:
+                with os.scandir(dirpath) as it:
+                    entries = list(it)
+            except OSError as e:
+                log_message(f"Cannot read directory {dirpath}: {e.strerror}", "WARN")
+                continue
+
+            dirs = []
+            files = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                (dirs if is_dir else files).append(entry)
+            dirs.sort(key=lambda e: e.name)
+            files.sort(key=inode_order if sort_files_by_inode else lambda e: e.name)
+
+            for entry in dirs:
+                yield entry.path, True, entry
+            for entry in files:
+                yield entry.path, False, entry
+            # Symlinked directories are archived as entries, not followed (like os.walk)
+            pending_dirs.extend(e.path for e in reversed(dirs) if not e.is_symlink())
+
+
+def iter_file_chunks(path, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Yields file content in chunk_size blocks, read errors raise SourceReadError"""
+    try:
+        with open(path, 'rb') as src:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                check_cancelled()  # Big files are not finished after a cancel
+                add_progress(bytes_read=len(chunk))
+                yield chunk
+    except OSError as e:
+        raise SourceReadError(e.errno, e.strerror, path) from e
+
+
+def get_arcname(path):
+    """Member name of a source path, same as ZipInfo.from_file() gives"""
+    arcname = os.path.normpath(os.path.splitdrive(path)[1]).lstrip(os.sep + (os.altsep or ''))
+    return arcname.replace(os.sep, "/")
+
+
+def get_zip_date_time(mtime):
+    """Member timestamp of mtime, clamped to 1980-2107 like ZipInfo.from_file(strict_timestamps=False)"""
+    return min(max(time.localtime(mtime)[0:6], ZIP_MIN_DATE_TIME), ZIP_MAX_DATE_TIME)
+
+
+def make_zip_info(path, codec, st=None):
+    """Builds ZipInfo for a source file with compression settings applied"""
+    # st: stat result from the scan, saves another stat() per file
+    if st is None:
+        try:
+            zinfo = zipfile.ZipInfo.from_file(path, strict_timestamps=False)
+        except OSError as e:
+            raise SourceReadError(e.errno, e.strerror, path) from e
+    else:
+        # Same name/time/mode handling as ZipInfo.from_file()
+        zinfo = zipfile.ZipInfo(get_arcname(path), get_zip_date_time(st.st_mtime))
+        zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+        zinfo.file_size = st.st_size
+    zinfo.compress_type = codec.compress_type
+    zinfo._compresslevel = codec.level
+    return zinfo
+
+
+def new_file_hash():
+    """Returns hash object used for file content hashes (manifests)"""
+    return hashlib.blake2b(digest_size=32)
+
+
+def new_file_hash_of(data):
+    """Returns content hash of in-memory file data"""
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+def refresh_store_extensions():
+    """Reloads extensions of already compressed formats from config"""
+    global STORE_EXTENSIONS
+    extensions = CONFIG.get('store_extensions', DEFAULT_STORE_EXTENSIONS)
+    STORE_EXTENSIONS = frozenset(ext.lower() if ext.startswith('.') else f".{ext.lower()}"
+                                 for ext in extensions)
+
+
+def is_incompressible(path, sample):
+    """Decides from extension and trial compression of the first bytes whether to store the file"""
+    if os.path.splitext(path)[1].lower() in STORE_EXTENSIONS:
+        return True
+    sample = sample[:COMPRESSIBILITY_SAMPLE_SIZE]
+    if len(sample) < COMPRESSIBILITY_MIN_SAMPLE:
+        return False
+    return len(zlib.compress(sample, 1)) > len(sample) * STORE_RATIO_THRESHOLD
+
+
+def open_member_source(path, codec, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Starts reading a source file, returns (codec to use, chunk iterator)"""
+    chunks = iter_file_chunks(path, chunk_size)
+    first = next(chunks, b'')
+    if codec is not STORE_CODEC and is_incompressible(path, first):
+        codec = STORE_CODEC
+    return codec, itertools.chain([first], chunks)
+
+
+def add_file_to_zip(zf, path, codec, st=None):
+    """Streams a single file into open ZipFile in ARCHIVE_CHUNK_SIZE blocks, returns (zinfo, hash)"""
+    codec, chunks = open_member_source(path, codec)
+    zinfo = make_zip_info(path, codec, st)
+    file_hash = new_file_hash()
+    # force_zip64: file may grow between stat() and read()
+    try:
+        with zf.open(zinfo, 'w', force_zip64=True) as dst:
+            for chunk in chunks:
+                dst.write(chunk)
+                file_hash.update(chunk)
+    except (OSError, BackupCancelled):  # OSError includes SourceReadError
+        drop_last_member(zf, zinfo)
+        raise
+    return zinfo, file_hash.hexdigest()
+
+
+def drop_last_member(zf, zinfo):
+    """Removes a member that zipfile finalised after a read error or cancel, so no truncated entry stays in the archive"""
+    # Leaving zf.open() always adds the member - take it out of the central
+    # directory and cut the archive back to where its local header started
+    if zf.filelist and zf.filelist[-1] is zinfo:
+        zf.filelist.pop()
+        if zf.NameToInfo.get(zinfo.filename) is zinfo:
+            del zf.NameToInfo[zinfo.filename]
+    zf.start_dir = zinfo.header_offset
+    zf.fp.seek(zinfo.header_offset)
+    zf.fp.truncate()
+
+
+def compress_member(path, codec, st=None):
+    """Compresses whole file in memory (worker thread), returns (zinfo, data_chunks, hash)"""
+    codec, source_chunks = open_member_source(path, codec)
+    zinfo = make_zip_info(path, codec, st)
+    # Same compressor objects zipfile uses for the codec (None for store)
+    compressor = zipfile._get_compressor(codec.compress_type, codec.level)
+    file_hash = new_file_hash()
+
+    chunks = []
+    crc = 0
+    file_size = 0
+    for chunk in source_chunks:
+        crc = zlib.crc32(chunk, crc)
+        file_hash.update(chunk)
+        file_size += len(chunk)
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            chunks.append(chunk)
+    if compressor:
+        chunks.append(compressor.flush())
+
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = sum(len(c) for c in chunks)
+    return zinfo, chunks, file_hash.hexdigest()
+
+
+def read_small_file(path, size):
+    """Reads a whole small file with plain os.read() calls, no buffered file object"""
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            data = os.read(fd, size + 1)
+            if len(data) > size:
+                # File grew since it was scanned - take all of it
+                parts = [data]
+                while True:
+                    chunk = os.read(fd, ARCHIVE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    parts.append(chunk)
+                data = b''.join(parts)
+            return data
+        finally:
+            os.close(fd)
+    except OSError as e:
+        raise SourceReadError(e.errno, e.strerror, path) from e
+
+
+def compress_small_file(path, st, codec):
+    """Reads and compresses a small file in one go, returns (zinfo, data_chunks, hash)"""
+    data = read_small_file(path, st.st_size)
+    if codec is not STORE_CODEC and is_incompressible(path, data):
+        codec = STORE_CODEC
+    zinfo = make_zip_info(path, codec, st)
+    compressor = zipfile._get_compressor(codec.compress_type, codec.level)
+    payload = compressor.compress(data) + compressor.flush() if compressor else data
+
+    zinfo.CRC = zlib.crc32(data)
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(payload)
+    return zinfo, [payload], new_file_hash_of(data)
+
+
+def compress_small_batch(batch, codec):
+    """Compresses a batch of (path, stat) small files (worker thread), returns [(path, member or error)]"""
+    results = []
+    for path, st in batch:
+        try:
+            results.append((path, compress_small_file(path, st, codec)))
+        except (SourceReadError, FileNotFoundError) as e:
+            results.append((path, e))
+    add_progress(bytes_read=sum(member[0].file_size for path, member in results if not isinstance(member, Exception)))
+    return results
+
+
+def write_small_batch(zf, results, stats):
+    """Appends compressed batch to the archive in one buffered run and records it"""
+    members = []
+    for path, result in results:
+        if isinstance(result, Exception):
+            log_message(f"Cannot archive {path}: {result}", "WARN")
+            stats['skipped'] += 1
+        else:
+            members.append((path, result))
+    write_raw_members(zf, [(zinfo, chunks) for path, (zinfo, chunks, digest) in members])
+    for path, (zinfo, chunks, digest) in members:
+        record_archived_file(stats, path, zinfo, digest)
+
+
+def prepare_raw_member(zf, zinfo):
+    """Sets fields zipfile's own writer would set before the local header is written"""
+    zinfo.flag_bits = 0
+    if not zinfo.external_attr:
+        zinfo.external_attr = 0o600 << 16
+    zf._writecheck(zinfo)
+    zf._didModify = True
+
+
+def seek_to_member_start(zf):
+    """Positions archive at the end of the last member - only seeks when needed,
+    since a seek flushes the write buffer"""
+    if zf.fp.tell() != zf.start_dir:
+        zf.fp.seek(zf.start_dir)
+
+
+def write_raw_members(zf, members):
+    """Appends several already compressed (zinfo, chunks) members as one contiguous write"""
+    seek_to_member_start(zf)
+    offset = zf.start_dir
+    parts = []
+    for zinfo, chunks in members:
+        prepare_raw_member(zf, zinfo)
+        zinfo.header_offset = offset
+        header = zinfo.FileHeader(None)
+        parts.append(header)
+        parts.extend(chunks)
+        offset += len(header) + zinfo.compress_size
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+    zf.fp.write(b''.join(parts))
+    zf.start_dir = offset
+
+
+def write_dir_member(zf, path):
+    """Adds directory entry without zipfile's seek (which would flush the write buffer)"""
+    zinfo = zipfile.ZipInfo.from_file(path, strict_timestamps=False)
+    zinfo.compress_size = zinfo.CRC = 0
+    write_raw_members(zf, [(zinfo, [])])
+
+
+def write_raw_member(zf, zinfo, chunks, streaming=False):
+    """Appends already compressed member to ZipFile (same steps as zipfile's own writer)"""
+    # streaming=True: CRC/sizes are filled into zinfo by the chunks generator,
+    # local header is rewritten once all data is written
+    seek_to_member_start(zf)
+    zinfo.header_offset = zf.start_dir
+    prepare_raw_member(zf, zinfo)
+
+    # FileHeader() switches to ZIP64 on its own when sizes are known
+    zip64 = True if streaming else None
+    if streaming:
+        zinfo.CRC = zinfo.compress_size = 0
+    zf.fp.write(zinfo.FileHeader(zip64))
+    compress_size = 0
+    for chunk in chunks:
+        zf.fp.write(chunk)
+        compress_size += len(chunk)
+
+    zf.start_dir = zf.fp.tell()
+    if streaming:
+        zinfo.compress_size = compress_size
+        zf.fp.seek(zinfo.header_offset)
+        zf.fp.write(zinfo.FileHeader(zip64))
+        zf.fp.seek(zf.start_dir)
+
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+
+
+def compress_block(data, level, zdict):
+    """Deflates one block of a big file, ends byte-aligned so blocks can be concatenated"""
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def add_file_block_parallel(zf, path, codec, pool, workers, st=None):
+    """Compresses a huge file as deflate blocks on the pool (pigz-style), returns (zinfo, hash)"""
+    # Each block is primed with the last 32 KB of the previous one (ratio stays
+    # close to single-stream deflate) and ends with a sync flush. An empty final
+    # block closes the stream, so the member is one ordinary deflate stream.
+    codec, blocks = open_member_source(path, codec, COMPRESSION_BLOCK_SIZE)
+    zinfo = make_zip_info(path, codec, st)
+    file_hash = new_file_hash()
+
+    def compressed_blocks():
+        crc = 0
+        file_size = 0
+        in_flight = collections.deque()
+        previous_tail = b''
+        for block in blocks:
+            crc = zlib.crc32(block, crc)
+            file_hash.update(block)
+            file_size += len(block)
+            if codec is STORE_CODEC:
+                # Incompressible - stored as is, no work for the pool
+                yield block
+                continue
+            in_flight.append(pool.submit(compress_block, block, codec.level, previous_tail))
+            previous_tail = block[-DEFLATE_WINDOW:]
+            # Keep memory bounded: at most two blocks per worker in flight
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+        if codec is not STORE_CODEC:
+            yield DEFLATE_END_BLOCK
+
+        zinfo.CRC = crc
+        zinfo.file_size = file_size
+
+    write_raw_member(zf, zinfo, compressed_blocks(), streaming=True)
+    return zinfo, file_hash.hexdigest()
+
+
+def iter_archive_jobs(source_dirs, stats, select=None, include_dirs=True, checkpoint=None):
+    """Yields (path, stat) of entries to archive, stat is None for directories"""
+    # select(path, stat) -> bool limits archived files (incremental mode)
+    # checkpoint: entries already in a resumed archive are not yielded again
+    for path, is_dir, entry in iter_source_entries(source_dirs):
+        check_cancelled()
+        if is_dir:
+            if include_dirs and not (checkpoint and checkpoint.take_resumed(path, None, stats)):
+                yield path, None
+            continue
+        try:
+            # DirEntry caches the result (and gets it from readdir on Windows)
+            st = entry.stat() if entry is not None else os.stat(path)
+        except OSError as e:
+            log_message(f"Cannot archive {path}: {e}", "WARN")
+            stats['skipped'] += 1
+            continue
+        # Skip FIFOs, sockets and devices - reading them may block forever
+        if not stat.S_ISREG(st.st_mode):
+            print(f"[DEBUG] Skipping special file: {path}")
+            continue
+        if select is not None and not select(path, st):
+            stats['unchanged'] += 1
+            add_progress(files=1, bytes_read=st.st_size)  # Done without reading
+            continue
+        if checkpoint and checkpoint.take_resumed(path, st, stats):
+            continue
+        yield path, st
+
+
+def record_archived_file(stats, path, zinfo, digest):
+    """Updates archive statistics after a file member was written"""
+    add_progress(files=1, bytes_written=zinfo.compress_size)
+    stats['files'] += 1
+    stats['bytes_in'] += zinfo.file_size
+    if zinfo.compress_type == zipfile.ZIP_STORED:
+        stats['stored_files'] += 1
+        stats['stored_bytes'] += zinfo.file_size
+    else:
+        stats['compressed_bytes'] += zinfo.file_size
+    stats['hashes'][path] = digest
+    stats['checksums'].append((zinfo.filename, digest))
+
+
+def iter_small_batches(jobs, on_other):
+    """Groups small files of (path, stat) jobs into batches, other jobs go to on_other(path, st)"""
+    batch = []
+    batch_bytes = 0
+    for path, st in jobs:
+        if st is None or st.st_size > SMALL_FILE_LIMIT:
+            on_other(path, st)
+            continue
+        batch.append((path, st))
+        batch_bytes += st.st_size
+        if len(batch) >= SMALL_BATCH_FILES or batch_bytes >= SMALL_BATCH_BYTES:
+            yield batch
+            batch = []
+            batch_bytes = 0
+    if batch:
+        yield batch
+
+
+def archive_sequential(zf, source_dirs, codec, stats, select=None, include_dirs=True, checkpoint=None):
+    """Compresses and writes entries one by one in current thread"""
+    def write_entry(path, st):
+        try:
+            if st is None:
+                write_dir_member(zf, path)
+                stats['dirs'] += 1
+            else:
+                record_archived_file(stats, path, *add_file_to_zip(zf, path, codec, st))
+        except (SourceReadError, FileNotFoundError) as e:
+            log_message(f"Cannot archive {path}: {e}", "WARN")
+            stats['skipped'] += 1
+        if checkpoint:
+            checkpoint.commit(zf, stats)
+
+    jobs = iter_archive_jobs(source_dirs, stats, select, include_dirs, checkpoint)
+    for batch in iter_small_batches(jobs, write_entry):
+        write_small_batch(zf, compress_small_batch(batch, codec), stats)
+        if checkpoint:
+            checkpoint.commit(zf, stats)
+
+
+def archive_parallel(zf, source_dirs, codec, workers, stats, select=None, include_dirs=True, checkpoint=None):
+    """Compresses files on a worker pool, ordered writer thread appends them to the archive"""
+    pending = queue.Queue(maxsize=workers * 4)
+    writer_errors = []
+    block_threshold = get_block_threshold()
+
+    def writer():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            path, st, kind, job = item
+            if writer_errors or CANCEL_EVENT.is_set():
+                # Archive is broken already or the run was cancelled - just drain the queue
+                if job:
+                    job.cancel()
+                continue
+            try:
+                if kind == 'dir':
+                    write_dir_member(zf, path)
+                    stats['dirs'] += 1
+                elif kind == 'batch':
+                    write_small_batch(zf, job.result(), stats)
+                elif kind == 'stream':
+                    record_archived_file(stats, path, *add_file_to_zip(zf, path, codec, st))
+                elif kind == 'blocks':
+                    record_archived_file(stats, path,
+                                         *add_file_block_parallel(zf, path, codec, pool, workers, st))
+                else:
+                    zinfo, chunks, digest = job.result()
+                    write_raw_member(zf, zinfo, chunks)
+                    record_archived_file(stats, path, zinfo, digest)
+            except (SourceReadError, FileNotFoundError) as e:
+                log_message(f"Cannot archive {path}: {e}", "WARN")
+                stats['skipped'] += 1
+            except Exception as e:
+                writer_errors.append(e)
+                continue
+            if checkpoint:
+                try:
+                    checkpoint.commit(zf, stats)
+                except OSError as e:
+                    writer_errors.append(e)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                               thread_name_prefix="rotup-deflate") as pool:
+        writer_thread = threading.Thread(target=writer, name="rotup-zip-writer", daemon=True)
+        writer_thread.start()
+        def submit_entry(path, st):
+            if st is None:
+                pending.put((path, st, 'dir', None))
+            # Block splitting relies on deflate sync flushes
+            elif codec.name == "deflate" and st.st_size > block_threshold:
+                pending.put((path, st, 'blocks', None))
+            elif st.st_size > PARALLEL_MEMBER_LIMIT:
+                pending.put((path, st, 'stream', None))
+            else:
+                pending.put((path, st, 'member', pool.submit(compress_member, path, codec, st)))
+
+        try:
+            # Small files travel as batches: one pool task and one archive write per batch
+            jobs = iter_archive_jobs(source_dirs, stats, select, include_dirs, checkpoint)
+            for batch in iter_small_batches(jobs, submit_entry):
+                if writer_errors:
+                    break
+                pending.put((None, None, 'batch', pool.submit(compress_small_batch, batch, codec)))
+        finally:
+            pending.put(None)
+            writer_thread.join()
+
+    if writer_errors:
+        raise writer_errors[0]
+    check_cancelled()  # Writer may have dropped queued entries
+
+
+def create_zip_archive(target, source_dirs, select=None, finalize=None, include_dirs=True, scan_cache=True,
+                       mirrors=()):
+    """Creates ZIP64 archive of source directories, streaming file data straight to target"""
+    # select(path, stat) -> bool: archive only chosen files
+    # finalize(zf, stats): add extra members before the central directory is written
+    # scan_cache=False: source_dirs are a few changed paths, not the configured sources
+    # mirrors: more paths (other disks) receiving the same archive stream
+    refresh_store_extensions()
+    codec = get_compression_codec(source_dirs)
+    workers = get_compression_workers()
+    log_message(f"Compression: {codec.name} level {codec.level}, worker threads: {workers}", "INFO")
+
+    stats = {'files': 0, 'dirs': 0, 'skipped': 0, 'unchanged': 0, 'bytes_in': 0,
+             'stored_files': 0, 'stored_bytes': 0, 'compressed_bytes': 0,
+             'hashes': {}, 'checksums': []}
+    start_time = datetime.datetime.now()
+
+    set_progress_phase("scanning")
+    files_total, bytes_total = scan_source_totals(source_dirs, scan_cache)
+    set_progress_phase("archiving", files_total, bytes_total)
+
+    # Interrupted fan-out runs are not continued - copies may have stopped at different points
+    checkpoint = None if mirrors else open_archive_checkpoint(target)
+    if checkpoint and checkpoint.end:
+        # Continue interrupted archive: drop everything after the last checkpointed member
+        out = open(target, 'r+b', buffering=ARCHIVE_WRITE_BUFFER)
+        out.truncate(checkpoint.end)
+    elif mirrors:
+        out = FanOutWriter([target, *mirrors])
+    else:
+        out = open(target, 'wb', buffering=ARCHIVE_WRITE_BUFFER)
+    with out:
+        with zipfile.ZipFile(out, 'w', compression=codec.compress_type,
+                             allowZip64=True, compresslevel=codec.level or None) as zf:
+            if checkpoint:
+                checkpoint.start(zf)
+            if workers > 1:
+                archive_parallel(zf, source_dirs, codec, workers, stats, select, include_dirs, checkpoint)
+            else:
+                archive_sequential(zf, source_dirs, codec, stats, select, include_dirs, checkpoint)
+            if checkpoint:
+                checkpoint.finish(zf)
+            if finalize:
+                finalize(zf, stats)
+            # Strong hashes computed while compressing, used by verify_zip_archive()
+            zf.writestr(CHECKSUMS_MEMBER, ''.join(f"{digest}  {name}\n" for name, digest in stats['checksums']))
+            # Log goes in as the last member - no second pass over the archive (zip -u) later
+            if core.LOG_FILE and os.path.exists(core.LOG_FILE):
+                log_message("Adding log to ZIP archive", "INFO")
+                flush_log()
+                zf.write(core.LOG_FILE, os.path.basename(core.LOG_FILE))
+
+        # Drop bytes of a member abandoned after a read error past the central directory
+        out.truncate()
+        sync_archive(out)
+        archive_size = out.tell()
+    if checkpoint:
+        checkpoint.remove()  # Archive is complete
+
+    elapsed = max((datetime.datetime.now() - start_time).total_seconds(), 0.001)
+    ratio = archive_size / stats['bytes_in'] * 100 if stats['bytes_in'] else 0
+    log_message(
+        f"Archived {stats['files']} files, {stats['dirs']} dirs, "
+        f"{stats['bytes_in'] / 1048576:.1f} MB -> {archive_size / 1048576:.1f} MB ({ratio:.0f}%) "
+        f"in {elapsed:.0f}s ({stats['bytes_in'] / 1048576 / elapsed:.1f} MB/s)", "INFO")
+    log_message(f"Compressed {stats['compressed_bytes'] / 1048576:.1f} MB, stored without compression "
+                f"{stats['stored_bytes'] / 1048576:.1f} MB ({stats['stored_files']} files)", "INFO")
+    if stats['unchanged']:
+        log_message(f"{stats['unchanged']} unchanged files skipped", "INFO")
+    if stats['skipped']:
+        log_message(f"{stats['skipped']} entries could not be archived", "WARN")
+    return stats
+
+# --- RESUMABLE ARCHIVES ---
+
+CHECKPOINT_SUFFIX = ".checkpoint"
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_INTERVAL_MB = 256
+CHECKPOINT_INTERVAL_SECONDS = 60  # Checkpoint at least this often while members are written
+
+
+def get_checkpoint_interval():
+    """Returns archive bytes written between checkpoints (None = checkpoints off)"""
+    interval = CONFIG.get('checkpoint_interval_mb', DEFAULT_CHECKPOINT_INTERVAL_MB)
+    try:
+        interval = float(interval)
+    except (TypeError, ValueError):
+        log_message(f"Invalid checkpoint_interval_mb '{interval}', "
+                    f"using {DEFAULT_CHECKPOINT_INTERVAL_MB}", "WARN")
+        interval = DEFAULT_CHECKPOINT_INTERVAL_MB
+    return int(interval * 1024 * 1024) if interval > 0 else None
+
+
+def load_archive_checkpoint(path):
+    """Reads checkpoint journal, returns ({member name: ZipInfo}, {member name: hash}, end offset)"""
+    members = {}
+    digests = {}
+    end = 0
+    pending = []
+    with open(path, 'r', encoding='utf-8') as f:
+        if json.loads(f.readline() or '{}').get('version') != CHECKPOINT_VERSION:
+            raise ValueError("unsupported checkpoint version")
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # Torn write of the last checkpoint
+            if isinstance(record, dict):
+                # Members before this mark are on disk up to 'end'
+                for zinfo, digest in pending:
+                    members[zinfo.filename] = zinfo
+                    digests[zinfo.filename] = digest
+                pending = []
+                end = record['end']
+                continue
+            (name, date_time, compress_type, external_attr, header_offset, crc,
+             compress_size, file_size, flag_bits, extract_version, create_version, digest) = record
+            zinfo = zipfile.ZipInfo(name, tuple(date_time))
+            zinfo.compress_type = compress_type
+            zinfo.external_attr = external_attr
+            zinfo.header_offset = header_offset
+            zinfo.CRC = crc
+            zinfo.compress_size = compress_size
+            zinfo.file_size = file_size
+            zinfo.flag_bits = flag_bits
+            zinfo.extract_version = extract_version
+            zinfo.create_version = create_version
+            pending.append((zinfo, digest))
+    return members, digests, end
+
+
+def list_interrupted_archives(disk_root):
+    """Returns checkpoint journals of interrupted archives on the disk, newest first"""
+    paths = [os.path.join(disk_root, name) for name in os.listdir(disk_root)
+             if name.endswith(".zip" + CHECKPOINT_SUFFIX)]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def take_interrupted_archive(target):
+    """Moves newest interrupted archive of the same kind (full/incremental) to target, deletes the others"""
+    incremental = target.endswith("_incr.zip")
+    found = False
+    for path in list_interrupted_archives(os.path.dirname(target)):
+        archive = path[:-len(CHECKPOINT_SUFFIX)]
+        if not found and os.path.exists(archive) and archive.endswith("_incr.zip") == incremental:
+            found = True
+            if archive != target:
+                log_message(f"Continuing interrupted backup {os.path.basename(archive)} "
+                            f"as {os.path.basename(target)}", "INFO")
+                os.replace(archive, target)
+                os.replace(path, target + CHECKPOINT_SUFFIX)
+            continue
+        if os.path.exists(archive):
+            log_message(f"Deleting interrupted backup {os.path.basename(archive)} - it cannot be continued", "WARN")
+            os.remove(archive)
+        os.remove(path)
+
+
+def get_resumable_bytes(disk_root):
+    """Archive bytes of interrupted backups a run can continue from"""
+    try:
+        paths = list_interrupted_archives(disk_root)
+        return load_archive_checkpoint(paths[0])[2] if paths else 0
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+
+
+def open_archive_checkpoint(target):
+    """Returns ArchiveCheckpoint for target with members of an interrupted run (None when checkpoints are off)"""
+    interval = get_checkpoint_interval()
+    if interval is None:
+        return None
+    checkpoint = ArchiveCheckpoint(target, interval)
+    try:
+        take_interrupted_archive(target)
+        if os.path.exists(checkpoint.path) and os.path.exists(target):
+            members, digests, end = load_archive_checkpoint(checkpoint.path)
+            if end > os.path.getsize(target):
+                raise ValueError("archive is shorter than its checkpoint")
+            checkpoint.resumed, checkpoint.resumed_digests, checkpoint.end = members, digests, end
+            log_message(f"Resuming backup: {len(members)} members ({end / 1048576:.1f} MB) "
+                        f"written by an interrupted run are kept", "INFO")
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log_message(f"Cannot continue interrupted backup {target} ({e}) - starting over", "WARN")
+        checkpoint.resumed, checkpoint.resumed_digests, checkpoint.end = {}, {}, 0
+    return checkpoint
+
+
+class ArchiveCheckpoint:
+    """Journal of archive members already safe on disk, kept next to the archive as <archive>.checkpoint"""
+    # Archive data is fsynced before its members are recorded, so after a crash or an
+    # unplugged disk the archive can be cut at the last 'end' mark and continued.
+
+    def __init__(self, target, interval):
+        self.path = target + CHECKPOINT_SUFFIX
+        self.interval = interval
+        self.file = None
+        self.zf = None
+        self.resumed = {}  # Member name -> ZipInfo of the interrupted run, until the walk reaches it
+        self.resumed_digests = {}  # Member name -> content hash of resumed members
+        self.digests = {}  # Member name -> content hash of members not in the journal yet
+        self.stale = []  # Resumed members whose source changed - left out of the central directory
+        self.end = 0  # Archive offset covered by the last checkpoint
+        self.recorded = 0  # Members of zf.filelist in the journal
+        self.hashed = 0  # Entries of stats['checksums'] looked at
+        self.last_time = time.monotonic()
+
+    def start(self, zf):
+        """Puts resumed members back into the archive index and starts a fresh journal"""
+        self.zf = zf
+        zf.filelist.extend(self.resumed.values())
+        zf.NameToInfo.update(self.resumed)
+        zf.start_dir = self.end
+        self.recorded = len(zf.filelist)
+        self.file = open(self.path + ".tmp", 'w', encoding='utf-8')
+        self.file.write(json.dumps({'version': CHECKPOINT_VERSION}) + '\n')
+        self.write_records(zf.filelist, self.resumed_digests)
+        os.replace(self.path + ".tmp", self.path)
+
+    def take_resumed(self, path, st, stats):
+        """True when entry is in the resumed archive already and unchanged (st None = directory)"""
+        name = get_arcname(path) + ("/" if st is None else "")
+        zinfo = self.resumed.pop(name, None)
+        if zinfo is None:
+            return False
+        if st is None:
+            stats['dirs'] += 1
+            return True
+        digest = self.resumed_digests.pop(name, None)
+        if digest and zinfo.file_size == st.st_size and zinfo.date_time == get_zip_date_time(st.st_mtime):
+            add_progress(bytes_read=st.st_size)
+            record_archived_file(stats, path, zinfo, digest)
+            return True
+        # Changed since the interrupted run - archived again, old data stays unreferenced
+        self.stale.append(zinfo)
+        if self.zf.NameToInfo.get(name) is zinfo:
+            del self.zf.NameToInfo[name]  # No duplicate name warning from zipfile
+        return False
+
+    def write_records(self, members, digests):
+        """Appends members and the current end mark to the journal and syncs it"""
+        lines = [json.dumps([zinfo.filename, zinfo.date_time, zinfo.compress_type, zinfo.external_attr,
+                             zinfo.header_offset, zinfo.CRC, zinfo.compress_size, zinfo.file_size,
+                             zinfo.flag_bits, zinfo.extract_version, zinfo.create_version,
+                             digests.get(zinfo.filename)], ensure_ascii=False)
+                 for zinfo in members]
+        lines.append(json.dumps({'end': self.end}))
+        self.file.write('\n'.join(lines) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def commit(self, zf, stats):
+        """Records members written since the last checkpoint once interval bytes or seconds have passed"""
+        # Called between members only - every member in zf.filelist is complete
+        if (zf.start_dir - self.end < self.interval
+                and time.monotonic() - self.last_time < CHECKPOINT_INTERVAL_SECONDS):
+            return
+        sync_archive(zf.fp)
+        self.digests.update(stats['checksums'][self.hashed:])
+        self.hashed = len(stats['checksums'])
+        members = zf.filelist[self.recorded:]
+        self.end = zf.start_dir
+        self.write_records(members, self.digests)
+        for zinfo in members:
+            self.digests.pop(zinfo.filename, None)
+        self.recorded += len(members)
+        self.last_time = time.monotonic()
+
+    def finish(self, zf):
+        """Leaves resumed members the walk did not confirm (deleted or changed files) out of the archive"""
+        dropped = {id(zinfo) for zinfo in self.stale}
+        for name, zinfo in self.resumed.items():
+            dropped.add(id(zinfo))
+            if zf.NameToInfo.get(name) is zinfo:
+                del zf.NameToInfo[name]
+        if dropped:
+            print(f"[DEBUG] Checkpoint: {len(dropped)} resumed members left out of the central directory")
+            zf.filelist = [zinfo for zinfo in zf.filelist if id(zinfo) not in dropped]
+
+    def remove(self):
+        """Deletes journal of the completed archive"""
+        if self.file:
+            self.file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+# --- FAN-OUT ---
+
+FANOUT_BUFFER_BYTES = 64 * 1024 * 1024  # Per-disk backlog before the archive writer has to wait
+FANOUT_WRITE_CHUNK = 1024 * 1024  # Small writes (headers, small members) are handed over in chunks this big
+
+
+class FanOutTarget:
+    """One copy of the archive stream: own file, writer thread and bounded backlog"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb', buffering=ARCHIVE_WRITE_BUFFER)
+        self.ops = collections.deque()
+        self.backlog = 0  # Bytes queued but not written yet
+        self.cond = threading.Condition()
+        self.error = None
+        self.position = 0
+        self.thread = threading.Thread(target=self._run, name="rotup-fanout", daemon=True)
+        self.thread.start()
+
+    def put(self, op, size=0):
+        """Queues (kind, ...) operation, waits only while this disk is a full buffer behind"""
+        with self.cond:
+            while self.backlog and self.backlog + size > FANOUT_BUFFER_BYTES and self.error is None:
+                self.cond.wait()
+            self.ops.append(op)
+            self.backlog += size
+            self.cond.notify_all()
+
+    def _apply(self, op):
+        kind = op[0]
+        if kind == 'write':
+            offset, data = op[1], op[2]
+            if offset != self.position:
+                self.file.seek(offset)
+            self.file.write(data)
+            self.position = offset + len(data)
+        elif kind == 'truncate':
+            self.file.truncate(op[1])
+        elif kind == 'sync':
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.ops:
+                    self.cond.wait()
+                op = self.ops.popleft()
+            if self.error is None:
+                try:
+                    self._apply(op)
+                except OSError as e:
+                    self.error = e
+                    log_message(f"Fan-out: writing {self.path} failed: {e} - other disks continue", "ERROR")
+            if op[0] == 'write':
+                with self.cond:
+                    self.backlog -= len(op[2])
+                    self.cond.notify_all()
+            elif op[0] == 'sync':
+                op[1].set()
+            elif op[0] == 'stop':
+                self._close()
+                return
+
+    def _close(self):
+        try:
+            self.file.close()
+        except OSError as e:
+            if self.error is None:
+                self.error = e
+                log_message(f"Fan-out: closing {self.path} failed: {e}", "ERROR")
+        if self.error is not None:
+            try:
+                os.remove(self.path)  # Incomplete copy - disk may be gone already
+            except OSError:
+                pass
+
+
+class FanOutWriter:
+    """Seekable file-like object writing one archive stream to several files in parallel"""
+    # zipfile only writes, asks for the position and seeks back to patch local
+    # headers, so every write goes to the targets together with its offset.
+
+    def __init__(self, paths):
+        self.targets = []
+        for path in paths:
+            try:
+                self.targets.append(FanOutTarget(path))
+            except OSError as e:
+                log_message(f"Fan-out: cannot create {path}: {e}", "ERROR")
+        if not self.targets:
+            raise OSError("Fan-out: no target archive could be created")
+        self.position = 0
+        self.size = 0
+        self.pending = []  # Contiguous writes ending at position, not handed over yet
+        self.pending_start = 0
+        self.pending_bytes = 0
+
+    def live_targets(self):
+        """Targets without write errors, raises when every copy failed"""
+        live = [target for target in self.targets if target.error is None]
+        if not live:
+            raise OSError(f"Fan-out: writing failed on every disk ({self.targets[0].error})")
+        return live
+
+    def dispatch(self):
+        """Hands collected writes over to the target threads"""
+        if not self.pending:
+            return
+        data = b''.join(self.pending)
+        for target in self.live_targets():
+            target.put(('write', self.pending_start, data), len(data))
+        self.pending = []
+        self.pending_bytes = 0
+
+    def write(self, data):
+        if not self.pending:
+            self.pending_start = self.position
+        self.pending.append(bytes(data))  # Caller may reuse its buffer
+        self.pending_bytes += len(data)
+        self.position += len(data)
+        self.size = max(self.size, self.position)
+        if self.pending_bytes >= FANOUT_WRITE_CHUNK:
+            self.dispatch()
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.dispatch()
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.position = offset
+        return offset
+
+    def seekable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass  # Targets write in the background, sync() waits for them
+
+    def truncate(self, size=None):
+        self.dispatch()
+        size = self.position if size is None else size
+        for target in self.live_targets():
+            target.put(('truncate', size))
+        self.size = size
+        return size
+
+    def sync(self):
+        """Blocks until every working target has written and fsynced everything queued so far"""
+        self.dispatch()
+        events = []
+        for target in self.live_targets():
+            done = threading.Event()
+            target.put(('sync', done))
+            events.append(done)
+        for done in events:
+            done.wait()
+        self.live_targets()
+
+    def close(self):
+        try:
+            self.dispatch()
+        except OSError:
+            pass  # Every copy failed - reported by the targets already
+        for target in self.targets:
+            target.put(('stop',))
+        for target in self.targets:
+            target.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def sync_archive(out):
+    """Flushes archive output to disk (plain file or FanOutWriter)"""
+    if isinstance(out, FanOutWriter):
+        out.sync()
+    else:
+        out.flush()
+        os.fsync(out.fileno())
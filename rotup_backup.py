@@ -0,0 +1,450 @@
+import json
+import os
+import datetime
+import shutil
+import zipfile
+import zlib
+import collections
+import gzip
+import io
+import mmap
+import random
+
+import rotup_core as core
+from rotup_core import cache_get, cache_put, CONFIG, flush_log, log_message, set_progress_phase
+from rotup_archive import ARCHIVE_CHUNK_SIZE, CHECKSUMS_MEMBER, create_zip_archive, new_file_hash
+import rotup_journal
+from rotup_repository import ChunkRepository, run_repository_backup
+
+# --- INCREMENTAL BACKUP ---
+
+MANIFEST_DIR = ".rotup"
+MANIFEST_FILE = "manifest.json.gz"
+MANIFEST_VERSION = 1
+TOMBSTONE_MEMBER = ".rotup/deleted_files.txt"
+DEFAULT_FULL_BACKUP_INTERVAL_DAYS = 7
+
+
+def get_manifest_path(disk_root):
+    """Returns path of file manifest stored on rotation disk"""
+    return os.path.join(disk_root, MANIFEST_DIR, MANIFEST_FILE)
+
+
+def load_manifest(disk_root):
+    """Loads manifest of previous backup from rotation disk, None if missing or unreadable"""
+    path = get_manifest_path(disk_root)
+    if not os.path.exists(path):
+        return None
+    manifest = cache_get(('manifest', path), path)
+    if manifest is not None:
+        print(f"[DEBUG] Manifest taken from cache: {len(manifest.get('files', {}))} files")
+        return manifest
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        log_message(f"Cannot read manifest {path}: {e}", "WARN")
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        log_message(f"Unsupported manifest version {manifest.get('version')}", "WARN")
+        return None
+    print(f"[DEBUG] Manifest loaded: {len(manifest.get('files', {}))} files")
+    cache_put(('manifest', path), path, manifest)
+    return manifest
+
+
+def save_manifest(disk_root, manifest):
+    """Atomically writes manifest to rotation disk"""
+    path = get_manifest_path(disk_root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+        json.dump(manifest, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp_path, path)
+    cache_put(('manifest', path), path, manifest)
+
+
+def get_full_backup_interval():
+    """Returns max age (days) of the last full backup in incremental mode"""
+    days = CONFIG.get('full_backup_interval_days', DEFAULT_FULL_BACKUP_INTERVAL_DAYS)
+    try:
+        return max(int(days), 1)
+    except (TypeError, ValueError):
+        log_message(f"Invalid full_backup_interval_days '{days}', "
+                    f"using {DEFAULT_FULL_BACKUP_INTERVAL_DAYS}", "WARN")
+        return DEFAULT_FULL_BACKUP_INTERVAL_DAYS
+
+
+def needs_full_backup(manifest, verbose=True):
+    """Decides if incremental run has to make a full backup instead"""
+    if manifest is None:
+        if verbose:
+            log_message("No manifest on this disk - making full backup", "INFO")
+        return True
+    if manifest.get('disk') != core.ACTIVE_DISK:
+        if verbose:
+            log_message(f"Manifest belongs to disk '{manifest.get('disk')}' - making full backup", "WARN")
+        return True
+    try:
+        last_full = datetime.datetime.strptime(manifest.get('last_full', ''), "%Y-%m-%d").date()
+    except ValueError:
+        return True
+    age = (datetime.date.today() - last_full).days
+    interval = get_full_backup_interval()
+    if age >= interval:
+        if verbose:
+            log_message(f"Last full backup is {age} days old (limit {interval}) - making full backup", "INFO")
+        return True
+    if verbose:
+        log_message(f"Last full backup: {last_full} ({age} days ago)", "INFO")
+    return False
+
+
+def is_repository_format():
+    """True when backups go to the deduplicating chunk repository instead of ZIP files"""
+    return CONFIG.get('backup_format', 'zip') == 'repository'
+
+
+def is_below(path, dirs):
+    """True when a parent directory of path is in the dirs set"""
+    parent = os.path.dirname(path)
+    while parent not in dirs:
+        up = os.path.dirname(parent)
+        if up == parent:
+            return False
+        parent = up
+    return True
+
+
+def apply_journal_changes(source_dirs, changes, old_files):
+    """Returns (paths to archive, manifest entries still valid) for journal changes"""
+    changes = {path for path in changes
+               if any(path == source or path.startswith(os.path.join(source, '')) for source in source_dirs)}
+    # Changed directories (created, deleted) and removed paths: everything below them is read again
+    gone = {path for path in changes if not os.path.isfile(path)}
+    if gone:
+        kept = {path: entry for path, entry in old_files.items() if path not in changes and not is_below(path, gone)}
+    else:
+        kept = {path: entry for path, entry in old_files.items() if path not in changes}
+
+    roots = []
+    for path in sorted(changes):
+        # Deleted paths only leave the manifest; symlinked directories are not followed
+        if not os.path.exists(path) or (os.path.islink(path) and os.path.isdir(path)):
+            continue
+        if not is_below(path, gone):
+            roots.append(path)  # Paths inside a changed directory are walked with it
+    return roots, kept
+
+
+def run_backup_archive(disk_root, source_dirs, mirror_roots=()):
+    """Creates full or incremental archive on rotation disk, returns archive path"""
+    # mirror_roots: other disks getting the same full archive (fan-out)
+    if is_repository_format():
+        return run_repository_backup(disk_root, source_dirs)
+
+    if CONFIG.get('backup_mode', 'full') != 'incremental':
+        target = os.path.join(disk_root, core.BACKUP_FILENAME)
+        mirrors = [os.path.join(root, core.BACKUP_FILENAME) for root in mirror_roots]
+        log_message(f"Target file: {target}", "INFO")
+        for mirror in mirrors:
+            log_message(f"Copy written at the same time: {mirror}", "INFO")
+        create_zip_archive(target, source_dirs, mirrors=mirrors)
+        return target
+
+    manifest = load_manifest(disk_root)
+    full = needs_full_backup(manifest)
+    old_files = {} if full else manifest.get('files', {})
+    new_files = {}
+    deleted = []
+
+    # Changes recorded by the daemon/agent since the previous run replace the tree walk
+    journal_mark = rotup_journal.CHANGE_JOURNAL.rotate() if rotup_journal.CHANGE_JOURNAL else None
+    changes = None
+    if journal_mark and not full:
+        changes = rotup_journal.CHANGE_JOURNAL.changes_since(manifest.get('journal'), source_dirs)
+        if changes is None:
+            log_message("Change journal does not cover the time since the last backup - scanning all files", "INFO")
+    archive_sources = source_dirs
+    if changes is not None:
+        archive_sources, new_files = apply_journal_changes(source_dirs, changes, old_files)
+        log_message(f"Change journal: {len(changes)} changed paths, archiving {len(archive_sources)} of them", "INFO")
+
+    def select(path, st):
+        # Manifest entry: [size, mtime_ns, inode, hash]
+        state = [st.st_size, st.st_mtime_ns, st.st_ino]
+        old = old_files.get(path)
+        if old and old[:3] == state:
+            new_files[path] = old
+            return False
+        new_files[path] = state + [None]
+        return True
+
+    def finalize(zf, stats):
+        # Whole tree has been scanned at this point
+        deleted.extend(sorted(set(old_files) - set(new_files)))
+        if deleted:
+            zf.writestr(TOMBSTONE_MEMBER, '\n'.join(deleted) + '\n')
+
+    if full:
+        target = os.path.join(disk_root, core.BACKUP_FILENAME)
+    else:
+        # Time in the name: several runs a day (agent, daemon) each keep their own changes
+        run_time = datetime.datetime.now().strftime("%H%M%S")
+        target = os.path.join(disk_root, f"{os.path.splitext(core.BACKUP_FILENAME)[0]}_{run_time}_incr.zip")
+    log_message(f"Backup type: {'full' if full else 'incremental'}", "INFO")
+    log_message(f"Target file: {target}", "INFO")
+
+    stats = create_zip_archive(target, archive_sources, select=select, finalize=finalize, include_dirs=full,
+                               scan_cache=changes is None)
+
+    # Files that could not be read are left out so the next run retries them
+    for path, entry in list(new_files.items()):
+        if entry[3] is None:
+            digest = stats['hashes'].get(path)
+            if digest is None:
+                del new_files[path]
+            else:
+                entry[3] = digest
+    if deleted:
+        log_message(f"{len(deleted)} deleted files recorded in {TOMBSTONE_MEMBER}", "INFO")
+
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    save_manifest(disk_root, {
+        'version': MANIFEST_VERSION,
+        'disk': core.ACTIVE_DISK,
+        'last_full': today if full else manifest.get('last_full'),
+        'updated': datetime.datetime.now().isoformat(timespec='seconds'),
+        'journal': journal_mark,  # Next run may use journal generations from this one on
+        'files': new_files,
+    })
+    log_message(f"Manifest updated: {len(new_files)} files", "INFO")
+    return target
+
+# --- VERIFICATION ---
+
+DEFAULT_VERIFY_BUDGET_MB = 1024
+DIRECT_IO_BLOCK = 1024 * 1024  # O_DIRECT reads must be aligned - 1 MB is a multiple of any sector size
+
+
+class DirectFileReader(io.RawIOBase):
+    """Read-only file opened with O_DIRECT, every read comes from the disk, not from page cache"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.fd = os.open(path, os.O_RDONLY | os.O_DIRECT)
+        self.size = os.fstat(self.fd).st_size
+        self.pos = 0
+        self.buf = mmap.mmap(-1, DIRECT_IO_BLOCK)  # page aligned, as O_DIRECT requires
+        self.buf_offset = -1
+        self.buf_len = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.pos = max(offset, 0)
+        return self.pos
+
+    def readinto(self, b):
+        if self.pos >= self.size:
+            return 0
+        block_start = self.pos - self.pos % DIRECT_IO_BLOCK
+        if block_start != self.buf_offset:
+            self.buf_len = os.preadv(self.fd, [self.buf], block_start)
+            self.buf_offset = block_start
+        start = self.pos - block_start
+        count = min(len(b), self.buf_len - start)
+        if count <= 0:
+            return 0
+        b[:count] = self.buf[start:start + count]
+        self.pos += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            os.close(self.fd)
+            self.buf.close()
+        super().close()
+
+
+def open_for_verify(path):
+    """Opens file for read-back so that data comes from the disk, returns (file, method)"""
+    if CONFIG.get('verify_direct_io', True) and hasattr(os, 'O_DIRECT'):
+        try:
+            return io.BufferedReader(DirectFileReader(path), buffer_size=DIRECT_IO_BLOCK), "O_DIRECT"
+        except OSError as e:
+            # FUSE (ntfs-3g), tmpfs and some USB bridges refuse O_DIRECT
+            print(f"[DEBUG] O_DIRECT not available for {path}: {e}")
+
+    f = open(path, 'rb')
+    if hasattr(os, 'posix_fadvise'):
+        # Data was fsync'ed - dropping cached pages forces reads from the disk
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        return f, "page cache dropped"
+    return f, "buffered (page cache may be used)"
+
+
+def get_verify_settings():
+    """Returns (mode, byte budget) of the read-back verification"""
+    mode = CONFIG.get('verify_mode', 'sample')
+    if mode not in ('none', 'sample', 'full'):
+        log_message(f"Invalid verify_mode '{mode}', using 'sample'", "WARN")
+        mode = 'sample'
+    budget = CONFIG.get('verify_budget_mb', DEFAULT_VERIFY_BUDGET_MB)
+    try:
+        budget = int(float(budget) * 1024 * 1024)
+    except (TypeError, ValueError):
+        log_message(f"Invalid verify_budget_mb '{budget}', using {DEFAULT_VERIFY_BUDGET_MB}", "WARN")
+        budget = DEFAULT_VERIFY_BUDGET_MB * 1024 * 1024
+    return mode, budget
+
+
+def pick_verify_sample(items, size_of, budget):
+    """Picks random items until their total size reaches budget (the last item is always included)"""
+    if not items:
+        return []
+    rng = random.Random()
+    candidates = items[:-1]
+    rng.shuffle(candidates)
+    picked = [items[-1]]
+    total = size_of(items[-1])
+    for item in candidates:
+        if total >= budget:
+            break
+        picked.append(item)
+        total += size_of(item)
+    return picked
+
+
+def verify_zip_archive(target):
+    """Reads back (part of) the archive and checks CRCs and stored hashes, returns True if OK"""
+    mode, budget = get_verify_settings()
+    if mode == 'none':
+        log_message("Archive verification disabled", "WARN")
+        return True
+
+    start_time = datetime.datetime.now()
+    f, method = open_for_verify(target)
+    try:
+        # Opening reads the whole central directory - a truncated archive fails here
+        with zipfile.ZipFile(f) as zf:
+            # Overlapping sources archive a file more than once under the same name
+            expected = collections.defaultdict(set)
+            for line in zf.read(CHECKSUMS_MEMBER).decode('utf-8').splitlines():
+                digest, name = line.split('  ', 1)
+                expected[name].add(digest)
+
+            members = [zinfo for zinfo in zf.infolist() if zinfo.filename in expected]
+            listed = {zinfo.filename for zinfo in members}
+            if len(listed) != len(expected):
+                log_message(f"Archive lists {len(listed)} of {len(expected)} files from checksums", "ERROR")
+                return False
+            total_members = len(members)
+            if mode == 'sample':
+                members = pick_verify_sample(members, lambda zinfo: zinfo.compress_size, budget)
+
+            checked_bytes = 0
+            for zinfo in members:
+                file_hash = new_file_hash()
+                # zipfile raises BadZipFile when CRC does not match at the end of the member
+                with zf.open(zinfo) as member:
+                    while True:
+                        chunk = member.read(ARCHIVE_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        file_hash.update(chunk)
+                if file_hash.hexdigest() not in expected[zinfo.filename]:
+                    log_message(f"Hash mismatch: {zinfo.filename}", "ERROR")
+                    return False
+                checked_bytes += zinfo.compress_size
+    except (zipfile.BadZipFile, KeyError, ValueError, OSError, EOFError, zlib.error) as e:
+        log_message(f"ZIP Verification Error: {e}", "ERROR")
+        return False
+    finally:
+        f.close()
+
+    elapsed = max((datetime.datetime.now() - start_time).total_seconds(), 0.001)
+    log_message(f"Verified {len(members)} of {total_members} files ({mode}, {method}): "
+                f"{checked_bytes / 1048576:.1f} MB in {elapsed:.0f}s", "SUCCESS")
+    return True
+
+
+def verify_repository_snapshot(snapshot_path):
+    """Reads back (part of) the chunks referenced by a snapshot and checks their hashes"""
+    mode, budget = get_verify_settings()
+    if mode == 'none':
+        log_message("Snapshot verification disabled", "WARN")
+        return True
+
+    start_time = datetime.datetime.now()
+    repo = ChunkRepository(os.path.dirname(os.path.dirname(snapshot_path)))
+    repo.open()
+    name = os.path.basename(snapshot_path)[:-len('.json.gz')]
+    try:
+        snapshot = repo.load_snapshot(name)
+        chunk_ids = list(dict.fromkeys(c for entry in snapshot.get('files', []) for c in entry[5]))
+        missing = [c for c in chunk_ids if not repo.has_chunk(c)]
+        if missing:
+            log_message(f"Snapshot references {len(missing)} missing chunks", "ERROR")
+            return False
+        if mode == 'sample':
+            chunk_ids = pick_verify_sample(chunk_ids, lambda c: repo.index[c][2], budget)
+
+        # Read pack by pack in offset order
+        by_pack = collections.defaultdict(list)
+        for chunk_id in chunk_ids:
+            by_pack[repo.index[chunk_id][0]].append(chunk_id)
+        checked_bytes = 0
+        method = ""
+        for pack_id, ids in by_pack.items():
+            f, method = open_for_verify(repo.pack_path(pack_id))
+            with f:
+                for chunk_id in sorted(ids, key=lambda c: repo.index[c][1]):
+                    offset, length = repo.index[chunk_id][1:3]
+                    f.seek(offset)
+                    repo.decode_chunk(chunk_id, f.read(length))
+                    checked_bytes += length
+    except (RuntimeError, OSError, ValueError, zlib.error) as e:
+        log_message(f"Snapshot Verification Error: {e}", "ERROR")
+        return False
+
+    elapsed = max((datetime.datetime.now() - start_time).total_seconds(), 0.001)
+    log_message(f"Verified {len(chunk_ids)} chunks ({mode}, {method or 'nothing to read'}): "
+                f"{checked_bytes / 1048576:.1f} MB in {elapsed:.0f}s", "SUCCESS")
+    return True
+
+
+def verify_backup(target):
+    """Verifies archive or snapshot written by run_backup_archive()"""
+    log_message("Verifying backup...", "INFO")
+    set_progress_phase("verifying")
+    if is_repository_format():
+        return verify_repository_snapshot(target)
+    return verify_zip_archive(target)
+
+
+def copy_log_to_disk(disk_root):
+    """Copies complete run log next to the archive (the archive holds the log up to archiving)"""
+    if not core.LOG_FILE:
+        return
+    try:
+        log_copy_path = os.path.join(disk_root, os.path.basename(core.LOG_FILE))
+        log_message(f"Copying log to: {log_copy_path}", "INFO")
+        flush_log()  # Copy includes everything logged so far
+        if not os.path.exists(core.LOG_FILE):
+            return
+        shutil.copy2(core.LOG_FILE, log_copy_path)
+        log_message("Log file copied to backup disk", "SUCCESS")
+    except Exception as e:
+        log_message(f"Could not copy log file: {e}", "WARN")
@@ -0,0 +1,283 @@
+import platform
+import json
+import sys
+import os
+import datetime
+import glob
+import threading
+import shutil
+import hashlib
+import random
+import time
+import tempfile
+
+import rotup_core as core
+from rotup_core import CONFIG, flush_log, get_psutil, load_config, log_message
+from rotup_archive import (ARCHIVE_WRITE_BUFFER, COMPRESSION_BLOCK_SIZE, get_compression_codec,
+                           get_compression_workers, iter_archive_jobs, SCAN_CACHE_FILE)
+from rotup_backup import copy_log_to_disk, get_verify_settings, run_backup_archive, verify_backup
+
+# --- BENCHMARK ---
+
+# name -> (tiny files, text files, media files, huge files, huge file MB)
+BENCH_PROFILES = {
+    "small": (20000, 500, 50, 2, 128),
+    "medium": (200000, 2000, 200, 4, 512),
+    "large": (2000000, 10000, 1000, 8, 2048),
+}
+BENCH_FILES_PER_DIR = 1000
+BENCH_DIR_NAME = "rotup-bench"  # Only this subdirectory of --source/--target is ever written or deleted
+BENCH_TREE_MARKER = ".bench.json"  # Next to the tree, so it is not backed up
+BENCH_WORDS = ("backup rotation disk archive invoice report config data user project "
+               "photo document budget meeting server client table value index system").split()
+
+
+def get_cli_option(name, default=None):
+    """Returns value following a command line option (e.g. --profile small)"""
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+
+def claim_bench_dir(path, marker):
+    """Empties a benchmark-owned directory and writes its marker; returns False for foreign non-empty dirs"""
+    marker_path = os.path.normpath(path) + BENCH_TREE_MARKER
+    if not os.path.exists(marker_path) and os.path.lexists(path):
+        if not os.path.isdir(path) or os.path.islink(path) or os.listdir(path):
+            log_message(f"Refusing to use {path}: not empty and not created by --bench", "ERROR")
+            return False
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump(marker, f)
+    return True
+
+
+def release_bench_dir(path):
+    """Deletes a benchmark-owned directory together with its marker"""
+    shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.remove(os.path.normpath(path) + BENCH_TREE_MARKER)
+    except OSError:
+        pass
+
+
+def generate_bench_tree(root, profile, seed):
+    """Creates deterministic synthetic source tree (same profile+seed = same bytes), returns (files, bytes) or None"""
+    marker_path = os.path.normpath(root) + BENCH_TREE_MARKER
+    spec = {'profile': profile, 'seed': seed, 'layout': list(BENCH_PROFILES[profile])}
+    try:
+        with open(marker_path, 'r', encoding='utf-8') as f:
+            marker = json.load(f)
+        if marker.get('spec') == spec:
+            print(f"[DEBUG] Reusing benchmark tree: {root}")
+            return marker['files'], marker['bytes']
+    except (OSError, ValueError):
+        pass
+
+    # Marker without spec first, so an interrupted generation is still recognised as ours
+    if not claim_bench_dir(root, {'spec': None}):
+        return None
+    tiny_count, text_count, media_count, huge_count, huge_mb = BENCH_PROFILES[profile]
+    rng = random.Random(seed)
+    corpus = ' '.join(rng.choice(BENCH_WORDS) for _ in range(200000)).encode() + b'\n'
+    files = 0
+    total = 0
+
+    def write_file(path, data):
+        nonlocal files, total
+        with open(path, 'wb') as f:
+            f.write(data)
+        files += 1
+        total += len(data)
+
+    def text_bytes(size):
+        if size >= len(corpus):
+            return (corpus * (size // len(corpus) + 1))[:size]
+        start = rng.randrange(len(corpus) - size)
+        return corpus[start:start + size]
+
+    log_message(f"Generating benchmark tree '{profile}' in {root}...", "INFO")
+    for index in range(tiny_count):
+        folder = os.path.join(root, "tiny", f"{index // BENCH_FILES_PER_DIR:05d}")
+        if index % BENCH_FILES_PER_DIR == 0:
+            os.makedirs(folder, exist_ok=True)
+        write_file(os.path.join(folder, f"note_{index:07d}.txt"), text_bytes(rng.randint(16, 4096)))
+
+    os.makedirs(os.path.join(root, "documents"), exist_ok=True)
+    for index in range(text_count):
+        write_file(os.path.join(root, "documents", f"report_{index:05d}.csv"),
+                   text_bytes(rng.randint(16 * 1024, 1024 * 1024)))
+
+    os.makedirs(os.path.join(root, "media"), exist_ok=True)
+    for index in range(media_count):
+        write_file(os.path.join(root, "media", f"IMG_{index:05d}.jpg"),
+                   rng.randbytes(rng.randint(512 * 1024, 8 * 1024 * 1024)))
+
+    # Huge files: alternating compressible and random blocks, like VM images
+    os.makedirs(os.path.join(root, "images"), exist_ok=True)
+    block = COMPRESSION_BLOCK_SIZE
+    for index in range(huge_count):
+        path = os.path.join(root, "images", f"disk_{index:02d}.img")
+        with open(path, 'wb', buffering=ARCHIVE_WRITE_BUFFER) as f:
+            for block_index in range(huge_mb * 1024 * 1024 // block):
+                f.write(text_bytes(block) if block_index % 2 else rng.randbytes(block))
+        files += 1
+        total += huge_mb * 1024 * 1024
+
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump({'spec': spec, 'files': files, 'bytes': total}, f)
+    return files, total
+
+
+class PhaseMeter:
+    """Measures wall time, CPU time and peak RSS of one benchmark phase"""
+
+    SAMPLE_INTERVAL = 0.05
+
+    def __init__(self, name):
+        self.name = name
+        self.process = get_psutil().Process()
+        self.peak_rss = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.SAMPLE_INTERVAL):
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self.peak_rss = self.process.memory_info().rss
+        self.cpu_start = self.process.cpu_times()
+        self.start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name="rotup-bench-rss", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self._stop.set()
+        self._sampler.join()
+        cpu_end = self.process.cpu_times()
+        self.cpu_user = cpu_end.user - self.cpu_start.user
+        self.cpu_system = cpu_end.system - self.cpu_start.system
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+        return False
+
+    def result(self, files, data_bytes):
+        elapsed = max(self.elapsed, 1e-6)
+        return {
+            'seconds': round(self.elapsed, 3),
+            'files': files,
+            'mb': round(data_bytes / 1048576, 2),
+            'files_per_s': round(files / elapsed, 1),
+            'mb_per_s': round(data_bytes / 1048576 / elapsed, 2),
+            'cpu_user_s': round(self.cpu_user, 3),
+            'cpu_system_s': round(self.cpu_system, 3),
+            'peak_rss_mb': round(self.peak_rss / 1048576, 1),
+        }
+
+
+def run_benchmark():
+    """Runs backup path of run_process() on a synthetic tree without mounting, prints phase results as JSON"""
+    core.BENCH_RUN = True
+    profile = get_cli_option('--profile', 'small')
+    if profile not in BENCH_PROFILES:
+        print(f"Unknown profile '{profile}', choose from: {', '.join(BENCH_PROFILES)}")
+        return False
+    seed = int(get_cli_option('--seed', '1'))
+    # tmpfs target by default, pass --target to measure a real (or loopback-mounted) filesystem
+    default_target = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    target = os.path.join(get_cli_option('--target', default_target), BENCH_DIR_NAME)
+    source = os.path.join(get_cli_option('--source', tempfile.gettempdir()), BENCH_DIR_NAME, f"{profile}_{seed}")
+
+    # Real config (codec, workers, formats) but benchmark-only paths
+    load_config()
+    CONFIG['source_directories'] = [source]
+    if not claim_bench_dir(target, {'target': True}):
+        print(f"Target {target} contains data not written by --bench, remove it or choose another --target")
+        return False
+    os.makedirs(os.path.join(target, "logs"), exist_ok=True)
+    # Own scan cache - the production one keeps the real sources' warm state
+    CONFIG['scan_cache_file'] = os.path.join(target, "logs", SCAN_CACHE_FILE)
+    core.LOG_FILE = os.path.join(target, "logs", "rotup_bench.log")
+    core.BACKUP_FILENAME = "rotup_bench.zip"
+    core.ACTIVE_DISK = "BENCH"
+
+    tree = generate_bench_tree(source, profile, seed)
+    if tree is None:
+        print(f"Source {source} contains data not written by --bench, remove it or choose another --source")
+        release_bench_dir(target)
+        return False
+    tree_files, tree_bytes = tree
+    log_message(f"=== ROTUP BENCHMARK: {profile}, {tree_files} files, {tree_bytes / 1048576:.0f} MB ===", "INFO")
+    phases = {}
+
+    # Same steps as backup_logic_linux(), on an already "mounted" target
+    with PhaseMeter('scan') as meter:
+        stats = {'skipped': 0, 'unchanged': 0}
+        scanned = scanned_bytes = 0
+        for path, st in iter_archive_jobs([source], stats):
+            if st is not None:
+                scanned += 1
+                scanned_bytes += st.st_size
+    phases['scan'] = meter.result(scanned, scanned_bytes)
+
+    with PhaseMeter('compress') as meter:
+        archive = run_backup_archive(target, [source])
+    phases['compress'] = meter.result(tree_files, tree_bytes)
+    # ZIP file or repository packs - everything written to the target except logs
+    archive_size = sum(os.path.getsize(os.path.join(dirpath, name))
+                       for dirpath, dirnames, filenames in os.walk(target)
+                       if not dirpath.startswith(os.path.join(target, "logs"))
+                       for name in filenames)
+
+    with PhaseMeter('verify') as meter:
+        verified = verify_backup(archive)
+    phases['verify'] = meter.result(tree_files, archive_size)
+
+    with PhaseMeter('log_copy') as meter:
+        copy_log_to_disk(target)
+    flush_log()
+    phases['log_copy'] = meter.result(1, os.path.getsize(core.LOG_FILE))
+
+    # The build id covers every backup module, not just this one
+    digest = hashlib.blake2b(digest_size=8)
+    for module in sorted(glob.glob(os.path.join(core.BASE_DIR, 'rotup*.py'))):
+        with open(module, 'rb') as f:
+            digest.update(f.read())
+    build = digest.hexdigest()
+    codec = get_compression_codec([source])
+    result = {
+        'build': build,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'platform': f"{platform.system()} {platform.release()}",
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'profile': profile,
+        'seed': seed,
+        'tree': {'files': tree_files, 'mb': round(tree_bytes / 1048576, 2), 'path': source},
+        'target': target,
+        'settings': {
+            'backup_format': CONFIG.get('backup_format', 'zip'),
+            'backup_mode': CONFIG.get('backup_mode', 'full'),
+            'codec': codec.name,
+            'level': codec.level,
+            'workers': get_compression_workers(),
+            'verify_mode': get_verify_settings()[0],
+        },
+        'archive_mb': round(archive_size / 1048576, 2),
+        'verified': verified,
+        'phases': phases,
+    }
+    output = json.dumps(result, indent=2)
+    print(output)
+    output_path = get_cli_option('--output')
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    if '--keep' not in sys.argv:
+        release_bench_dir(target)
+    return verified
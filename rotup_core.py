@@ -0,0 +1,693 @@
+import platform
+import json
+import sys
+import os
+import subprocess
+import datetime
+import threading
+import collections
+import time
+import re
+import traceback
+import queue
+import atexit
+
+# --- GLOBALS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BASE_DIR, "config.json")
+CONFIG = {}
+LOG_FILE = ""
+BACKUP_FILENAME = ""
+ACTIVE_DISK = ""  # Rotation disk used by current run (Linux disk entry / Windows label)
+LOG_QUEUE = None  # queue.Queue set by the GUI - headless modes keep no messages in memory
+CANCEL_EVENT = threading.Event()  # Set to stop running external commands and the archive writers
+WARM_CACHE = None  # Dict in --daemon mode: file-backed state kept between runs
+CODEC_OVERRIDE = None  # Codec chosen by preflight for the current run
+BENCH_RUN = False  # Set by run_benchmark() - results on the synthetic tree are not saved to config.json
+CONFIG_POLL_INTERVAL = 5  # Seconds between config.json change checks (daemon, agent, change journal)
+
+# Command line modes that run without GUI and keep console output
+CLI_MODES = ('--cron', '--restore', '--bench', '--agent', '--daemon')
+
+
+def is_console_mode():
+    """True when running headless or in debug mode (console output must stay visible)"""
+    return '--debug' in sys.argv or any(mode in sys.argv for mode in CLI_MODES)
+
+
+# Platform-specific modules are imported on first use, so --cron on Linux never loads them
+def get_psutil():
+    """Imports psutil on demand (Windows disk detection and --bench), with clear error message"""
+    try:
+        import psutil
+    except ImportError as e:
+        print(f"[DEBUG] Import error details: {e}")
+        raise RuntimeError("Missing 'psutil' library. Install via: pip install psutil") from e
+    return psutil
+
+
+def get_peak_rss_mb():
+    """Peak resident memory of this process in MB (None when it cannot be read)"""
+    try:
+        if platform.system() == "Windows":
+            return get_psutil().Process().memory_info().peak_wset / 1048576
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1048576 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB elsewhere
+    except Exception:
+        return None
+
+
+# --- CONFIGURATION HANDLING ---
+
+def load_config():
+    """Loads configuration from JSON file or returns empty dict"""
+    # CONFIG is updated in place - other modules hold a reference to it
+    print(f"[DEBUG] Attempting to load configuration from: {CONFIG_FILE}")
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                loaded = json.load(f)
+            CONFIG.clear()
+            CONFIG.update(loaded)
+            print(f"[DEBUG] Configuration loaded successfully: {len(CONFIG)} keys")
+            return True
+        except Exception as e:
+            print(f"[DEBUG] Error loading config.json: {e}")
+            traceback.print_exc()
+            return False
+    else:
+        print(f"[DEBUG] Configuration file does not exist, will be created on save")
+        CONFIG.clear()
+    return False
+
+
+def write_config_file(new_config):
+    """Writes configuration to JSON file without any GUI interaction (cron-safe)"""
+    try:
+        tmp_path = CONFIG_FILE + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(new_config, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, CONFIG_FILE)
+        return True
+    except OSError as e:
+        log_message(f"Failed to save config.json: {e}", "WARN")
+        return False
+
+
+def update_config_file(key, value):
+    """Sets one key in config.json as it is on disk - keeps runtime changes of CONFIG out of the file"""
+    try:
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            on_disk = json.load(f)
+    except FileNotFoundError:
+        on_disk = {}
+    except (OSError, ValueError) as e:
+        log_message(f"Cannot read config.json to update '{key}': {e}", "WARN")
+        return False
+    on_disk[key] = value
+    return write_config_file(on_disk)
+
+
+def save_config(new_config):
+    """Saves configuration to JSON file"""
+    print(f"[DEBUG] Saving configuration to: {CONFIG_FILE}")
+    if not write_config_file(new_config):
+        return False
+    if new_config is not CONFIG:
+        CONFIG.clear()
+        CONFIG.update(new_config)
+    print(f"[DEBUG] Configuration saved successfully")
+    return True
+
+
+# --- WARM CACHE ---
+
+def file_signature(path):
+    """Returns (mtime_ns, size, inode) of a file, None when it cannot be read"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def cache_get(key, path):
+    """Returns value cached for key while the file it was read from is unchanged"""
+    if WARM_CACHE is None or key not in WARM_CACHE:
+        return None
+    signature, value = WARM_CACHE[key]
+    return value if signature == file_signature(path) else None
+
+
+def cache_put(key, path, value):
+    """Caches value read from (or written to) path, only in --daemon mode"""
+    if WARM_CACHE is not None:
+        WARM_CACHE[key] = (file_signature(path), value)
+
+# --- DISK DETECTION ---
+
+DISK_BY_UUID_DIR = "/dev/disk/by-uuid"
+DISK_BY_LABEL_DIR = "/dev/disk/by-label"
+SYS_CLASS_BLOCK = "/sys/class/block"
+UDEV_DATA_DIR = "/run/udev/data"
+
+
+def decode_udev_name(name):
+    """Decodes \\xNN escapes udev uses in /dev/disk/by-* link names (e.g. spaces in labels)"""
+    return re.sub(r'\\x([0-9a-fA-F]{2})', lambda m: chr(int(m.group(1), 16)), name)
+
+
+def read_sysfs_attr(device, attr):
+    """Reads a sysfs attribute of a block device node, returns '' when not available"""
+    try:
+        with open(os.path.join(SYS_CLASS_BLOCK, os.path.basename(device), attr), 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def read_udev_fstype(device):
+    """Returns filesystem type recorded by udev for a device (no probing of the disk)"""
+    dev_number = read_sysfs_attr(device, 'dev')
+    if not dev_number:
+        return ""
+    try:
+        with open(os.path.join(UDEV_DATA_DIR, f"b{dev_number}"), 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                if line.startswith("E:ID_FS_TYPE="):
+                    return line.strip().split('=', 1)[1]
+    except OSError:
+        pass
+    return ""
+
+
+def read_disk_labels():
+    """Maps device path -> label from /dev/disk/by-label"""
+    labels = {}
+    try:
+        names = os.listdir(DISK_BY_LABEL_DIR)
+    except OSError:
+        return labels
+    for name in names:
+        labels[os.path.realpath(os.path.join(DISK_BY_LABEL_DIR, name))] = decode_udev_name(name)
+    return labels
+
+
+def describe_disk(uuid, device, labels):
+    """Builds disk index entry for a filesystem UUID and its device node"""
+    sectors = read_sysfs_attr(device, 'size')
+    return {
+        'uuid': uuid,
+        'device': device,
+        'label': labels.get(device, ""),
+        'fstype': read_udev_fstype(device),
+        'size': int(sectors) * 512 if sectors.isdigit() else 0,
+    }
+
+
+def read_disk_index():
+    """Returns {uuid: disk entry} for all filesystems from udev symlinks and sysfs (no device probing)"""
+    index = {}
+    try:
+        names = os.listdir(DISK_BY_UUID_DIR)
+    except OSError as e:
+        print(f"[DEBUG] Cannot read {DISK_BY_UUID_DIR}: {e}")
+        return index
+    labels = read_disk_labels()
+    for name in names:
+        uuid = decode_udev_name(name)
+        index[uuid] = describe_disk(uuid, os.path.realpath(os.path.join(DISK_BY_UUID_DIR, name)), labels)
+    return index
+
+
+def lookup_disk_by_uuid(uuid):
+    """Resolves one filesystem UUID to a disk entry (exact match), None when not connected"""
+    link = os.path.join(DISK_BY_UUID_DIR, uuid)
+    if os.path.exists(link):
+        return describe_disk(uuid, os.path.realpath(link), read_disk_labels())
+    if os.path.isdir(DISK_BY_UUID_DIR):
+        return None
+
+    # No udev symlinks (minimal systems, containers): ask blkid for this single UUID
+    try:
+        result = subprocess.run(['blkid', '-U', uuid], capture_output=True, text=True,
+                                encoding='utf-8', errors='ignore', timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        log_message(f"Cannot run blkid: {e}", "WARN")
+        return None
+    device = result.stdout.strip()
+    if result.returncode != 0 or not device:
+        return None
+    return describe_disk(uuid, os.path.realpath(device), {})
+
+
+def get_available_disks_linux():
+    """Detects available disks on Linux system"""
+    disks = []
+    try:
+        print("[DEBUG] Linux: Detecting disks via /dev/disk/by-uuid...")
+        for uuid, disk in sorted(read_disk_index().items(), key=lambda item: item[1]['device']):
+            name = f"{disk['label'] or 'NO_LABEL'} ({uuid})"
+            if disk['fstype']:
+                name += f" [{disk['fstype']}]"
+            disks.append({
+                'display': name,
+                'value': f"{disk['label'] or 'DISK'}_{uuid}",
+                'raw_uuid': uuid
+            })
+        print(f"[DEBUG] Linux: Found {len(disks)} disks")
+    except Exception as e:
+        print(f"[DEBUG] Linux disk detection error: {e}")
+        traceback.print_exc()
+    return disks
+
+
+def get_available_disks_windows():
+    """Detects available disks on Windows system"""
+    disks = []
+    try:
+        print("[DEBUG] Windows: Detecting disks via psutil...")
+        psutil = get_psutil()
+        partitions = psutil.disk_partitions()
+        print(f"[DEBUG] psutil.disk_partitions() returned {len(partitions)} partitions")
+
+        for part in partitions:
+            print(f"[DEBUG] Checking partition: {part.device}, opts: {part.opts}")
+            if 'removable' in part.opts or 'cdrom' not in part.opts:
+                try:
+                    usage = psutil.disk_usage(part.mountpoint)
+                    label = ""
+                    try:
+                        drive_letter = part.device.rstrip('\\').rstrip(':')
+                        # FIX: Dodaj encoding='utf-8' i errors='ignore'
+                        cmd = f"(Get-Volume -DriveLetter '{drive_letter}').FileSystemLabel"
+                        print(f"[DEBUG] Executing PowerShell: {cmd}")
+                        result = subprocess.run(
+                            ['powershell', '-Command', cmd],
+                            capture_output=True,
+                            text=True,
+                            encoding='utf-8',
+                            errors='ignore',
+                            timeout=5
+                        )
+                        label = result.strip()
+                        print(f"[DEBUG] Label for {drive_letter}: '{label}'")
+                    except subprocess.TimeoutExpired:
+                        print(f"[DEBUG] Timeout getting label for {part.device}")
+                    except Exception as label_err:
+                        print(f"[DEBUG] Cannot get label for {part.device}: {label_err}")
+
+                    name = f"Drive {part.device} - {label if label else 'No Label'} [{part.fstype}]"
+                    value = label if label else part.device
+                    disks.append({'display': name, 'value': value})
+                    print(f"[DEBUG] Added disk: {name}")
+                except PermissionError:
+                    print(f"[DEBUG] No access to {part.mountpoint}")
+                except Exception as disk_err:
+                    print(f"[DEBUG] Error with disk {part.device}: {disk_err}")
+                    continue
+        print(f"[DEBUG] Windows: Found {len(disks)} disks")
+    except Exception as e:
+        print(f"[DEBUG] Windows disk detection error: {e}")
+        traceback.print_exc()
+    return disks
+
+
+# --- LOGGING AND COMMANDS ---
+
+def initialize_logging():
+    """Initializes logging system"""
+    global LOG_FILE, BACKUP_FILENAME
+    log_dir = CONFIG.get('logging_directory', './logs')
+    prefix = CONFIG.get('backup_filename_prefix', 'backup')
+    current_date = datetime.datetime.now().strftime("%Y_%m_%d")
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        print(f"[DEBUG] Log directory: {log_dir}")
+    except Exception as e:
+        print(f"[DEBUG] Cannot create log directory: {e}")
+    LOG_FILE = os.path.join(log_dir, f"{prefix}_{current_date}.log")
+    BACKUP_FILENAME = f"{prefix}_{current_date}.zip"
+    print(f"[DEBUG] Log file: {LOG_FILE}")
+    print(f"[DEBUG] Backup filename: {BACKUP_FILENAME}")
+
+
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'SUCCESS': 25, 'WARN': 30, 'ERROR': 40, 'FATAL': 50}
+DEFAULT_LOG_LEVEL = "INFO"
+LOG_BATCH_LINES = 1000  # Records written with one write() call at most
+LOG_WRITER = None
+
+
+class LogWriter:
+    """Background thread appending log records through long-lived file handles"""
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.files = {}  # path -> open handle
+        self.thread = threading.Thread(target=self._run, name="rotup-log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, path, text):
+        self.queue.put((path, text))
+
+    def flush(self, close=False, timeout=10):
+        """Blocks until everything queued so far is written and flushed"""
+        done = threading.Event()
+        self.queue.put((None, (done, close)))
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < LOG_BATCH_LINES:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            pending = {}  # path -> [text] keeps order per file
+            for path, item in batch:
+                if path is not None:
+                    pending.setdefault(path, []).append(item)
+                    continue
+                # Flush marker: write what came before it first
+                self._write_pending(pending)
+                pending = {}
+                done, close = item
+                self._flush_files(close)
+                done.set()
+            self._write_pending(pending)
+            self._flush_files(False)
+
+    def _write_pending(self, pending):
+        for path, texts in pending.items():
+            try:
+                handle = self.files.get(path)
+                if handle is None:
+                    handle = self.files[path] = open(path, 'a', encoding='utf-8')
+                handle.write(''.join(texts))
+            except Exception as e:
+                print(f"[DEBUG] Cannot write to log: {e}")
+
+    def _flush_files(self, close):
+        for path, handle in list(self.files.items()):
+            try:
+                handle.flush()
+                if close or path not in (LOG_FILE, get_json_log_path()):
+                    handle.close()  # Also releases logs of earlier runs (daemon)
+                    del self.files[path]
+            except Exception as e:
+                print(f"[DEBUG] Cannot flush log: {e}")
+
+
+def get_log_level():
+    """Minimal level of logged messages (log_level in config.json)"""
+    level = str(CONFIG.get('log_level', DEFAULT_LOG_LEVEL)).upper()
+    return LOG_LEVELS.get(level, LOG_LEVELS[DEFAULT_LOG_LEVEL])
+
+
+def get_json_log_path():
+    """JSON-lines log next to the text log when log_json is enabled, else None"""
+    if LOG_FILE and CONFIG.get('log_json', False):
+        return os.path.splitext(LOG_FILE)[0] + ".jsonl"
+    return None
+
+
+def write_log(path, text):
+    """Hands a log record to the writer thread (started on first use)"""
+    global LOG_WRITER
+    if LOG_WRITER is None:
+        LOG_WRITER = LogWriter()
+        atexit.register(close_log)  # Runs on normal exit and on uncaught exceptions
+    LOG_WRITER.write(path, text)
+
+
+def flush_log():
+    """Waits until all logged messages are in the log files (before the log is copied or archived)"""
+    if LOG_WRITER is not None:
+        LOG_WRITER.flush()
+
+
+def close_log():
+    """Flushes and closes log files"""
+    if LOG_WRITER is not None:
+        LOG_WRITER.flush(close=True)
+
+
+def log_message(message, level="INFO"):
+    """Logs message to file and queues it for GUI display"""
+    if LOG_LEVELS.get(level, LOG_LEVELS['INFO']) < get_log_level():
+        return
+    now = datetime.datetime.now()
+    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+
+    # Formatowanie koloru
+    if level == "INFO":
+        prefix = "ℹ️"
+        color_tag = "info"
+    elif level == "WARN":
+        prefix = "⚠️"
+        color_tag = "warning"
+    elif level == "ERROR" or level == "FATAL":
+        prefix = "❌"
+        color_tag = "error"
+    elif level == "SUCCESS":
+        prefix = "✅"
+        color_tag = "success"
+    else:
+        prefix = "📝"
+        color_tag = "normal"
+
+    log_entry = f"[{timestamp}] {prefix} {level}: {message}\n"
+    print(log_entry.strip())
+    if LOG_FILE:
+        write_log(LOG_FILE, log_entry)
+        json_log = get_json_log_path()
+        if json_log:
+            record = {'time': now.isoformat(timespec='milliseconds'), 'level': level, 'message': message,
+                      'run': BACKUP_FILENAME, 'disk': ACTIVE_DISK}
+            write_log(json_log, json.dumps(record, ensure_ascii=False) + "\n")
+    if LOG_QUEUE is not None:
+        LOG_QUEUE.put((log_entry, color_tag))
+
+
+COMMAND_TAIL_LINES = 50  # Output lines kept per stream for error reports
+COMMAND_PROGRESS_INTERVAL = 5.0  # Seconds between progress log lines of a running command
+COMMAND_KILL_GRACE = 5.0  # Seconds between terminate and kill
+MOUNT_TIMEOUT = 120
+
+CommandResult = collections.namedtuple("CommandResult", "returncode lines stdout_tail stderr_tail timed_out cancelled")
+
+
+def stop_process(process):
+    """Terminates process, kills it when it does not exit in COMMAND_KILL_GRACE seconds"""
+    process.terminate()
+    try:
+        process.wait(timeout=COMMAND_KILL_GRACE)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def stream_command(command, on_line=None, timeout=None, cancel_event=None):
+    """Runs command reading stdout/stderr line by line - memory stays flat however much it prints"""
+    # on_line(stream_name, line) is called from reader threads for every line
+    tails = {'stdout': collections.deque(maxlen=COMMAND_TAIL_LINES),
+             'stderr': collections.deque(maxlen=COMMAND_TAIL_LINES)}
+    line_counts = {'stdout': 0, 'stderr': 0}  # Each reader thread counts its own stream
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='ignore')
+
+    def pump(stream, name):
+        with stream:
+            for line in stream:
+                line = line.rstrip('\r\n')
+                tails[name].append(line)
+                line_counts[name] += 1
+                if on_line:
+                    on_line(name, line)
+
+    readers = [threading.Thread(target=pump, args=(process.stdout, 'stdout'), daemon=True),
+               threading.Thread(target=pump, args=(process.stderr, 'stderr'), daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    deadline = time.monotonic() + timeout if timeout else None
+    timed_out = cancelled = False
+    while True:
+        try:
+            process.wait(timeout=0.2)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        if cancel_event is not None and cancel_event.is_set():
+            cancelled = True
+        elif deadline is not None and time.monotonic() > deadline:
+            timed_out = True
+        else:
+            continue
+        stop_process(process)
+        break
+
+    for reader in readers:
+        # Children of a killed process may still hold the pipes open
+        reader.join(timeout=COMMAND_KILL_GRACE)
+    return CommandResult(process.returncode, sum(line_counts.values()), list(tails['stdout']),
+                         list(tails['stderr']), timed_out, cancelled)
+
+
+def make_progress_logger(label):
+    """Returns on_line callback logging at most one progress line per COMMAND_PROGRESS_INTERVAL"""
+    state = {'last': time.monotonic(), 'lines': 0}
+    lock = threading.Lock()  # Called from the stdout and the stderr reader thread
+
+    def on_line(stream_name, line):
+        with lock:
+            state['lines'] += 1
+            now = time.monotonic()
+            if not line or now - state['last'] < COMMAND_PROGRESS_INTERVAL:
+                return
+            state['last'] = now
+            lines = state['lines']
+        log_message(f"{label}: {lines} lines so far, last: {line[:200]}", "INFO")
+    return on_line
+
+
+def execute_command(command, error_message, timeout=None):
+    """Runs command through stream_command(), logs failures with the tail of its output"""
+    try:
+        result = stream_command(command, make_progress_logger(os.path.basename(command[0])),
+                                timeout, CANCEL_EVENT)
+    except Exception as e:
+        log_message(f"{error_message}: {e}", "ERROR")
+        return False
+
+    if result.cancelled:
+        log_message(f"{error_message}: cancelled", "ERROR")
+        return False
+    if result.timed_out:
+        log_message(f"{error_message}: timed out after {timeout}s", "ERROR")
+        return False
+    if result.returncode != 0:
+        details = '\n'.join(result.stderr_tail or result.stdout_tail) or f"exit code {result.returncode}"
+        log_message(f"{error_message}: {details}", "ERROR")
+        return False
+    return True
+
+
+def run_command(command, error_message, timeout=None):
+    """Executes system command"""
+    log_message(f"CMD: {' '.join(command)}")
+    return execute_command(command, error_message, timeout)
+
+
+def run_powershell_command(command, error_message, timeout=None):
+    """Executes PowerShell command"""
+    log_message(f"PS: {command}")
+    return execute_command(['powershell', '-Command', command], error_message, timeout)
+
+
+class BackupCancelled(Exception):
+    """Cancel requested - run ends like an interrupted one, the checkpoint is kept"""
+
+
+def cancel_running_commands():
+    """Stops external commands started by run_command() (e.g. a hanging mount) and a running backup"""
+    CANCEL_EVENT.set()
+
+
+def check_cancelled():
+    """Raises BackupCancelled once cancel_running_commands() was called"""
+    if CANCEL_EVENT.is_set():
+        raise BackupCancelled("backup cancelled")
+
+# --- PROGRESS ---
+
+DEFAULT_PROGRESS_INTERVAL_S = 30  # Seconds between progress lines in headless modes
+PROGRESS_LOCK = threading.Lock()
+PROGRESS = {'phase': 'idle'}  # Current run, written by the engine, read with get_progress()
+
+
+def set_progress_phase(phase, files_total=None, bytes_total=None):
+    """Starts a progress phase; totals stay None when they are not known"""
+    with PROGRESS_LOCK:
+        PROGRESS.clear()
+        PROGRESS.update({'phase': phase, 'started': time.monotonic(), 'files_done': 0, 'files_total': files_total,
+                         'bytes_read': 0, 'bytes_written': 0, 'bytes_total': bytes_total})
+
+
+def add_progress(files=0, bytes_read=0, bytes_written=0):
+    """Adds work done in the current phase (any thread)"""
+    with PROGRESS_LOCK:
+        if 'started' in PROGRESS:
+            PROGRESS['files_done'] += files
+            PROGRESS['bytes_read'] += bytes_read
+            PROGRESS['bytes_written'] += bytes_written
+
+
+def get_progress():
+    """Snapshot of current progress with elapsed time, MB/s, percent and ETA (seconds)"""
+    with PROGRESS_LOCK:
+        progress = dict(PROGRESS)
+    if 'started' not in progress:
+        return progress
+    elapsed = time.monotonic() - progress['started']
+    rate = progress['bytes_read'] / elapsed if elapsed > 0 else 0
+    progress['elapsed'] = elapsed
+    progress['mb_s'] = rate / 1048576
+    progress['percent'] = progress['eta'] = None
+    total = progress['bytes_total']
+    if total:
+        done = min(progress['bytes_read'], total)
+        progress['percent'] = done * 100 / total
+        if rate > 0:
+            progress['eta'] = (total - done) / rate
+    elif total == 0 and progress['files_total'] is not None:
+        progress['percent'] = 100.0  # Nothing to read (e.g. incremental run without changes)
+    return progress
+
+
+def format_duration(seconds):
+    """Seconds as H:MM:SS"""
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+def format_progress(progress):
+    """One line description of a get_progress() snapshot"""
+    if 'started' not in progress:
+        return progress['phase'].capitalize()
+    parts = [progress['phase'].capitalize()]
+    if progress['files_total'] is not None:
+        parts.append(f"{progress['files_done']}/{progress['files_total']} files")
+    elif progress['files_done']:
+        parts.append(f"{progress['files_done']} files")
+    if progress['bytes_total']:
+        parts.append(f"{progress['bytes_read'] / 1073741824:.2f}/{progress['bytes_total'] / 1073741824:.2f} GB "
+                     f"({progress['percent']:.1f}%)")
+    elif progress['bytes_read']:
+        parts.append(f"{progress['bytes_read'] / 1073741824:.2f} GB")
+    if progress['bytes_written']:
+        parts.append(f"{progress['bytes_written'] / 1073741824:.2f} GB written")
+    if progress['bytes_read']:
+        parts.append(f"{progress['mb_s']:.1f} MB/s")
+    if progress['eta'] is not None:
+        parts.append(f"ETA {format_duration(progress['eta'])}")
+    return ", ".join(parts)
+
+
+def start_progress_reporter():
+    """Logs progress every progress_interval_seconds until the returned event is set (headless runs)"""
+    interval = max(1, float(CONFIG.get('progress_interval_seconds', DEFAULT_PROGRESS_INTERVAL_S)))
+    stop = threading.Event()
+
+    def report():
+        last = None
+        while not stop.wait(interval):
+            progress = get_progress()
+            state = (progress['phase'], progress.get('files_done'), progress.get('bytes_read'))
+            if 'started' in progress and state != last:  # Nothing new - no line
+                log_message(f"Progress: {format_progress(progress)}", "INFO")
+            last = state
+
+    threading.Thread(target=report, name="rotup-progress", daemon=True).start()
+    return stop
@@ -0,0 +1,982 @@
+import platform
+import sys
+import os
+import subprocess
+import threading
+import time
+import tkinter as tk
+from tkinter import scrolledtext, messagebox, filedialog, ttk
+import traceback
+import queue
+
+import rotup_core as core
+from rotup_core import (cancel_running_commands, get_available_disks_linux, get_available_disks_windows,
+                        load_config, log_message, save_config)
+from rotup_logic import run_process
+from rotup_service import daemon_request
+
+# --- GLOBALS ---
+TEXT_WIDGET = None
+LOG_VIEW_MAX_LINES = 5000  # Older lines are dropped from the view (the log file keeps everything)
+LOG_POLL_MS = 100
+LOG_DRAIN_BUDGET = 0.03  # Seconds per tick spent moving messages into the view
+LOG_PAGE_BYTES = 256 * 1024  # Log file read per "Load older" click
+PROGRESS_POLL_MS = 500
+
+
+# --- UI ---
+
+def open_settings_window(root):
+    """Opens settings window"""
+    print("[DEBUG] Opening settings window...")
+    settings_win = tk.Toplevel(root)
+    settings_win.title("ROTUP Configuration")
+    settings_win.geometry("750x750")  # Zwiększona wysokość
+    settings_win.resizable(True, True)  # Pozwól na zmianę rozmiaru
+    settings_win.configure(bg="#f5f5f5")
+
+    # Colors
+    COLOR_PRIMARY = "#2196F3"
+    COLOR_BG = "#f5f5f5"
+    COLOR_CARD = "#ffffff"
+
+    # Header
+    header = tk.Frame(settings_win, bg=COLOR_PRIMARY, height=60)
+    header.pack(fill=tk.X)
+    header.pack_propagate(False)
+
+    tk.Label(
+        header,
+        text="⚙️ Configuration",
+        font=("Arial", 16, "bold"),
+        bg=COLOR_PRIMARY,
+        fg="white"
+    ).pack(side=tk.LEFT, padx=20, pady=15)
+
+    # Main content area
+    # Main content area with scrollbar
+    content_outer = tk.Frame(settings_win, bg=COLOR_BG)
+    content_outer.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+
+    # Canvas + Scrollbar
+    canvas = tk.Canvas(content_outer, bg=COLOR_BG, highlightthickness=0)
+    scrollbar = ttk.Scrollbar(content_outer, orient="vertical", command=canvas.yview)
+    content = tk.Frame(canvas, bg=COLOR_BG)
+
+    content.bind(
+        "<Configure>",
+        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+    )
+
+    canvas.create_window((0, 0), window=content, anchor="nw")
+    canvas.configure(yscrollcommand=scrollbar.set)
+
+    canvas.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+
+    # Przewijanie myszką
+    def _on_mousewheel(event):
+        canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+
+    canvas.bind_all("<MouseWheel>", _on_mousewheel)
+    # === SECTION: SOURCE FOLDERS ===
+    folders_card = tk.Frame(content, bg=COLOR_CARD, relief=tk.FLAT, borderwidth=1)
+    folders_card.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
+
+    tk.Label(
+        folders_card,
+        text="📁 Source Folders (to backup):",
+        font=("Arial", 11, "bold"),
+        bg=COLOR_CARD,
+        fg="#333",
+        anchor="w"
+    ).pack(fill=tk.X, padx=15, pady=(15, 10))
+
+    # Frame with folders list and scrollbar
+    folders_frame = tk.Frame(folders_card, relief=tk.FLAT, bg="white", borderwidth=1)
+    folders_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 10))
+
+    folders_listbox = tk.Listbox(folders_frame, height=6)
+    folders_scrollbar = tk.Scrollbar(folders_frame, orient=tk.VERTICAL, command=folders_listbox.yview)
+    folders_listbox.config(yscrollcommand=folders_scrollbar.set)
+    folders_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    folders_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    # Load existing folders
+    current_folders = core.CONFIG.get('source_directories', [])
+    for folder in current_folders:
+        folders_listbox.insert(tk.END, folder)
+
+    # Buttons for folder management
+    folder_buttons_frame = tk.Frame(folders_card, bg=COLOR_CARD)
+    folder_buttons_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
+
+    def add_folder():
+        path = filedialog.askdirectory(title="Select folder to backup")
+        if path:
+            # Check if folder already exists
+            if path not in folders_listbox.get(0, tk.END):
+                folders_listbox.insert(tk.END, path)
+            else:
+                messagebox.showwarning("Duplicate", "This folder is already in the list!")
+
+    def remove_folder():
+        selection = folders_listbox.curselection()
+        if selection:
+            folders_listbox.delete(selection[0])
+        else:
+            messagebox.showwarning("No Selection", "Please select a folder to remove!")
+
+    def clear_folders():
+        if messagebox.askyesno("Confirm", "Remove all folders from the list?"):
+            folders_listbox.delete(0, tk.END)
+
+    tk.Button(folder_buttons_frame, text="➕ Add Folder", command=add_folder, bg="lightgreen").pack(side=tk.LEFT,
+                                                                                                   fill=tk.X,
+                                                                                                   expand=True, padx=2)
+    tk.Button(folder_buttons_frame, text="➖ Remove Selected", command=remove_folder, bg="lightcoral").pack(side=tk.LEFT,
+                                                                                                           fill=tk.X,
+                                                                                                           expand=True,
+                                                                                                           padx=2)
+    tk.Button(folder_buttons_frame, text="🗑 Clear All", command=clear_folders, bg="lightgray").pack(side=tk.LEFT,
+                                                                                                    fill=tk.X,
+                                                                                                    expand=True, padx=2)
+
+    # === SECTION: ROTATION DISKS ===
+    disks_card = tk.Frame(content, bg=COLOR_CARD, relief=tk.FLAT, borderwidth=1)
+    disks_card.pack(fill=tk.BOTH, expand=True)
+
+    tk.Label(
+        disks_card,
+        text="💾 Rotating Disks:",
+        font=("Arial", 11, "bold"),
+        bg=COLOR_CARD,
+        fg="#333",
+        anchor="w"
+    ).pack(fill=tk.X, padx=15, pady=(15, 10))
+
+    # Lista aktualnie dodanych dysków
+    disks_list_frame = tk.Frame(disks_card, relief=tk.FLAT, bg="white", borderwidth=1)
+    disks_list_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 10))
+
+    disks_listbox = tk.Listbox(disks_list_frame, height=6)
+    disks_scrollbar = tk.Scrollbar(disks_list_frame, orient=tk.VERTICAL, command=disks_listbox.yview)
+    disks_listbox.config(yscrollcommand=disks_scrollbar.set)
+    disks_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    disks_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    # Załaduj aktualnie zapisane dyski
+    system_os = platform.system()
+    if system_os == "Linux":
+        current_disks = core.CONFIG.get('disk_rotation', {}).get('linux', [])
+    else:
+        current_disks = core.CONFIG.get('disk_rotation', {}).get('windows', [])
+
+    for disk in current_disks:
+        disks_listbox.insert(tk.END, disk)
+
+    # Przyciski zarządzania dyskami
+    disk_buttons_frame = tk.Frame(disks_card, bg=COLOR_CARD)
+    disk_buttons_frame.pack(fill=tk.X, padx=15, pady=(0, 10))
+
+    # Wykryj dostępne dyski
+    detected_disks = []
+    if system_os == "Linux":
+        detected_disks = get_available_disks_linux()
+    else:
+        detected_disks = get_available_disks_windows()
+
+    def add_disk_from_detected():
+        """Otwiera okno wyboru dysku"""
+        if not detected_disks:
+            messagebox.showwarning("No Disks", "No external disks detected!\nPlease connect a USB drive.")
+            return
+
+        # Okno wyboru dysku
+        select_win = tk.Toplevel(settings_win)
+        select_win.title("Select Disk")
+        select_win.geometry("500x400")
+        select_win.configure(bg="#f5f5f5")
+
+        tk.Label(
+            select_win,
+            text="Select disk to add:",
+            font=("Arial", 11, "bold"),
+            bg="#f5f5f5"
+        ).pack(padx=20, pady=(20, 10))
+
+        # Lista dysków do wyboru
+        select_frame = tk.Frame(select_win, bg="white", relief=tk.FLAT, borderwidth=1)
+        select_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
+
+        select_listbox = tk.Listbox(select_frame, font=("Arial", 9))
+        select_scroll = tk.Scrollbar(select_frame, orient=tk.VERTICAL, command=select_listbox.yview)
+        select_listbox.config(yscrollcommand=select_scroll.set)
+        select_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        select_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Dodaj dyski do listy (pomijając już dodane)
+        disk_map = {}
+        current_in_list = list(disks_listbox.get(0, tk.END))
+
+        for disk in detected_disks:
+            if disk['value'] not in current_in_list:
+                select_listbox.insert(tk.END, disk['display'])
+                disk_map[disk['display']] = disk['value']
+
+        if select_listbox.size() == 0:
+            select_listbox.insert(tk.END, "All detected disks are already added")
+            select_listbox.config(state=tk.DISABLED)
+
+        def confirm_add():
+            selection = select_listbox.curselection()
+            if selection:
+                selected_display = select_listbox.get(selection[0])
+                if selected_display in disk_map:
+                    disk_value = disk_map[selected_display]
+                    disks_listbox.insert(tk.END, disk_value)
+                    select_win.destroy()
+            else:
+                messagebox.showwarning("No Selection", "Please select a disk!")
+
+        btn_frame = tk.Frame(select_win, bg="#f5f5f5")
+        btn_frame.pack(fill=tk.X, padx=20, pady=(0, 20))
+
+        tk.Button(
+            btn_frame,
+            text="✓ Add Selected",
+            command=confirm_add,
+            bg="#4CAF50",
+            fg="white",
+            font=("Arial", 10, "bold"),
+            relief=tk.FLAT,
+            padx=20,
+            pady=10
+        ).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+
+        tk.Button(
+            btn_frame,
+            text="✗ Cancel",
+            command=select_win.destroy,
+            bg="#757575",
+            fg="white",
+            font=("Arial", 10, "bold"),
+            relief=tk.FLAT,
+            padx=20,
+            pady=10
+        ).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+
+    def remove_disk():
+        selection = disks_listbox.curselection()
+        if selection:
+            disks_listbox.delete(selection[0])
+        else:
+            messagebox.showwarning("No Selection", "Please select a disk to remove!")
+
+    def clear_disks():
+        if messagebox.askyesno("Confirm", "Remove all disks from the list?"):
+            disks_listbox.delete(0, tk.END)
+
+    tk.Button(
+        disk_buttons_frame,
+        text="➕ Add Disk",
+        command=add_disk_from_detected,
+        bg="lightgreen",
+        font=("Arial", 9)
+    ).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+
+    tk.Button(
+        disk_buttons_frame,
+        text="➖ Remove Selected",
+        command=remove_disk,
+        bg="lightcoral",
+        font=("Arial", 9)
+    ).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+
+    tk.Button(
+        disk_buttons_frame,
+        text="🗑 Clear All",
+        command=clear_disks,
+        bg="lightgray",
+        font=("Arial", 9)
+    ).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+
+    tk.Button(
+        disk_buttons_frame,
+        text="🔄 Refresh",
+        command=lambda: messagebox.showinfo("Refresh", "Please close and reopen Settings to refresh disk list"),
+        bg="lightblue",
+        font=("Arial", 9)
+    ).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+
+    # === SECTION: AUTOMATIC BACKUP ===
+    auto_card = tk.Frame(content, bg=COLOR_CARD, relief=tk.FLAT, borderwidth=1)
+    auto_card.pack(fill=tk.X, pady=(15, 0))
+
+    tk.Label(
+        auto_card,
+        text="⏰ Automatic Backup Schedule:",
+        font=("Arial", 11, "bold"),
+        bg=COLOR_CARD,
+        fg="#333",
+        anchor="w"
+    ).pack(fill=tk.X, padx=15, pady=(15, 10))
+
+    auto_enabled_var = tk.BooleanVar(value=False)
+
+    # Check if automatic backup is currently enabled
+    system_os = platform.system()
+    if system_os == "Linux":
+        try:
+            result = subprocess.run(
+                ['crontab', '-l'],
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                errors='ignore'
+            )
+
+            if result.returncode == 0:
+                cron_output = result.stdout
+                if 'rotup.py --cron' in cron_output and not cron_output.strip().startswith('#'):
+                    auto_enabled_var.set(True)
+        except:
+            pass
+    else:  # Windows
+        try:
+            result = subprocess.run(['schtasks', '/Query', '/TN', 'ROTUP_AutoBackup', '/FO', 'LIST'],
+                                    capture_output=True, text=True)
+            if 'Ready' in result.stdout or 'Running' in result.stdout:
+                auto_enabled_var.set(True)
+        except:
+            pass
+
+    auto_frame = tk.Frame(auto_card, bg=COLOR_CARD)
+    auto_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
+
+    auto_check = tk.Checkbutton(
+        auto_frame,
+        text="Enable daily automatic backup at 2:00 AM",
+        variable=auto_enabled_var,
+        font=("Arial", 10),
+        bg=COLOR_CARD,
+        anchor="w"
+    )
+    auto_check.pack(fill=tk.X, pady=5)
+
+    auto_info = tk.Label(
+        auto_frame,
+        text="ℹ️ Requires administrator/sudo privileges to enable/disable",
+        font=("Arial", 8),
+        bg=COLOR_CARD,
+        fg="#666",
+        anchor="w"
+    )
+    auto_info.pack(fill=tk.X, padx=20)
+    # === SECTION: BACKUP TIME SELECTION ===
+    time_card = tk.Frame(content, bg=COLOR_CARD, relief=tk.FLAT, borderwidth=1)
+    time_card.pack(fill=tk.X, pady=(15, 0))
+
+    tk.Label(
+        time_card,
+        text="🕐 Backup Time:",
+        font=("Arial", 11, "bold"),
+        bg=COLOR_CARD,
+        fg="#333",
+        anchor="w"
+    ).pack(fill=tk.X, padx=15, pady=(15, 10))
+
+    time_frame = tk.Frame(time_card, bg=COLOR_CARD)
+    time_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
+
+    tk.Label(time_frame, text="Hour:", bg=COLOR_CARD, font=("Arial", 10)).pack(side=tk.LEFT, padx=(0, 5))
+
+    hour_var = tk.StringVar(value=core.CONFIG.get('backup_hour', '02'))
+    hour_spinbox = tk.Spinbox(
+        time_frame,
+        from_=0,
+        to=23,
+        textvariable=hour_var,
+        width=8,
+        format="%02.0f",
+        font=("Arial", 10)
+    )
+    hour_spinbox.pack(side=tk.LEFT, padx=5)
+
+    tk.Label(time_frame, text="Minute:", bg=COLOR_CARD, font=("Arial", 10)).pack(side=tk.LEFT, padx=(15, 5))
+
+    minute_var = tk.StringVar(value=core.CONFIG.get('backup_minute', '00'))
+    minute_spinbox = tk.Spinbox(
+        time_frame,
+        from_=0,
+        to=59,
+        textvariable=minute_var,
+        width=8,
+        format="%02.0f",
+        font=("Arial", 10)
+    )
+    minute_spinbox.pack(side=tk.LEFT, padx=5)
+
+    tk.Label(
+        time_frame,
+        text="ℹ️ Default: 02:00 AM",
+        font=("Arial", 8),
+        bg=COLOR_CARD,
+        fg="#666"
+    ).pack(side=tk.LEFT, padx=15)
+
+    # === SAVE BUTTON ===
+    def save_settings():
+        print("[DEBUG] Saving settings...")
+        new_conf = core.CONFIG.copy()
+
+        # Get folders from listbox
+        folders_list = list(folders_listbox.get(0, tk.END))
+
+        if not folders_list:
+            messagebox.showwarning("No Folders", "Please add at least one source folder!")
+            return
+
+        new_conf['source_directories'] = folders_list
+
+        # Get selected disks from listbox
+        selected_disks = list(disks_listbox.get(0, tk.END))
+
+        if not selected_disks:
+            messagebox.showwarning("No Disks", "Please select at least one rotation disk!")
+            return
+
+        if 'disk_rotation' not in new_conf:
+            new_conf['disk_rotation'] = {}
+
+        if system_os == "Linux":
+            new_conf['disk_rotation']['linux'] = selected_disks
+            if 'target_mount_point_linux' not in new_conf:
+                new_conf['target_mount_point_linux'] = "/mnt/rotup_usb"
+            if 'logging_directory' not in new_conf:
+                new_conf['logging_directory'] = "/var/log/rotup"
+        else:
+            new_conf['disk_rotation']['windows'] = selected_disks
+            if 'logging_directory' not in new_conf:
+                new_conf['logging_directory'] = "C:\\ProgramData\\ROTUP\\Logs"
+
+        if 'backup_filename_prefix' not in new_conf:
+            new_conf['backup_filename_prefix'] = 'backup'
+
+        # Zapisz czas backupu
+        try:
+            new_conf['backup_hour'] = hour_spinbox.get().zfill(2)
+            new_conf['backup_minute'] = minute_spinbox.get().zfill(2)
+        except:
+            new_conf['backup_hour'] = '02'
+            new_conf['backup_minute'] = '00'
+
+        # Save config first
+        if not save_config(new_conf):
+            messagebox.showerror("Error", "Failed to save configuration!")
+            return
+
+        # Handle automatic backup scheduling
+        auto_enabled = auto_enabled_var.get()
+        backup_hour = new_conf.get('backup_hour', '02')
+        backup_minute = new_conf.get('backup_minute', '00')
+
+        if system_os == "Linux":
+            try:
+                rotup_path = os.path.join(core.BASE_DIR, "rotup.py")
+                backup_hour = new_conf.get('backup_hour', '02')
+                backup_minute = new_conf.get('backup_minute', '00')
+                cron_line = f"{backup_minute} {backup_hour} * * * /usr/bin/python3 {rotup_path} --cron"
+
+                # Get current user's crontab
+                current_user = os.environ.get('USER', os.environ.get('USERNAME', 'root'))
+
+                result = subprocess.run(
+                    ['crontab', '-l'],
+                    capture_output=True,
+                    text=True,
+                    encoding='utf-8',
+                    errors='ignore'
+                )
+
+                if result.returncode == 0:
+                    current_cron = result.stdout
+                else:
+                    current_cron = ""
+
+                # Remove old ROTUP entries
+                lines = [l for l in current_cron.splitlines()
+                         if 'rotup.py --cron' not in l and 'rotup --cron' not in l]
+
+                # Add new entry if enabled
+                if auto_enabled:
+                    lines.append(cron_line)
+
+                # Write new crontab
+                new_cron = '\n'.join(lines) + '\n'
+
+                # Try to write as current user first
+                try:
+                    process = subprocess.Popen(['crontab', '-'],
+                                               stdin=subprocess.PIPE,
+                                               text=True,
+                                               stdout=subprocess.PIPE,
+                                               stderr=subprocess.PIPE)
+                    stdout, stderr = process.communicate(input=new_cron)
+
+                    if process.returncode == 0:
+                        status = "enabled" if auto_enabled else "disabled"
+                        print(f"[DEBUG] Automatic backup {status} at {backup_hour}:{backup_minute}")
+                        messagebox.showinfo("Success",
+                                            f"Configuration saved!\nAutomatic backup {status} at {backup_hour}:{backup_minute}")
+                    else:
+                        raise subprocess.CalledProcessError(process.returncode, 'crontab')
+
+                except subprocess.CalledProcessError as e:
+                    # Jeśli nie ma uprawnień, pokaż instrukcje
+                    messagebox.showwarning("Cron Setup",
+                                           f"Automatic backup configuration requires manual setup.\n\n"
+                                           f"Run this command in terminal:\n\n"
+                                           f"crontab -e\n\n"
+                                           f"Then add this line:\n"
+                                           f"{cron_line}\n\n"
+                                           f"Or run ROTUP with sudo to enable automatic backup.")
+
+            except Exception as e:
+                messagebox.showwarning("Cron Error",
+                                       f"Could not configure automatic backup: {e}\n"
+                                       f"You may need to run with sudo privileges.")
+
+        else:  # Windows
+            try:
+                task_name = "ROTUP_AutoBackup"
+
+                if auto_enabled:
+                    rotup_path = os.path.join(core.BASE_DIR, "rotup.py")
+                    python_exe = sys.executable
+
+                    pythonw_exe = python_exe.replace('python.exe', 'pythonw.exe')
+                    if os.path.exists(pythonw_exe):
+                        python_exe = pythonw_exe
+
+                    # Usuń stare zadanie
+                    subprocess.run(['schtasks', '/Delete', '/TN', task_name, '/F'],
+                                   capture_output=True)
+
+                    # Utwórz nowe
+                    cmd = [
+                        'schtasks', '/Create', '/F',
+                        '/TN', task_name,
+                        '/TR', f'"{python_exe}" "{rotup_path}" --cron',
+                        '/SC', 'DAILY',
+                        '/ST', f'{backup_hour}:{backup_minute}',
+                        '/RL', 'HIGHEST',
+                        '/RU', 'SYSTEM'
+                    ]
+
+                    result = subprocess.run(cmd, capture_output=True, text=True)
+
+                    if result.returncode != 0:
+                        messagebox.showwarning("Task Scheduler Error",
+                                               "Could not create scheduled task.\nRun as Administrator.")
+                    else:
+                        messagebox.showinfo("Success",
+                                            f"Configuration saved!\nAutomatic backup enabled at {backup_hour}:{backup_minute}")
+                else:
+                    subprocess.run(['schtasks', '/Delete', '/TN', task_name, '/F'],
+                                   capture_output=True)
+                    messagebox.showinfo("Success", "Configuration saved!\nAutomatic backup disabled")
+
+            except Exception as e:
+                messagebox.showwarning("Task Scheduler Error", f"Error: {e}")
+
+        settings_win.destroy()
+# === SAVE BUTTON === (TO MUSI BYĆ NA KOŃCU, POZA save_settings!)
+    save_btn = tk.Button(
+        settings_win,
+        text="💾 SAVE CONFIGURATION",
+        command=save_settings,
+        bg="#4CAF50",
+        fg="white",
+        font=("Arial", 11, "bold"),
+        relief=tk.FLAT,
+        cursor="hand2",
+        pady=15
+    )
+    save_btn.pack(fill=tk.X, padx=20, pady=(0, 20))
+
+
+def read_log_page(path, end, page_bytes=LOG_PAGE_BYTES):
+    """Reads whole lines of the log file before byte offset end, returns (text, start offset)"""
+    with open(path, 'rb') as f:
+        start = max(0, end - page_bytes)
+        f.seek(start)
+        data = f.read(end - start)
+    if start > 0:
+        cut = data.find(b'\n') + 1  # Drop the partial first line, it belongs to the next page
+        if 0 < cut < len(data):
+            start += cut
+            data = data[cut:]
+    return data.decode('utf-8', 'replace'), start
+
+
+def open_log_history_window(root):
+    """Shows the run log from disk, older pages loaded on demand"""
+    path = core.LOG_FILE
+    if not path or not os.path.exists(path):
+        messagebox.showinfo("Log", "No log file yet - start a backup first.")
+        return
+    core.flush_log()
+
+    window = tk.Toplevel(root)
+    window.title(f"Log - {os.path.basename(path)}")
+    window.geometry("900x600")
+    state = {'start': os.path.getsize(path)}
+
+    def load_older():
+        text, state['start'] = read_log_page(path, state['start'])
+        view.configure(state=tk.NORMAL)
+        view.insert('1.0', text)
+        view.configure(state=tk.DISABLED)
+        view.see(f"1.0 + {text.count(chr(10))} lines")  # Keep the previously first line in view
+        if state['start'] == 0:
+            older_btn.configure(state=tk.DISABLED, text="Beginning of log")
+
+    older_btn = tk.Button(window, text="⬆️ Load older", command=load_older)
+    older_btn.pack(fill=tk.X)
+    view = scrolledtext.ScrolledText(window, wrap=tk.NONE, font=("Consolas", 9), state=tk.DISABLED)
+    view.pack(fill=tk.BOTH, expand=True)
+    load_older()
+    view.see(tk.END)
+
+
+def start_thread():
+    """Starts backup process in separate thread"""
+    # A running daemon does the backup itself - no second backup process
+    reply = daemon_request({'cmd': 'run'})
+    if reply is not None:
+        if reply.get('started'):
+            log_message("Backup started by ROTUP daemon (see daemon log)", "INFO")
+        else:
+            log_message("ROTUP daemon is already running a backup", "WARN")
+        return
+
+    print("[DEBUG] Starting backup thread...")
+
+    # Wyczyść logi
+    if TEXT_WIDGET:
+        TEXT_WIDGET.delete('1.0', tk.END)
+        TEXT_WIDGET.update()
+
+    # Pobierz root window
+    root = None
+    if TEXT_WIDGET:
+        root = TEXT_WIDGET.master
+        while root.master:
+            root = root.master
+
+    # Uruchom progress bar
+    if root and hasattr(root, 'progress_bar'):
+        root.progress_bar.configure(mode='indeterminate')
+        root.progress_bar.start(10)
+        root.progress_status.config(text="Backup in progress...", fg="#FF9800")
+        root.update()
+
+    def run_with_cleanup():
+        try:
+            # WAŻNE: Załaduj konfigurację przed backupem
+            if not core.CONFIG:
+                load_config()
+
+            if run_process():
+                messagebox.showinfo("Info", "Backup Completed Successfully!")
+            else:
+                messagebox.showerror("Error", "Backup failed! Check logs for details.")
+
+        except Exception as e:
+            log_message(f"Thread error: {e}", "ERROR")
+            traceback.print_exc()
+
+    core.set_progress_phase("preparing")  # Not the final phase of a previous run
+    worker = threading.Thread(target=run_with_cleanup, daemon=True)
+    worker.start()
+    if root and hasattr(root, 'progress_bar'):
+        root.after(PROGRESS_POLL_MS, show_progress, root, worker)
+
+
+def show_progress(root, worker):
+    """Shows progress published by the backup engine: determinate bar once totals are known"""
+    try:
+        progress = core.get_progress()
+        bar = root.progress_bar
+        if not worker.is_alive() or progress['phase'] in ("completed", "failed"):
+            # Zatrzymaj progress bar
+            bar.stop()
+            ok = progress['phase'] == "completed"
+            bar.configure(mode='determinate', value=100 if ok else 0)
+            root.progress_status.config(text="Completed" if ok else "Failed", fg="#4CAF50" if ok else "#F44336")
+            return
+        if progress.get('percent') is None:
+            if str(bar['mode']) != 'indeterminate':
+                bar.configure(mode='indeterminate')
+                bar.start(10)
+        else:
+            if str(bar['mode']) != 'determinate':
+                bar.stop()
+                bar.configure(mode='determinate', maximum=100)
+            bar['value'] = progress['percent']
+        root.progress_status.config(text=core.format_progress(progress))
+    except Exception as e:
+        log_message(f"Warning: Could not update progress bar: {e}", "WARN")
+        return
+    root.after(PROGRESS_POLL_MS, show_progress, root, worker)
+def main_ui():
+    def process_log_queue():
+        """Reads messages from background thread and updates GUI safely, in batches within a time budget"""
+        deadline = time.perf_counter() + LOG_DRAIN_BUDGET
+        chunks = []  # text, tag, text, tag... for a single insert call
+        try:
+            while time.perf_counter() < deadline:
+                msg, tag = core.LOG_QUEUE.get_nowait()
+                if chunks and chunks[-1] == tag:
+                    chunks[-2] += msg
+                else:
+                    chunks += [msg, tag]
+        except queue.Empty:
+            pass
+        finally:
+            if TEXT_WIDGET and chunks:
+                follow = TEXT_WIDGET.yview()[1] >= 0.999  # Do not scroll away when user reads older lines
+                TEXT_WIDGET.insert(tk.END, *chunks)
+                excess = int(TEXT_WIDGET.index('end-1c').split('.')[0]) - LOG_VIEW_MAX_LINES
+                if excess > 0:
+                    TEXT_WIDGET.delete('1.0', f"{excess + 1}.0")
+                if follow:
+                    TEXT_WIDGET.see(tk.END)
+            # Sprawdzaj kolejkę ponownie za 100ms (od razu, gdy zostały wiadomości)
+            if TEXT_WIDGET:
+                TEXT_WIDGET.after(1 if not core.LOG_QUEUE.empty() else LOG_POLL_MS, process_log_queue)
+    """Creates and runs main GUI window"""
+    global TEXT_WIDGET
+    print("[DEBUG] Initializing GUI...")
+    core.LOG_QUEUE = queue.Queue()
+
+    try:
+        root = tk.Tk()
+        root.title("ROTUP v0.7.1 - Rotation Backup Tool by Bejus")
+        root.geometry("800x650")
+        root.configure(bg="#f0f0f0")
+
+        # Modern color scheme
+        COLOR_PRIMARY = "#2196F3"
+        COLOR_SUCCESS = "#4CAF50"
+        COLOR_WARNING = "#FF9800"
+        COLOR_BG = "#f0f0f0"
+        COLOR_CARD = "#ffffff"
+
+        # Header frame                                                                                
+        header_frame = tk.Frame(root, bg=COLOR_PRIMARY, height=80)
+        header_frame.pack(fill=tk.X, padx=0, pady=0)
+        header_frame.pack_propagate(False)
+
+        # Title                                                                                       
+        title_label = tk.Label(
+            header_frame,
+            text="ROTUP",
+            font=("Arial", 24, "bold"),
+            bg=COLOR_PRIMARY,
+            fg="white"
+        )
+        title_label.pack(side=tk.LEFT, padx=20, pady=20)
+
+        subtitle_label = tk.Label(
+            header_frame,
+            text="Rotation Backup Tool v0.7.1 by Bejus",
+            font=("Arial", 10),
+            bg=COLOR_PRIMARY,
+            fg="white"
+        )
+        subtitle_label.place(x=20, y=50)
+
+        # Button container                                                                            
+        button_container = tk.Frame(root, bg=COLOR_BG)
+        button_container.pack(fill=tk.X, padx=20, pady=15)
+
+        def create_modern_button(parent, text, command, bg_color, emoji=""):
+            btn = tk.Button(
+                parent,
+                text=f"{emoji} {text}",
+                command=command,
+                bg=bg_color,
+                fg="white",
+                font=("Arial", 11, "bold"),
+                relief=tk.FLAT,
+                cursor="hand2",
+                padx=20,
+                pady=12,
+                borderwidth=0
+            )
+
+            def on_enter(e):
+                btn['bg'] = darken_color(bg_color)
+
+            def on_leave(e):
+                btn['bg'] = bg_color
+
+            btn.bind("<Enter>", on_enter)
+            btn.bind("<Leave>", on_leave)
+
+            return btn
+
+        def darken_color(hex_color):
+            hex_color = hex_color.lstrip('#')
+            r, g, b = tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+            r, g, b = int(r * 0.8), int(g * 0.8), int(b * 0.8)
+            return f'#{r:02x}{g:02x}{b:02x}'
+
+        # Settings button
+        settings_btn = create_modern_button(
+            button_container,
+            "SETTINGS",
+            lambda: open_settings_window(root),
+            COLOR_WARNING,
+            "⚙️"
+        )
+        settings_btn.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        # Start backup button
+        start_btn = create_modern_button(
+            button_container,
+            "START BACKUP",
+            start_thread,
+            COLOR_SUCCESS,
+            "▶️"
+        )
+        start_btn.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        # NOWY: Progress bar container
+        progress_container = tk.Frame(root, bg=COLOR_BG)
+        progress_container.pack(fill=tk.X, padx=20, pady=(0, 10))
+
+        progress_label = tk.Label(
+            progress_container,
+            text="⏳ Progress",
+            font=("Arial", 10, "bold"),
+            bg=COLOR_BG,
+            fg="#333333",
+            anchor="w"
+        )
+        progress_label.pack(fill=tk.X, pady=(0, 5))
+
+        # Progress bar
+        progress_bar = ttk.Progressbar(
+            progress_container,
+            mode='indeterminate',
+            length=300
+        )
+        progress_bar.pack(fill=tk.X)
+
+        # Progress status label
+        progress_status = tk.Label(
+            progress_container,
+            text="Ready",
+            font=("Arial", 9),
+            bg=COLOR_BG,
+            fg="#666666",
+            anchor="w"
+        )
+        progress_status.pack(fill=tk.X, pady=(5, 0))
+
+        # Przekaż widgety do globalnych
+        root.progress_bar = progress_bar
+        root.progress_status = progress_status
+
+        # Log area container
+        log_container = tk.Frame(root, bg=COLOR_BG)
+        log_container.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
+
+        # Header row: title + button opening the full log from disk
+        log_header = tk.Frame(log_container, bg=COLOR_BG)
+        log_header.pack(fill=tk.X, pady=(0, 5))
+
+        log_label = tk.Label(
+            log_header,
+            text="📋 Backup Log",
+            font=("Arial", 10, "bold"),
+            bg=COLOR_BG,
+            fg="#333333",
+            anchor="w"
+        )
+        log_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        older_btn = tk.Button(
+            log_header,
+            text="📜 Load older",
+            command=lambda: open_log_history_window(root),
+            font=("Arial", 8),
+            relief=tk.FLAT,
+            cursor="hand2"
+        )
+        older_btn.pack(side=tk.RIGHT)
+
+        log_frame = tk.Frame(log_container, bg=COLOR_CARD, relief=tk.FLAT, borderwidth=1)
+        log_frame.pack(fill=tk.BOTH, expand=True)
+
+        log_area = scrolledtext.ScrolledText(
+            log_frame,
+            wrap=tk.WORD,
+            bg="#fafafa",
+            fg="#333333",
+            font=("Consolas", 9),
+            relief=tk.FLAT,
+            borderwidth=0,
+            padx=10,
+            pady=10
+        )
+        log_area.pack(fill=tk.BOTH, expand=True, padx=2, pady=2)
+        TEXT_WIDGET = log_area
+        # Uruchom bezpieczne odświeżanie logów z kolejki
+        root.after(100, process_log_queue)
+        # TEST: Sprawdź czy logi działają
+        log_message("ROTUP GUI initialized successfully", "SUCCESS")
+        log_message("Ready to start backup", "INFO")
+
+        # Status bar
+        status_bar = tk.Frame(root, bg="#263238", height=25)
+        status_bar.pack(fill=tk.X, side=tk.BOTTOM)
+        status_bar.pack_propagate(False)
+
+        status_label = tk.Label(
+            status_bar,
+            text="Ready",
+            font=("Arial", 8),
+            bg="#263238",
+            fg="white",
+            anchor="w"
+        )
+        status_label.pack(side=tk.LEFT, padx=10)
+
+        # Load config and display status
+        load_config()
+        if core.CONFIG:
+            folders_count = len(core.CONFIG.get('source_directories', []))
+            status_text = f"Ready • {folders_count} folder(s) configured"
+            daemon_status = daemon_request({'cmd': 'status'}, timeout=0.5)
+            if daemon_status:
+                status_text += f" • Daemon: {daemon_status.get('state')}, next run {daemon_status.get('next_run') or '-'}"
+            status_label.config(text=status_text)
+
+        def on_close():
+            # Do not leave a mount running after the window is gone
+            cancel_running_commands()
+            root.destroy()
+
+        root.protocol("WM_DELETE_WINDOW", on_close)
+
+        print("[DEBUG] GUI created, starting mainloop...")
+        root.mainloop()
+        print("[DEBUG] GUI closed")
+    except Exception as e:
+        print(f"[CRITICAL] Error creating GUI: {e}")
+        traceback.print_exc()
+        input("Press Enter to exit...")
@@ -0,0 +1,278 @@
+import platform
+import os
+import datetime
+import threading
+import time
+import struct
+import select
+
+from rotup_core import BASE_DIR, CONFIG, CONFIG_POLL_INTERVAL, log_message
+
+# --- CHANGE JOURNAL ---
+
+JOURNAL_DIR = "journal"
+JOURNAL_MAX_PATHS = 1000000  # Distinct changed paths per generation - above that runs walk the tree again
+JOURNAL_KEEP_GENERATIONS = 64  # Backup runs a rotation disk may miss and still use the journal
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+JOURNAL_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+                      IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+JOURNAL_RETRY_MAX_S = 600  # Longest wait before watches are set up again after an error
+# Changes made by other hosts on these never reach local inotify
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p', 'ceph', 'glusterfs',
+                       'lustre', 'gpfs', 'fuse.sshfs', 'fuse.glusterfs', 'fuse.cephfs', 'fuse.s3fs', 'fuse.rclone'}
+CHANGE_JOURNAL = None  # ChangeJournal when a daemon/agent watches source directories
+INOTIFY_CREATE_MASK = 0x00000100 | 0x00000080  # IN_CREATE | IN_MOVED_TO
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+INOTIFY_IGNORED = 0x00008000  # Watch removed (directory deleted)
+
+
+class InotifyWatcher:
+    """Minimal inotify wrapper (ctypes) reporting names created in watched directories"""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self.get_errno = ctypes.get_errno
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(self.get_errno(), "inotify_init1 failed")
+        self.watches = {}  # watch descriptor -> directory
+
+    def add_watch(self, path, mask=INOTIFY_CREATE_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = self.get_errno()
+            raise OSError(errno, f"inotify_add_watch failed for {path}: {os.strerror(errno)}")
+        self.watches[wd] = path
+
+    def read_raw_events(self, timeout=None):
+        """Blocks until events arrive (or timeout), returns [(directory, mask, name)]"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        buf = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(buf):
+            wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(buf, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & INOTIFY_IGNORED:
+                self.watches.pop(wd, None)  # Directory deleted - kernel dropped the watch
+            events.append((self.watches.get(wd, ''), mask, name))
+        return events
+
+    def read_events(self, timeout=None):
+        """Blocks until something is created (or timeout), returns [(directory, name)]"""
+        return [(directory, name) for directory, mask, name in self.read_raw_events(timeout)]
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ChangeJournal:
+    """Records paths changed under source directories (inotify) in generations, one per backup run"""
+
+    # A session is one unbroken watch. Generations of a session are NUL-separated
+    # path lists in <dir>/<session>.<generation>.journal. Overflow, directory
+    # moves or too many changes end the session: runs then walk the whole tree
+    # until a run happens inside the next session.
+
+    def __init__(self, source_dirs, directory):
+        self.source_dirs = source_dirs
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.session = None  # None while watches are set up or after the session broke
+        self.generation = 0
+        self.paths = set()  # Changed paths of current generation
+        self.handle = None
+
+    def journal_path(self, generation):
+        return os.path.join(self.directory, f"{self.session}.{generation}.journal")
+
+    def start_session(self):
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            for name in os.listdir(self.directory):
+                if name.endswith(".journal"):
+                    os.remove(os.path.join(self.directory, name))  # Earlier sessions never match again
+            self.session = f"{datetime.datetime.now():%Y%m%d%H%M%S}-{os.getpid()}"
+            self.generation = 1
+            self.paths = set()
+            self.handle = open(self.journal_path(self.generation), 'ab')
+
+    def end_session(self, reason):
+        with self.lock:
+            if self.session is None:
+                return
+            log_message(f"Change journal reset ({reason}) - next backup scans all files", "WARN")
+            self.handle.close()
+            for generation in range(max(1, self.generation - JOURNAL_KEEP_GENERATIONS), self.generation + 1):
+                try:
+                    os.remove(self.journal_path(generation))
+                except OSError:
+                    pass
+            self.session = None
+
+    def record(self, path):
+        with self.lock:
+            if self.session is None or path in self.paths:
+                return
+            self.paths.add(path)
+            self.handle.write(os.fsencode(path) + b'\0')
+            overflow = len(self.paths) > JOURNAL_MAX_PATHS
+        if overflow:
+            self.end_session(f"more than {JOURNAL_MAX_PATHS} changed paths")
+
+    def flush(self):
+        with self.lock:
+            if self.session is not None:
+                self.handle.flush()
+
+    def rotate(self):
+        """Starts a new generation at the start of a backup run, returns its mark (None when not watching)"""
+        with self.lock:
+            if self.session is None:
+                return None
+            self.handle.close()
+            self.generation += 1
+            self.paths = set()
+            self.handle = open(self.journal_path(self.generation), 'ab')
+            try:
+                os.remove(self.journal_path(self.generation - JOURNAL_KEEP_GENERATIONS))
+            except OSError:
+                pass
+            return {'session': self.session, 'generation': self.generation}
+
+    def changes_since(self, mark, source_dirs, current=False):
+        """Paths changed since the run that recorded mark (up to the last rotate()), None when unknown"""
+        # current: include the generation still being recorded (preflight, before the run rotates)
+        if set(source_dirs) != set(self.source_dirs):
+            return None  # source_directories changed after the journal started
+        with self.lock:
+            if not mark or self.session is None or mark.get('session') != self.session:
+                return None
+            first = mark.get('generation', 0)
+            last = self.generation + 1 if current else self.generation
+            if first < self.generation - JOURNAL_KEEP_GENERATIONS + 1 or first >= last:
+                return None
+            if current:
+                self.handle.flush()
+            changes = set()
+            try:
+                for generation in range(first, last):
+                    with open(self.journal_path(generation), 'rb') as f:
+                        changes.update(os.fsdecode(p) for p in f.read().split(b'\0') if p)
+            except OSError:
+                return None
+            return changes
+
+    def add_tree(self, watcher, root):
+        """Watches root and every directory below it"""
+        pending = [root]
+        while pending:
+            path = pending.pop()
+            try:
+                watcher.add_watch(path, JOURNAL_WATCH_MASK)
+                with os.scandir(path) as it:
+                    pending.extend(e.path for e in it if e.is_dir(follow_symlinks=False))
+            except (FileNotFoundError, NotADirectoryError):
+                pass  # Removed or replaced meanwhile - parent watch reported it
+            except PermissionError as e:
+                # Backups cannot read it either; a chmod shows up as a change of the directory
+                print(f"[DEBUG] Change journal: not watching {path}: {e}")
+
+    def watch(self):
+        """One session: set up watches, then record events until the session breaks"""
+        watcher = InotifyWatcher()
+        try:
+            for source in self.source_dirs:
+                if os.path.isdir(source):
+                    self.add_tree(watcher, source)
+            self.start_session()
+            print(f"[DEBUG] Change journal: watching {len(watcher.watches)} directories, session {self.session}")
+            while self.session is not None:
+                events = watcher.read_raw_events(timeout=CONFIG_POLL_INTERVAL)
+                for directory, mask, name in events:
+                    path = os.path.join(directory, name) if name else directory
+                    if mask & IN_Q_OVERFLOW:
+                        self.end_session("inotify queue overflow")
+                        break
+                    if mask & (IN_DELETE_SELF | IN_MOVE_SELF) and directory in self.source_dirs:
+                        self.end_session(f"source directory {directory} removed or moved")
+                        break
+                    if mask & IN_ISDIR and mask & (IN_MOVED_FROM | IN_MOVED_TO):
+                        # Watches of a moved tree keep their old paths
+                        self.end_session(f"directory moved: {path}")
+                        break
+                    if mask & IN_ISDIR and mask & IN_CREATE:
+                        self.add_tree(watcher, path)  # Files made before the watch: whole dir is marked
+                    if name:
+                        self.record(path)
+                self.flush()
+        finally:
+            watcher.close()
+
+    def run(self):
+        delay = 1
+        while True:
+            try:
+                self.watch()
+                delay = 1
+            except OSError as e:
+                self.end_session(str(e))
+                delay = min(delay * 2, JOURNAL_RETRY_MAX_S)
+                log_message(f"Change journal error: {e} - retrying in {delay}s (raise fs.inotify.max_user_watches "
+                            "if it says 'No space left on device')", "WARN")
+            time.sleep(delay)  # Session broke - start a new one
+
+
+def get_filesystem_type(path):
+    """Returns type of the filesystem path is on, from /proc/mounts (None when unknown)"""
+    try:
+        with open("/proc/mounts", encoding='utf-8', errors='replace') as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) > 2]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, fs_type = "", None
+    for mount_point, mount_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")  # /proc/mounts escapes spaces
+        if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) >= len(best):
+            best, fs_type = mount_point, mount_type
+    return fs_type
+
+
+def start_change_journal():
+    """Starts the change journal watcher when change_journal is enabled (Linux daemon/agent)"""
+    global CHANGE_JOURNAL
+    if not CONFIG.get('change_journal', False):
+        return
+    if platform.system() != "Linux":
+        log_message("change_journal needs inotify (Linux) - incremental runs scan all files", "WARN")
+        return
+    source_dirs = list(CONFIG.get('source_directories', []))
+    for source in source_dirs:
+        fs_type = get_filesystem_type(source)
+        if fs_type in NETWORK_FILESYSTEMS:
+            log_message(f"change_journal disabled: {source} is on {fs_type} - inotify does not see changes "
+                        "made by other hosts, incremental runs scan all files", "WARN")
+            return
+    directory = CONFIG.get('change_journal_dir', os.path.join(BASE_DIR, JOURNAL_DIR))
+    CHANGE_JOURNAL = ChangeJournal(source_dirs, directory)
+    threading.Thread(target=CHANGE_JOURNAL.run, name="rotup-journal", daemon=True).start()
@@ -0,0 +1,391 @@
+import platform
+import os
+import subprocess
+import datetime
+import shutil
+import traceback
+
+import rotup_core as core
+from rotup_core import (CANCEL_EVENT, CONFIG, flush_log, get_psutil, initialize_logging, is_console_mode,
+                        load_config, log_message, lookup_disk_by_uuid, MOUNT_TIMEOUT, run_command,
+                        set_progress_phase, start_progress_reporter)
+from rotup_repository import restore_snapshot
+from rotup_backup import copy_log_to_disk, is_repository_format, run_backup_archive, verify_backup
+import rotup_preflight
+from rotup_preflight import preflight_check, record_backup_size
+
+# --- LOGIC: LINUX ---
+
+def find_and_mount_linux():
+    """Finds and mounts rotation disk on Linux"""
+    mounts = find_and_mount_all_linux(first_only=True)
+    return mounts[0] if mounts else None
+
+
+def find_and_mount_all_linux(first_only=False):
+    """Finds and mounts connected rotation disks on Linux, returns their mount points"""
+    # First disk goes to target_mount_point_linux, more disks (fan_out) to <mount point>_2, _3...
+    log_message("Linux: Searching for rotation disk...", "INFO")
+
+    mount_point = CONFIG.get('target_mount_point_linux', '/mnt/rotup_usb')
+    linux_disks = CONFIG.get('disk_rotation', {}).get('linux', [])
+
+    log_message(f"Checking for disks: {', '.join(linux_disks)}", "INFO")
+
+    # Exact lookup of each configured UUID - no probing of every block device
+    found = []
+    for full_uuid_entry in linux_disks:
+        uuid = full_uuid_entry.split('_')[-1]
+        disk = lookup_disk_by_uuid(uuid)
+        if disk:
+            log_message(f"Found disk from list: {full_uuid_entry} ({disk['device']})", "INFO")
+            found.append((full_uuid_entry, uuid, disk))
+            if first_only:
+                break
+
+    if not found:
+        log_message("No defined disk found.", "ERROR")
+        return []
+
+    mounts = []
+    for index, (full_uuid_entry, uuid, disk) in enumerate(found):
+        path = mount_point if index == 0 else f"{mount_point}_{index + 1}"
+        if mount_disk_linux(disk, uuid, path):
+            if not mounts:
+                core.ACTIVE_DISK = full_uuid_entry
+            mounts.append(path)
+    return mounts
+
+
+def mount_disk_linux(disk, uuid, mount_point):
+    """Mounts one rotation disk at mount_point, returns True on success"""
+    # Sprawdź czy punkt montowania już istnieje i jest zamontowany
+    try:
+        result = subprocess.run(
+            ['mount'],
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='ignore'
+        )
+
+        if result.returncode == 0 and mount_point in result.stdout:
+            log_message(f"Mount point {mount_point} already in use, unmounting...", "WARN")
+            subprocess.run(['umount', mount_point], stderr=subprocess.DEVNULL)
+    except:
+        pass
+
+    # Ensure mount point exists
+    try:
+        os.makedirs(mount_point, exist_ok=True)
+    except Exception as e:
+        log_message(f"Cannot create mount point: {e}", "ERROR")
+        return False
+
+    mount_cmd = [
+        'mount', '-t', 'ntfs-3g',
+        '-o',
+        f"defaults,uid={CONFIG.get('linux_user_uid', 1000)},gid={CONFIG.get('linux_user_gid', 1000)},remove_hiberfile,rw,exec",
+        disk['device'], mount_point
+    ]
+
+    log_message(f"Mounting disk to {mount_point}...", "INFO")
+    if not run_command(mount_cmd, f"Mount error UUID={uuid}", timeout=MOUNT_TIMEOUT):
+        return False
+
+    log_message("Disk mounted successfully", "INFO")
+    return True
+
+
+def backup_logic_linux(mount_path):
+    """Performs backup on Linux system"""
+    log_message("Starting Linux backup process...", "INFO")
+    source_dirs = CONFIG.get('source_directories', [])
+    if not source_dirs:
+        log_message("No source directories configured!", "ERROR")
+        return False
+
+    log_message(f"Source directories: {', '.join(source_dirs)}", "INFO")
+
+    if not preflight_check(mount_path, source_dirs):
+        subprocess.run(['umount', mount_path], stderr=subprocess.DEVNULL)
+        return False
+    free_before = shutil.disk_usage(mount_path).free
+
+    log_message("Creating ZIP archive...", "INFO")
+    try:
+        target = run_backup_archive(mount_path, source_dirs)
+        record_backup_size(mount_path, free_before)
+    except Exception as e:
+        log_message(f"ZIP Error: {e}", "ERROR")
+        traceback.print_exc()
+        # Unmount nawet po błędzie
+        subprocess.run(['umount', mount_path], stderr=subprocess.DEVNULL)
+        return False
+
+    if not verify_backup(target):
+        subprocess.run(['umount', mount_path], stderr=subprocess.DEVNULL)
+        return False
+
+    copy_log_to_disk(mount_path)
+    return True
+
+# --- LOGIC: WINDOWS ---
+
+def find_disk_windows():
+    """Finds rotation disk on Windows by volume label, returns drive letter or None"""
+    letters = find_disks_windows(first_only=True)
+    return letters[0] if letters else None
+
+
+def find_disks_windows(first_only=False):
+    """Finds connected rotation disks on Windows by volume label, returns drive letters"""
+    found_letters = []
+    windows_labels = CONFIG.get('disk_rotation', {}).get('windows', [])
+
+    if not windows_labels:
+        log_message("No Windows disks configured!", "ERROR")
+        return []
+
+    log_message(f"Looking for disks: {', '.join(windows_labels)}", "INFO")
+
+    for part in get_psutil().disk_partitions():
+        try:
+            drive_letter = part.device.rstrip('\\').rstrip(':')
+            cmd = f"(Get-Volume -DriveLetter '{drive_letter}').FileSystemLabel"
+
+            result = subprocess.run(
+                ['powershell', '-Command', cmd],
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                errors='ignore',
+                timeout=5
+            )
+
+            if result.returncode == 0:
+                label = result.stdout.strip()
+                print(f"[DEBUG] Checking disk {drive_letter}: label='{label}'")
+
+                if label in windows_labels:
+                    if not found_letters:
+                        core.ACTIVE_DISK = label
+                    found_letters.append(drive_letter)
+                    log_message(f"Found backup disk: {label} ({drive_letter}:)", "SUCCESS")
+                    if first_only:
+                        break
+
+        except subprocess.TimeoutExpired:
+            print(f"[DEBUG] Timeout checking {part.device}")
+        except Exception as e:
+            print(f"[DEBUG] Error checking {part.device}: {e}")
+            continue
+
+    if not found_letters:
+        log_message("No rotation disk found - please connect backup drive", "ERROR")
+    return found_letters
+
+
+def backup_logic_windows():
+    """Performs backup on Windows system"""
+    log_message("Starting Windows backup process", "INFO")
+    found_letter = find_disk_windows()
+    if not found_letter:
+        return False
+
+    source_dirs = CONFIG.get('source_directories', [])
+    if not source_dirs:
+        log_message("No source directories configured!", "ERROR")
+        return False
+
+    log_message(f"Source directories: {', '.join(source_dirs)}", "INFO")
+
+    # Convert paths to Windows format
+    sources_win = [s.replace('/', '\\') for s in source_dirs]
+
+    if not preflight_check(f"{found_letter}:\\", sources_win):
+        return False
+    free_before = shutil.disk_usage(f"{found_letter}:\\").free
+
+    log_message("Creating ZIP archive...", "INFO")
+    try:
+        target = run_backup_archive(f"{found_letter}:\\", sources_win)
+        record_backup_size(f"{found_letter}:\\", free_before)
+    except Exception as e:
+        log_message(f"ZIP Error: {e}", "ERROR")
+        traceback.print_exc()
+        return False
+
+    if not verify_backup(target):
+        return False
+
+    copy_log_to_disk(f"{found_letter}:\\")
+    return True
+
+# --- LOGIC: FAN-OUT ---
+
+def is_fan_out_enabled():
+    """fan_out: every connected rotation disk gets a copy of the same run"""
+    return bool(CONFIG.get('fan_out', False))
+
+
+def find_fan_out_disks():
+    """Finds (and mounts on Linux) every connected rotation disk, returns their root paths"""
+    if platform.system() == "Linux":
+        return find_and_mount_all_linux()
+    return [f"{letter}:\\" for letter in find_disks_windows()]
+
+
+def release_rotation_disk(disk_root):
+    """Unmounts a disk that gets no backup in this run (Windows disks stay as they are)"""
+    if platform.system() == "Linux":
+        subprocess.run(['umount', disk_root], stderr=subprocess.DEVNULL)
+
+
+def backup_logic_fan_out(disk_roots):
+    """Compresses sources once and writes the archive to every disk in disk_roots, True when all copies are good"""
+    source_dirs = CONFIG.get('source_directories', [])
+    if not source_dirs:
+        log_message("No source directories configured!", "ERROR")
+        for disk_root in disk_roots:
+            release_rotation_disk(disk_root)
+        return False
+    if platform.system() == "Windows":
+        source_dirs = [s.replace('/', '\\') for s in source_dirs]
+    log_message(f"Source directories: {', '.join(source_dirs)}", "INFO")
+
+    # Incremental and repository backups depend on what is on each disk already
+    if len(disk_roots) > 1 and (is_repository_format() or CONFIG.get('backup_mode', 'full') == 'incremental'):
+        log_message("fan_out works with full ZIP backups only - writing to the first disk", "WARN")
+        for disk_root in disk_roots[1:]:
+            release_rotation_disk(disk_root)
+        disk_roots = disk_roots[:1]
+    log_message(f"Fan-out: writing to {len(disk_roots)} disk(s): {', '.join(disk_roots)}", "INFO")
+
+    # Retention and the space check run per disk; all copies share one codec,
+    # the densest one any disk needed
+    targets = []
+    override = None
+    estimate = None
+    for disk_root in disk_roots:
+        if not preflight_check(disk_root, source_dirs):
+            release_rotation_disk(disk_root)
+            continue
+        if core.CODEC_OVERRIDE is not None and (override is None or rotup_preflight.PREFLIGHT['sampled'] < estimate['sampled']):
+            override, estimate = core.CODEC_OVERRIDE, rotup_preflight.PREFLIGHT
+        elif estimate is None:
+            estimate = rotup_preflight.PREFLIGHT
+        targets.append((disk_root, shutil.disk_usage(disk_root).free))
+    if not targets:
+        return False
+    core.CODEC_OVERRIDE, rotup_preflight.PREFLIGHT = override, estimate
+
+    log_message("Creating ZIP archive...", "INFO")
+    primary, free_before = targets[0]
+    try:
+        target = run_backup_archive(primary, source_dirs, [disk_root for disk_root, free in targets[1:]])
+        record_backup_size(primary, free_before)
+    except Exception as e:
+        log_message(f"ZIP Error: {e}", "ERROR")
+        traceback.print_exc()
+        for disk_root, free in targets:
+            release_rotation_disk(disk_root)
+        return False
+
+    good = 0
+    for disk_root, free in targets:
+        copy = os.path.join(disk_root, os.path.basename(target))
+        if os.path.exists(copy) and verify_backup(copy):
+            copy_log_to_disk(disk_root)
+            good += 1
+        else:
+            log_message(f"Fan-out: copy on {disk_root} is not usable", "ERROR")
+            release_rotation_disk(disk_root)
+    log_message(f"Fan-out: {good} of {len(disk_roots)} disks have a good copy",
+                "INFO" if good == len(disk_roots) else "WARN")
+    return good == len(disk_roots)
+
+# --- BACKUP RUN ---
+
+def run_process():
+    """Main backup process logic"""
+    print("[DEBUG] Starting backup process...")
+    if not CONFIG:
+        if not load_config():
+            log_message("No configuration found! Click SETTINGS.", "WARN")
+            return False
+
+    initialize_logging()
+    CANCEL_EVENT.clear()
+    core.CODEC_OVERRIDE = None  # Preflight codec switch applies to one run only
+    log_message("=== ROTUP BACKUP STARTED ===", "INFO")
+    log_message(f"Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", "INFO")
+    log_message(f"System: {platform.system()} {platform.release()}", "INFO")
+
+    sys_os = platform.system()
+    ok = False
+    set_progress_phase("preparing")
+    # Headless runs have no progress bar - progress goes to console and log instead
+    reporter = start_progress_reporter() if is_console_mode() else None
+
+    try:
+        if sys_os == "Linux":
+            log_message("Platform: Linux detected", "INFO")
+            if is_fan_out_enabled():
+                mounts = find_fan_out_disks()
+                if mounts:
+                    ok = backup_logic_fan_out(mounts)
+                else:
+                    log_message("Failed to mount disk", "ERROR")
+            else:
+                mp = find_and_mount_linux()
+                if mp:
+                    log_message(f"Disk mounted at: {mp}", "INFO")
+                    ok = backup_logic_linux(mp)
+                else:
+                    log_message("Failed to mount disk", "ERROR")
+        elif sys_os == "Windows":
+            log_message("Platform: Windows detected", "INFO")
+            if is_fan_out_enabled():
+                disk_roots = find_fan_out_disks()
+                ok = backup_logic_fan_out(disk_roots) if disk_roots else False
+            else:
+                ok = backup_logic_windows()
+        else:
+            log_message(f"Unsupported OS: {sys_os}", "ERROR")
+    except Exception as e:
+        log_message(f"Critical error during backup: {e}", "ERROR")
+        traceback.print_exc()
+    finally:
+        if reporter:
+            reporter.set()
+    set_progress_phase("completed" if ok else "failed")
+
+    if ok:
+        log_message("=== BACKUP COMPLETED SUCCESSFULLY ===", "INFO")
+    else:
+        log_message("=== BACKUP FAILED ===", "ERROR")
+
+    log_message("--- SUCCESS ---" if ok else "--- FAILED ---")
+    flush_log()
+    return ok
+
+
+def run_restore(snapshot_name, destination):
+    """Restores a repository snapshot from the connected rotation disk"""
+    initialize_logging()
+    log_message(f"=== ROTUP RESTORE: {snapshot_name} ===", "INFO")
+    if platform.system() == "Linux":
+        disk_root = find_and_mount_linux()
+    else:
+        letter = find_disk_windows()
+        disk_root = f"{letter}:\\" if letter else None
+    if not disk_root:
+        log_message("Failed to find rotation disk", "ERROR")
+        return False
+    try:
+        return restore_snapshot(disk_root, snapshot_name, destination)
+    except Exception as e:
+        log_message(f"Restore failed: {e}", "ERROR")
+        traceback.print_exc()
+        return False
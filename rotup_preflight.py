@@ -0,0 +1,465 @@
+import json
+import os
+import datetime
+import shutil
+import stat
+import zipfile
+import random
+import itertools
+import bisect
+import re
+
+import rotup_core as core
+from rotup_core import BASE_DIR, CONFIG, log_message, set_progress_phase
+from rotup_archive import (CHECKPOINT_SUFFIX, CODECS, get_compression_codec, get_resumable_bytes,
+                           is_incompressible, iter_scanned_file_states, iter_scanned_files,
+                           iter_source_entries, make_codec, scan_sources)
+import rotup_journal
+from rotup_repository import ChunkRepository, REPOSITORY_DIR
+from rotup_backup import apply_journal_changes, is_repository_format, load_manifest, needs_full_backup
+
+# --- PREFLIGHT ---
+
+PREFLIGHT_SAMPLE_BLOCKS = 256  # Random blocks read from the sources for the size estimate
+PREFLIGHT_BLOCK_SIZE = 64 * 1024
+PREFLIGHT_MARGIN = 1.10  # Required free space = estimate + 10%
+PREFLIGHT_MIN_RESERVE = 64 * 1024 * 1024  # Logs, manifest, filesystem metadata
+PREFLIGHT_RESTAT_SIZE = 1024 * 1024  # Bigger files are stat()ed even when the scan shows them unchanged
+ZIP_ENTRY_OVERHEAD = 200  # Local header + central directory record + ZIP64 extra, without names
+SIZE_HISTORY_FILE = "size_history.json"
+SIZE_HISTORY_LENGTH = 100
+SIZE_HISTORY_RUNS = 10  # Recent runs of the same kind used for the correction factor
+DEFAULT_PREFLIGHT_ACTIONS = ["codec"]
+DENSER_CODECS = [("deflate", 9), ("zstd", 19), ("bzip2", 9), ("lzma", 6)]  # Tried in this order
+PREFLIGHT = None  # Estimate of the current run, completed by record_backup_size()
+
+
+def get_size_history_path():
+    """Estimate/actual history lives next to config.json (size_history_file to change)"""
+    return CONFIG.get('size_history_file', os.path.join(BASE_DIR, SIZE_HISTORY_FILE))
+
+
+def load_size_history():
+    """Returns list of recorded runs, oldest first"""
+    try:
+        with open(get_size_history_path(), 'r', encoding='utf-8') as f:
+            history = json.load(f)
+        return history if isinstance(history, list) else []
+    except (OSError, ValueError):
+        return []
+
+
+def get_size_correction(kind, scope):
+    """Median of actual/sampled size of recent runs of this kind and scope (None without history)"""
+    # Runs recorded before scopes existed sampled the whole tree
+    ratios = [run['actual'] / run['sampled'] for run in load_size_history()
+              if run.get('kind') == kind and run.get('scope', 'tree') == scope and run.get('sampled')]
+    ratios = ratios[-SIZE_HISTORY_RUNS:]
+    if not ratios:
+        return None
+    ratios.sort()
+    return ratios[len(ratios) // 2]
+
+
+def get_backup_kind(disk_root):
+    """'repository', 'incremental' or 'full' - what the next run will write to this disk"""
+    if is_repository_format():
+        return "repository"
+    if CONFIG.get('backup_mode', 'full') != 'incremental':
+        return "full"
+    return "full" if needs_full_backup(load_manifest(disk_root), verbose=False) else "incremental"
+
+
+def get_parent_snapshot_files(disk_root):
+    """{path: [size, mtime_ns, inode]} of the newest repository snapshot on the disk ({} without one)"""
+    if not os.path.isdir(os.path.join(disk_root, REPOSITORY_DIR, 'snapshots')):
+        return {}
+    repo = ChunkRepository(os.path.join(disk_root, REPOSITORY_DIR))
+    snapshots = repo.list_snapshots()
+    if not snapshots:
+        return {}
+    return {entry[0]: entry[1:4] for entry in repo.load_snapshot(snapshots[-1]).get('files', [])}
+
+
+def collect_run_files(disk_root, source_dirs, kind):
+    """Files the next run will write: ([(path, size)], 'tree' or 'changes')"""
+    if kind == "full":
+        scan, hits = scan_sources(source_dirs)
+        files = list(iter_scanned_files(scan))
+        files += [(source, os.path.getsize(source)) for source in source_dirs if os.path.isfile(source)]
+        return files, "tree"
+
+    # Incremental runs and repository snapshots write only new and changed files
+    changes = None
+    if kind == "incremental":
+        manifest = load_manifest(disk_root)
+        old_files = manifest.get('files', {})
+        if rotup_journal.CHANGE_JOURNAL:
+            changes = rotup_journal.CHANGE_JOURNAL.changes_since(manifest.get('journal'), source_dirs, current=True)
+    else:
+        old_files = get_parent_snapshot_files(disk_root)
+    if changes is None:
+        # No journal: take names, sizes and mtimes from the (cached) source scan instead
+        # of a stat() walk - the totals scan reuses it. Listings of directories with
+        # unchanged mtime come from the cache and miss files rewritten in place
+        # (databases, VM images), so only files big enough to matter are stat()ed.
+        scan, hits = scan_sources(source_dirs)
+        files = []
+        for path, size, mtime_ns in iter_scanned_file_states(scan):
+            old = old_files.get(path, [])[:2]
+            if old == [size, mtime_ns] and size >= PREFLIGHT_RESTAT_SIZE:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                size, mtime_ns = st.st_size, st.st_mtime_ns
+            if old != [size, mtime_ns]:
+                files.append((path, size))
+        for source in source_dirs:
+            if os.path.isfile(source):
+                st = os.stat(source)
+                if old_files.get(source, [])[:2] != [st.st_size, st.st_mtime_ns]:
+                    files.append((source, st.st_size))
+        return files, "changes"
+
+    roots = apply_journal_changes(source_dirs, changes, old_files)[0]  # Only changed paths are walked
+    files = []
+    for path, is_dir, entry in iter_source_entries(roots):
+        if is_dir:
+            continue
+        try:
+            st = entry.stat() if entry is not None else os.stat(path)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode) and old_files.get(path, [])[:3] != [st.st_size, st.st_mtime_ns, st.st_ino]:
+            files.append((path, st.st_size))
+    return files, "changes"
+
+
+def collect_size_sample(files):
+    """Reads random blocks, chosen by byte position over [(path, size)], returns ([(path, block)], files, bytes)"""
+    offsets = list(itertools.accumulate(size for path, size in files))
+    total = offsets[-1] if offsets else 0
+    sample = []
+    if not total:
+        return sample, len(files), total
+    rng = random.Random()
+    for position in sorted(rng.randrange(total) for _ in range(PREFLIGHT_SAMPLE_BLOCKS)):
+        index = bisect.bisect_right(offsets, position)
+        path, size = files[index]
+        start = min(position - (offsets[index] - size), max(0, size - PREFLIGHT_BLOCK_SIZE))
+        try:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                block = f.read(PREFLIGHT_BLOCK_SIZE)
+        except OSError:
+            continue
+        if block:
+            sample.append((path, block))
+    return sample, len(files), total
+
+
+def estimate_sample_ratio(sample, codec):
+    """Compressed/original size of the sample as the archive engine would write it"""
+    raw = packed = 0
+    for path, block in sample:
+        raw += len(block)
+        if codec.compress_type == zipfile.ZIP_STORED or is_incompressible(path, block):
+            packed += len(block)
+            continue
+        compressor = zipfile._get_compressor(codec.compress_type, codec.level)
+        packed += min(len(compressor.compress(block)) + len(compressor.flush()), len(block))
+    return packed / raw if raw else 1.0
+
+
+def pick_denser_codec(sample, codec, files, total, correction, free):
+    """First codec denser than codec whose estimate fits in free space: (codec, sampled size) or None"""
+    current = estimate_sample_ratio(sample, codec)
+    for name, level in DENSER_CODECS:
+        if name not in CODECS:
+            continue
+        candidate = make_codec(name, level)
+        if candidate == codec:
+            continue
+        ratio = estimate_sample_ratio(sample, candidate)
+        sampled = total * ratio + files * ZIP_ENTRY_OVERHEAD
+        needed = sampled * correction * PREFLIGHT_MARGIN + PREFLIGHT_MIN_RESERVE
+        print(f"[DEBUG] Preflight: {name} level {candidate.level} ratio {ratio:.3f} (current {current:.3f}), "
+              f"needs {needed / 1048576:.0f} MB")
+        if ratio < current and needed <= free:
+            return candidate, sampled
+    return None
+
+
+def preflight_check(disk_root, source_dirs):
+    """Estimates output size from a random sample before writing; makes room, switches codec or aborts"""
+    global PREFLIGHT
+    core.CODEC_OVERRIDE = None
+    PREFLIGHT = None
+    actions = CONFIG.get('preflight_actions', DEFAULT_PREFLIGHT_ACTIONS)
+    # Rules apply on every run, whether or not the estimate below works out
+    if is_retention_enabled():
+        apply_retention(disk_root)
+    set_progress_phase("estimating")
+    try:
+        codec = get_compression_codec(source_dirs)
+        kind = get_backup_kind(disk_root)
+        try:
+            run_files, scope = collect_run_files(disk_root, source_dirs, kind)
+        except (OSError, ValueError, RuntimeError) as e:
+            log_message(f"Preflight: cannot tell which files changed ({e}) - estimating the whole tree", "WARN")
+            run_files, scope = collect_run_files(disk_root, source_dirs, "full")[0], "tree"
+        sample, files, total = collect_size_sample(run_files)
+        sampled = total * estimate_sample_ratio(sample, codec) + files * ZIP_ENTRY_OVERHEAD
+        correction = get_size_correction(kind, scope)
+        # Data of an interrupted run is kept when the archive is continued
+        resumable = get_resumable_bytes(disk_root)
+        free = shutil.disk_usage(disk_root).free + resumable
+    except Exception as e:
+        log_message(f"Preflight estimate failed ({e}) - continuing without it", "WARN")
+        check_retention_quota(disk_root)
+        return True
+
+    # Whole tree sampled for a run that writes only changes: without earlier runs to
+    # scale it, the estimate is only an upper bound - record it, but do not act on it
+    upper_bound = correction is None and scope == "tree" and kind != "full"
+    correction = correction or 1.0
+    estimate = sampled * correction
+    needed = estimate * PREFLIGHT_MARGIN + PREFLIGHT_MIN_RESERVE
+    log_message(f"Preflight: {kind} backup, {files} {'changed ' if scope == 'changes' else ''}files of "
+                f"{total / 1073741824:.2f} GB, estimated {estimate / 1073741824:.2f} GB "
+                f"({codec.name}, correction {correction:.2f} from earlier runs), "
+                f"free on disk {free / 1073741824:.2f} GB", "INFO")
+    PREFLIGHT = {'kind': kind, 'scope': scope, 'codec': f"{codec.name}:{codec.level}", 'source_bytes': total,
+                 'sampled': sampled, 'estimate': estimate}
+    if upper_bound:
+        log_message("Preflight: no earlier runs to scale the whole-tree estimate - not aborting", "WARN")
+        check_retention_quota(disk_root)
+        return True
+    check_retention_quota(disk_root, estimate)
+    if needed <= free:
+        return True
+
+    log_message(f"Preflight: estimated {needed / 1073741824:.2f} GB needed, only {free / 1073741824:.2f} GB free",
+                "WARN")
+    for action in actions:
+        if action == "codec":
+            denser = pick_denser_codec(sample, codec, files, total, correction, free)
+            if denser:
+                core.CODEC_OVERRIDE, sampled = denser
+                PREFLIGHT.update(codec=f"{core.CODEC_OVERRIDE.name}:{core.CODEC_OVERRIDE.level}", sampled=sampled,
+                                 estimate=sampled * correction)
+                log_message(f"Preflight: switching to {core.CODEC_OVERRIDE.name} level {core.CODEC_OVERRIDE.level} "
+                            f"for this run to fit the disk", "WARN")
+                return True
+        elif action == "continue":
+            log_message("Preflight: continuing anyway (preflight_actions contains 'continue')", "WARN")
+            return True
+    log_message("Preflight: backup does not fit on the rotation disk - aborting before writing anything", "ERROR")
+    return False
+
+
+def record_backup_size(disk_root, free_before):
+    """Stores estimate and actual size of this run, later estimates are corrected with it"""
+    if not PREFLIGHT:
+        return
+    actual = max(0, free_before - shutil.disk_usage(disk_root).free)
+    estimate = PREFLIGHT['estimate']
+    log_message(f"Backup size: {actual / 1048576:.1f} MB written, estimated {estimate / 1048576:.1f} MB", "INFO")
+    history = load_size_history()
+    history.append(dict(PREFLIGHT, actual=actual, disk=core.ACTIVE_DISK,
+                        date=datetime.datetime.now().isoformat(timespec='seconds')))
+    path = get_size_history_path()
+    try:
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(history[-SIZE_HISTORY_LENGTH:], f, indent=1)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"[DEBUG] Cannot write size history {path}: {e}")
+
+# --- RETENTION ---
+
+RETENTION_RULES = ('retention_keep_last', 'retention_daily', 'retention_weekly', 'retention_monthly')
+
+
+def get_retention_count(key):
+    """Number of restore points kept by one retention rule (0 = rule off)"""
+    value = CONFIG.get(key, 0)
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        log_message(f"Invalid {key} '{value}', ignoring it", "WARN")
+        return 0
+
+
+def get_retention_quota():
+    """Bytes backups may take on one rotation disk (retention_quota_gb), None = no quota"""
+    value = CONFIG.get('retention_quota_gb', 0)
+    try:
+        quota = float(value)
+    except (TypeError, ValueError):
+        log_message(f"Invalid retention_quota_gb '{value}', ignoring it", "WARN")
+        return None
+    return int(quota * 1073741824) if quota > 0 else None
+
+
+def is_retention_enabled():
+    """Old backups are deleted only when a retention rule or quota is configured"""
+    return any(get_retention_count(key) for key in RETENTION_RULES) or get_retention_quota() is not None
+
+
+def list_backup_chains(disk_root):
+    """ZIP backups on the disk grouped as full backup + its incrementals, oldest first: [[(date, name)]]"""
+    # <prefix>_<YYYY_MM_DD>.zip (full) and <prefix>_<YYYY_MM_DD>_<HHMMSS>_incr.zip
+    prefix = re.escape(CONFIG.get('backup_filename_prefix', 'backup'))
+    pattern = re.compile(prefix + r"_(\d{4}_\d{2}_\d{2})(?:_(\d{6}))?(_incr)?\.zip")
+    archives = []
+    for name in os.listdir(disk_root):
+        match = pattern.fullmatch(name)
+        if not match or os.path.exists(os.path.join(disk_root, name + CHECKPOINT_SUFFIX)):
+            continue  # Interrupted archives are continued or deleted by the next run
+        try:
+            day = datetime.datetime.strptime(match.group(1), "%Y_%m_%d").date()
+            # Full backups (and older incrementals) have no time in the name - file time orders them
+            run_time = match.group(2) or datetime.datetime.fromtimestamp(
+                os.path.getmtime(os.path.join(disk_root, name))).strftime("%H%M%S")
+        except (ValueError, OSError):
+            continue
+        archives.append((day, run_time, bool(match.group(3)), name))
+    chains = []
+    for day, run_time, incremental, name in sorted(archives):
+        if not incremental or not chains:
+            chains.append([])
+        chains[-1].append((day, name))
+    return chains
+
+
+def select_retained(chains):
+    """Names of backups kept by keep-last-N and GFS rules, with everything their restore needs"""
+    newest = [(day, (index, position)) for index, chain in enumerate(chains)
+              for position, (day, name) in enumerate(chain)][::-1]
+    keep = {point for day, point in newest[:get_retention_count('retention_keep_last')]}
+    buckets = (('retention_daily', lambda day: day),
+               ('retention_weekly', lambda day: day.isocalendar()[:2]),
+               ('retention_monthly', lambda day: (day.year, day.month)))
+    for key, bucket in buckets:
+        count = get_retention_count(key)
+        seen = set()
+        for day, point in newest:
+            if len(seen) >= count:
+                break
+            if bucket(day) not in seen:
+                seen.add(bucket(day))
+                keep.add(point)  # Newest backup of each day/week/month
+    if chains:
+        keep.add((len(chains) - 1, len(chains[-1]) - 1))  # Next incremental builds on the newest chain
+    # Restore point needs the full backup and every earlier incremental of its chain
+    retained = {core.BACKUP_FILENAME}
+    for index, position in keep:
+        retained.update(name for day, name in chains[index][:position + 1])
+    return retained
+
+
+def get_backup_usage(disk_root):
+    """Bytes taken by backups and their logs (or the repository) on the disk"""
+    if is_repository_format():
+        repo_root = os.path.join(disk_root, REPOSITORY_DIR)
+        return sum(os.path.getsize(os.path.join(dirpath, name))
+                   for dirpath, dirnames, filenames in os.walk(repo_root) for name in filenames)
+    prefix = CONFIG.get('backup_filename_prefix', 'backup') + "_"
+    used = 0
+    for entry in os.scandir(disk_root):
+        if entry.name.startswith(prefix) and entry.name.endswith(('.zip', '.log')) and entry.is_file():
+            used += entry.stat().st_size
+    return used
+
+
+def delete_backup(disk_root, name, remaining):
+    """Deletes backup archive, and its day's log once no archive of that day is left; returns bytes freed"""
+    freed = 0
+    stem = name[:len(CONFIG.get('backup_filename_prefix', 'backup')) + len("_YYYY_MM_DD")]  # Log is per day
+    remaining.discard(name)
+    paths = [name]
+    if not any(other.startswith(stem) for other in remaining):
+        paths.append(stem + ".log")
+    for path in paths:
+        path = os.path.join(disk_root, path)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log_message(f"Cannot delete {path}: {e}", "WARN")
+    return freed
+
+
+def list_snapshot_chains(repo):
+    """Repository snapshots as chains of one restore point each, oldest first: [[(date, name)]]"""
+    # Snapshots do not depend on each other - any of them can go
+    return [[(datetime.date.fromtimestamp(os.path.getmtime(repo.snapshot_path(name))), name)]
+            for name in repo.list_snapshots()]
+
+
+def apply_retention(disk_root):
+    """Deletes backups (or repository snapshots) outside the retention rules before a run writes"""
+    # The newest restore point is always kept, so incrementals and the next
+    # snapshot's parent stay usable
+    try:
+        if is_repository_format():
+            if not os.path.isdir(os.path.join(disk_root, REPOSITORY_DIR, 'snapshots')):
+                return
+            repo = ChunkRepository(os.path.join(disk_root, REPOSITORY_DIR))
+            repo.open()
+            chains = list_snapshot_chains(repo)
+        else:
+            repo = None
+            chains = list_backup_chains(disk_root)
+    except (OSError, ValueError, RuntimeError) as e:
+        log_message(f"Retention: cannot list backups on {disk_root}: {e}", "WARN")
+        return
+    retained = select_retained(chains)
+    remaining = {name for chain in chains for day, name in chain}
+
+    # Oldest chain first, newest first inside a chain - what is left of it can still be restored
+    candidates = [name for chain in chains for day, name in reversed(chain) if name not in retained]
+    deleted = freed = 0
+    for name in candidates:
+        log_message(f"Retention: deleting {name}", "INFO")
+        if repo:
+            try:
+                repo.delete_snapshot(name)
+            except OSError as e:
+                log_message(f"Cannot delete snapshot {name}: {e}", "WARN")
+                continue
+            remaining.discard(name)
+        else:
+            freed += delete_backup(disk_root, name, remaining)
+        deleted += 1
+    if repo and deleted:
+        try:
+            freed = repo.collect_garbage()
+        except (OSError, ValueError, RuntimeError) as e:
+            log_message(f"Retention: cannot remove unreferenced chunks: {e}", "WARN")
+    if deleted:
+        log_message(f"Retention: deleted {deleted} backups ({freed / 1073741824:.2f} GB), "
+                    f"{len(remaining)} left on disk", "INFO")
+
+
+def check_retention_quota(disk_root, estimate=0):
+    """Warns when backups kept by the rules, plus the estimated new one, exceed retention_quota_gb"""
+    quota = get_retention_quota()
+    if quota is None:
+        return True
+    try:
+        used = get_backup_usage(disk_root)
+    except OSError as e:
+        log_message(f"Retention: cannot measure backups on {disk_root}: {e}", "WARN")
+        return True
+    if used + estimate <= quota:
+        return True
+    log_message(f"Retention: backups kept by the rules take {used / 1073741824:.2f} GB"
+                f"{f' + {estimate / 1073741824:.2f} GB for this run' if estimate else ''}, "
+                f"quota is {quota / 1073741824:.2f} GB - lower the retention_* counts", "WARN")
+    return False
@@ -0,0 +1,457 @@
+import json
+import os
+import datetime
+import threading
+import stat
+import zlib
+import collections
+import hashlib
+import gzip
+import concurrent.futures
+import queue
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+try:
+    import lzma
+except ImportError:
+    lzma = None
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+import rotup_core as core
+from rotup_core import (add_progress, cache_get, cache_put, CANCEL_EVENT, check_cancelled, log_message,
+                        set_progress_phase)
+from rotup_archive import (ARCHIVE_WRITE_BUFFER, get_compression_codec, get_compression_workers,
+                           is_incompressible, iter_archive_jobs, iter_file_chunks, PARALLEL_MEMBER_LIMIT,
+                           refresh_store_extensions, scan_source_totals, SourceReadError, STORE_CODEC)
+
+# --- CHUNK REPOSITORY ---
+
+REPOSITORY_DIR = "rotup_repo"
+REPOSITORY_VERSION = 1
+CDC_MIN_CHUNK = 256 * 1024
+CDC_MAX_CHUNK = 4 * 1024 * 1024
+CDC_READ_SIZE = 8 * 1024 * 1024
+# Chunk boundary = end of this 20-bit pattern in the bit projection of the data.
+# It depends only on the last 20 bytes, so an insertion shifts chunks instead of
+# changing all of them (~1 MB average chunk). translate()/find() run at C speed.
+CDC_MARKER = b'10110010011101000110'
+CDC_BIT_TABLE = bytes(b'01'[hashlib.blake2b(bytes([i]), digest_size=1).digest()[0] & 1]
+                      for i in range(256))
+PACK_TARGET_SIZE = 64 * 1024 * 1024
+REPACK_MIN_WASTE = 0.25  # Packs are rewritten by collect_garbage() once this share of them is unreferenced
+CHUNK_STORED = 0
+CHUNK_DEFLATED = 1
+CHUNK_BZIP2 = 2
+CHUNK_LZMA = 3
+CHUNK_ZSTD = 4
+
+
+def find_chunk_cut(buf):
+    """Returns length of the next content-defined chunk at the start of buf"""
+    window_start = CDC_MIN_CHUNK - len(CDC_MARKER)
+    if len(buf) <= CDC_MIN_CHUNK:
+        return len(buf)
+    bits = bytes(buf[window_start:CDC_MAX_CHUNK]).translate(CDC_BIT_TABLE)
+    pos = bits.find(CDC_MARKER)
+    if pos < 0:
+        return min(len(buf), CDC_MAX_CHUNK)
+    return window_start + pos + len(CDC_MARKER)
+
+
+def iter_content_chunks(path):
+    """Yields content-defined chunks of a file"""
+    buf = bytearray()
+    for data in iter_file_chunks(path, CDC_READ_SIZE):
+        buf += data
+        while len(buf) >= CDC_MAX_CHUNK:
+            cut = find_chunk_cut(buf)
+            yield bytes(buf[:cut])
+            del buf[:cut]
+    while buf:
+        cut = find_chunk_cut(buf)
+        yield bytes(buf[:cut])
+        del buf[:cut]
+
+
+def compress_chunk(codec, data):
+    """Compresses chunk with codec, returns (chunk codec id, payload)"""
+    if codec.name == "deflate":
+        return CHUNK_DEFLATED, zlib.compress(data, codec.level)
+    if codec.name == "bzip2":
+        return CHUNK_BZIP2, bz2.compress(data, codec.level)
+    if codec.name == "lzma":
+        return CHUNK_LZMA, lzma.compress(data, preset=codec.level)
+    if codec.name == "zstd":
+        return CHUNK_ZSTD, zstd.compress(data, level=codec.level)
+    return CHUNK_STORED, data
+
+
+def decompress_chunk(chunk_codec, payload):
+    """Decompresses chunk payload stored with given chunk codec id"""
+    if chunk_codec == CHUNK_DEFLATED:
+        return zlib.decompress(payload)
+    if chunk_codec == CHUNK_BZIP2:
+        return bz2.decompress(payload)
+    if chunk_codec == CHUNK_LZMA:
+        return lzma.decompress(payload)
+    if chunk_codec == CHUNK_ZSTD:
+        if not zstd:
+            raise RuntimeError("Chunk is zstd-compressed but zstd is not available in this Python")
+        return zstd.decompress(payload)
+    return payload
+
+
+def prepare_chunk(repo, data, codec):
+    """Hashes chunk and compresses it if repository does not have it yet (worker thread)"""
+    chunk_id = hashlib.blake2b(data, digest_size=32).hexdigest()
+    if repo.has_chunk(chunk_id):
+        return chunk_id, None, len(data), CHUNK_STORED
+    if codec is not STORE_CODEC:
+        chunk_codec, packed = compress_chunk(codec, data)
+        if len(packed) < len(data):
+            return chunk_id, packed, len(data), chunk_codec
+    return chunk_id, data, len(data), CHUNK_STORED
+
+
+def prepare_file_chunks(repo, path, codec):
+    """Chunks and prepares a whole (small) file in memory (worker thread)"""
+    prepared = []
+    for chunk in iter_content_chunks(path):
+        if not prepared and codec is not STORE_CODEC and is_incompressible(path, chunk):
+            codec = STORE_CODEC
+        prepared.append(prepare_chunk(repo, chunk, codec))
+    return prepared
+
+
+class ChunkRepository:
+    """Deduplicating chunk store on rotation disk: packs/, index/ and snapshots/"""
+
+    def __init__(self, root):
+        self.root = root
+        self.index = {}  # chunk id -> (pack id, offset, length, raw length, codec)
+        self.pack_id = None
+        self.pack_file = None
+        self.pack_entries = {}
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def open(self):
+        """Creates repository layout if needed and loads chunk index"""
+        for sub in ('packs', 'index', 'snapshots'):
+            os.makedirs(self._path(sub), exist_ok=True)
+        config_path = self._path('repository.json')
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                repo_config = json.load(f)
+            if repo_config.get('version') != REPOSITORY_VERSION:
+                raise RuntimeError(f"Unsupported repository version {repo_config.get('version')}")
+        else:
+            with open(config_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': REPOSITORY_VERSION, 'hash': 'blake2b-256',
+                           'chunker': 'bitmask-20', 'created': datetime.datetime.now().isoformat()}, f, indent=4)
+
+        indexed_packs = set()
+        for name in os.listdir(self._path('index')):
+            if not name.endswith('.idx.gz'):
+                continue
+            pack_id = name[:-len('.idx.gz')]
+            index_path = self._path('index', name)
+            entries = cache_get(('pack-index', index_path), index_path)
+            if entries is None:
+                with gzip.open(index_path, 'rt', encoding='utf-8') as f:
+                    entries = json.load(f)
+                cache_put(('pack-index', index_path), index_path, entries)
+            for chunk_id, entry in entries.items():
+                self.index[chunk_id] = (pack_id, *entry)
+            indexed_packs.add(pack_id)
+
+        # Packs without index were interrupted before completion - their chunks are unknown
+        for name in os.listdir(self._path('packs')):
+            if name.endswith('.pack') and name[:-len('.pack')] not in indexed_packs:
+                log_message(f"Removing incomplete pack {name}", "WARN")
+                os.remove(self._path('packs', name))
+        log_message(f"Repository: {len(self.index)} chunks in {len(indexed_packs)} packs", "INFO")
+
+    def has_chunk(self, chunk_id):
+        return chunk_id in self.index or chunk_id in self.pack_entries
+
+    def store_chunk(self, chunk_id, payload, raw_len, codec):
+        """Appends new chunk to current pack, returns number of bytes written"""
+        if payload is None or self.has_chunk(chunk_id):
+            return 0
+        if self.pack_file is None:
+            self.pack_id = f"{datetime.datetime.now():%Y%m%d_%H%M%S}_{os.urandom(4).hex()}"
+            self.pack_file = open(self.pack_path(self.pack_id), 'wb', buffering=ARCHIVE_WRITE_BUFFER)
+            self.pack_entries = {}
+        offset = self.pack_file.tell()
+        self.pack_file.write(payload)
+        self.pack_entries[chunk_id] = (offset, len(payload), raw_len, codec)
+        if self.pack_file.tell() >= PACK_TARGET_SIZE:
+            self.finish_pack()
+        return len(payload)
+
+    def finish_pack(self):
+        """Syncs current pack and writes its index, chunks become visible after that"""
+        if self.pack_file is None:
+            return
+        self.pack_file.flush()
+        os.fsync(self.pack_file.fileno())
+        self.pack_file.close()
+        index_path = self._path('index', f"{self.pack_id}.idx.gz")
+        with gzip.open(index_path + ".tmp", 'wt', encoding='utf-8', compresslevel=1) as f:
+            json.dump(self.pack_entries, f, separators=(',', ':'))
+        os.replace(index_path + ".tmp", index_path)
+        cache_put(('pack-index', index_path), index_path, self.pack_entries)
+        for chunk_id, entry in self.pack_entries.items():
+            self.index[chunk_id] = (self.pack_id, *entry)
+        self.pack_file = None
+        self.pack_entries = {}
+
+    def pack_path(self, pack_id):
+        return self._path('packs', f"{pack_id}.pack")
+
+    def read_chunk(self, chunk_id):
+        """Returns raw chunk data"""
+        pack_id, offset, length, raw_len, codec = self.index[chunk_id]
+        with open(self.pack_path(pack_id), 'rb') as f:
+            f.seek(offset)
+            payload = f.read(length)
+        return self.decode_chunk(chunk_id, payload)
+
+    def decode_chunk(self, chunk_id, payload):
+        """Decompresses chunk payload read from a pack and checks its hash"""
+        raw_len, codec = self.index[chunk_id][3:]
+        data = decompress_chunk(codec, payload)
+        if len(data) != raw_len or hashlib.blake2b(data, digest_size=32).hexdigest() != chunk_id:
+            raise RuntimeError(f"Chunk {chunk_id} is corrupted")
+        return data
+
+    def snapshot_path(self, name):
+        return self._path('snapshots', f"{name}.json.gz")
+
+    def list_snapshots(self):
+        """Returns snapshot names, oldest first"""
+        names = [n[:-len('.json.gz')] for n in os.listdir(self._path('snapshots')) if n.endswith('.json.gz')]
+        return sorted(names, key=lambda n: os.path.getmtime(self.snapshot_path(n)))
+
+    def load_snapshot(self, name):
+        with gzip.open(self.snapshot_path(name), 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_snapshot(self, name, snapshot):
+        path = self.snapshot_path(name)
+        with gzip.open(path + ".tmp", 'wt', encoding='utf-8', compresslevel=6) as f:
+            json.dump(snapshot, f, separators=(',', ':'), ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def delete_snapshot(self, name):
+        """Removes snapshot file, its chunks stay until collect_garbage()"""
+        os.remove(self.snapshot_path(name))
+
+    def collect_garbage(self):
+        """Deletes chunks no snapshot refers to, returns bytes freed"""
+        # Packs without live chunks are deleted, packs with enough dead bytes are
+        # rewritten. New packs are complete before old ones go, so a crash at any
+        # point leaves every chunk readable from at least one pack.
+        live = set()
+        for name in self.list_snapshots():
+            for entry in self.load_snapshot(name).get('files', []):
+                live.update(entry[5])
+        packs = collections.defaultdict(list)
+        for chunk_id, (pack_id, offset, length, raw_len, codec) in self.index.items():
+            packs[pack_id].append((chunk_id, offset, length, raw_len, codec))
+
+        freed = 0
+        obsolete = []
+        for pack_id, entries in sorted(packs.items()):
+            dead = sum(length for chunk_id, offset, length, raw_len, codec in entries if chunk_id not in live)
+            total = sum(entry[2] for entry in entries)
+            if not dead or (dead < total and dead < total * REPACK_MIN_WASTE):
+                continue
+            with open(self.pack_path(pack_id), 'rb') as f:
+                for chunk_id, offset, length, raw_len, codec in sorted(entries, key=lambda e: e[1]):
+                    del self.index[chunk_id]
+                    if chunk_id in live:
+                        f.seek(offset)
+                        self.store_chunk(chunk_id, f.read(length), raw_len, codec)
+            obsolete.append(pack_id)
+            freed += dead
+        self.finish_pack()
+        for pack_id in obsolete:
+            os.remove(self._path('index', f"{pack_id}.idx.gz"))
+            os.remove(self.pack_path(pack_id))
+        if obsolete:
+            log_message(f"Repository: removed unreferenced chunks, {len(obsolete)} packs rewritten or deleted, "
+                        f"{freed / 1048576:.1f} MB freed", "INFO")
+        return freed
+
+
+def run_repository_backup(disk_root, source_dirs):
+    """Writes a deduplicated snapshot of source directories into chunk repository, returns snapshot path"""
+    repo = ChunkRepository(os.path.join(disk_root, REPOSITORY_DIR))
+    repo.open()
+    refresh_store_extensions()
+    name = os.path.splitext(core.BACKUP_FILENAME)[0]
+    if os.path.exists(repo.snapshot_path(name)):
+        # Several runs a day (agent, daemon) each keep their own restore point, like incremental ZIPs
+        name += datetime.datetime.now().strftime("_%H%M%S")
+    codec = get_compression_codec(source_dirs)
+    workers = get_compression_workers()
+    log_message(f"Snapshot: {name}, compression: {codec.name} level {codec.level}, "
+                f"worker threads: {workers}", "INFO")
+
+    # Unchanged files (size, mtime, inode) reuse chunk lists of the previous snapshot
+    parent_files = {}
+    snapshots = repo.list_snapshots()
+    if snapshots:
+        parent = snapshots[-1]
+        parent_files = {entry[0]: entry for entry in repo.load_snapshot(parent).get('files', [])}
+        log_message(f"Parent snapshot: {parent} ({len(parent_files)} files)", "INFO")
+
+    stats = {'files': 0, 'dirs': 0, 'skipped': 0, 'unchanged': 0, 'bytes_in': 0,
+             'new_chunks': 0, 'bytes_written': 0}
+    set_progress_phase("scanning")
+    files_total, bytes_total = scan_source_totals(source_dirs)
+    set_progress_phase("archiving", files_total, bytes_total)
+    files = []
+    dirs = []
+    pending = queue.Queue(maxsize=workers * 4)
+    writer_errors = []
+    start_time = datetime.datetime.now()
+
+    def store(prepared):
+        chunk_ids = []
+        for chunk_id, payload, raw_len, codec in prepared:
+            written = repo.store_chunk(chunk_id, payload, raw_len, codec)
+            if written:
+                stats['new_chunks'] += 1
+                stats['bytes_written'] += written
+                add_progress(bytes_written=written)
+            stats['bytes_in'] += raw_len
+            chunk_ids.append(chunk_id)
+        return chunk_ids
+
+    def stream_chunks(path):
+        # Big files: chunk in writer thread, hash/compress chunks on the pool
+        in_flight = collections.deque()
+        file_codec = None
+        for chunk in iter_content_chunks(path):
+            if file_codec is None:
+                file_codec = STORE_CODEC if is_incompressible(path, chunk) else codec
+            in_flight.append(pool.submit(prepare_chunk, repo, chunk, file_codec))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def writer():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            path, st, job = item
+            if writer_errors or CANCEL_EVENT.is_set():
+                if job:
+                    job.cancel()
+                continue
+            try:
+                if job is None:
+                    chunk_ids = store(stream_chunks(path))
+                else:
+                    chunk_ids = store(job.result())
+                files.append([path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_mode, chunk_ids])
+                stats['files'] += 1
+                add_progress(files=1)
+            except (SourceReadError, FileNotFoundError) as e:
+                log_message(f"Cannot archive {path}: {e}", "WARN")
+                stats['skipped'] += 1
+            except Exception as e:
+                writer_errors.append(e)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                               thread_name_prefix="rotup-chunk") as pool:
+        writer_thread = threading.Thread(target=writer, name="rotup-repo-writer", daemon=True)
+        writer_thread.start()
+        try:
+            for path, st in iter_archive_jobs(source_dirs, stats):
+                if writer_errors:
+                    break
+                if st is None:
+                    dirs.append(path)
+                    stats['dirs'] += 1
+                    continue
+                old = parent_files.get(path)
+                if old and old[1:4] == [st.st_size, st.st_mtime_ns, st.st_ino] \
+                        and all(repo.has_chunk(c) for c in old[5]):
+                    # Still goes through the writer so snapshot keeps scan order
+                    reused = concurrent.futures.Future()
+                    reused.set_result([(c, None, 0, CHUNK_STORED) for c in old[5]])
+                    pending.put((path, st, reused))
+                    add_progress(bytes_read=st.st_size)  # Done without reading
+                    stats['unchanged'] += 1
+                elif st.st_size > PARALLEL_MEMBER_LIMIT:
+                    pending.put((path, st, None))
+                else:
+                    pending.put((path, st, pool.submit(prepare_file_chunks, repo, path, codec)))
+        finally:
+            pending.put(None)
+            writer_thread.join()
+
+    if writer_errors:
+        repo.finish_pack()
+        raise writer_errors[0]
+
+    repo.finish_pack()
+    check_cancelled()  # Chunks written so far are kept, the snapshot is not saved
+    repo.save_snapshot(name, {
+        'version': REPOSITORY_VERSION,
+        'name': name,
+        'disk': core.ACTIVE_DISK,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'sources': source_dirs,
+        'dirs': dirs,
+        'files': files,
+    })
+
+    elapsed = max((datetime.datetime.now() - start_time).total_seconds(), 0.001)
+    log_message(
+        f"Snapshot {name}: {stats['files']} files ({stats['unchanged']} unchanged), "
+        f"{stats['bytes_in'] / 1048576:.1f} MB read, {stats['new_chunks']} new chunks, "
+        f"{stats['bytes_written'] / 1048576:.1f} MB written in {elapsed:.0f}s", "INFO")
+    if stats['skipped']:
+        log_message(f"{stats['skipped']} entries could not be archived", "WARN")
+    return repo.snapshot_path(name)
+
+
+def restore_snapshot(disk_root, name, destination):
+    """Restores files of a repository snapshot under destination directory"""
+    repo = ChunkRepository(os.path.join(disk_root, REPOSITORY_DIR))
+    repo.open()
+    snapshot = repo.load_snapshot(name)
+    log_message(f"Restoring snapshot {name} to {destination}", "INFO")
+
+    def local_path(path):
+        return os.path.join(destination, os.path.splitdrive(path)[1].lstrip('/\\'))
+
+    for path in snapshot.get('dirs', []):
+        os.makedirs(local_path(path), exist_ok=True)
+
+    restored = 0
+    for path, size, mtime_ns, ino, mode, chunk_ids in snapshot.get('files', []):
+        target = local_path(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            for chunk_id in chunk_ids:
+                f.write(repo.read_chunk(chunk_id))
+        os.chmod(target, stat.S_IMODE(mode))
+        os.utime(target, ns=(mtime_ns, mtime_ns))
+        restored += 1
+    log_message(f"Restored {restored} files", "SUCCESS")
+    return True
@@ -0,0 +1,460 @@
+import platform
+import json
+import os
+import datetime
+import threading
+import time
+import traceback
+import queue
+
+import rotup_core as core
+from rotup_core import (BASE_DIR, cancel_running_commands, CONFIG, CONFIG_FILE, CONFIG_POLL_INTERVAL,
+                        decode_udev_name, DISK_BY_UUID_DIR, file_signature, format_progress,
+                        get_available_disks_windows, get_progress, load_config, log_message,
+                        lookup_disk_by_uuid, stream_command)
+from rotup_journal import InotifyWatcher, start_change_journal
+from rotup_logic import run_process
+
+# --- HOTPLUG AGENT ---
+
+DEFAULT_HOTPLUG_DEBOUNCE_S = 10  # udev creates several links per disk, wait until it settles
+DEFAULT_HOTPLUG_MIN_INTERVAL_MIN = 60
+HOTPLUG_POLL_INTERVAL = 30  # Only when no event source is available
+# Prints drive letter and label of every volume that arrives (blocks in Wait-Event, no polling)
+WINDOWS_VOLUME_WATCH_SCRIPT = (
+    "Register-WmiEvent -Class Win32_VolumeChangeEvent -Filter 'EventType = 2' -SourceIdentifier RotupVolume | Out-Null; "
+    "while ($true) { $e = Wait-Event -SourceIdentifier RotupVolume; "
+    "$d = $e.SourceEventArgs.NewEvent.DriveName; "
+    "$l = (Get-Volume -DriveLetter $d.Substring(0, 1)).FileSystemLabel; "
+    "Write-Output \"$d|$l\"; [Console]::Out.Flush(); Remove-Event -SourceIdentifier RotupVolume }"
+)
+
+
+def get_hotplug_settings():
+    """Returns (debounce seconds, minimum seconds between runs) from config"""
+    try:
+        debounce = float(CONFIG.get('hotplug_debounce_seconds', DEFAULT_HOTPLUG_DEBOUNCE_S))
+        min_interval = float(CONFIG.get('hotplug_min_interval_minutes', DEFAULT_HOTPLUG_MIN_INTERVAL_MIN)) * 60
+    except (TypeError, ValueError):
+        log_message("Invalid hotplug settings, using defaults", "WARN")
+        debounce, min_interval = DEFAULT_HOTPLUG_DEBOUNCE_S, DEFAULT_HOTPLUG_MIN_INTERVAL_MIN * 60
+    return debounce, min_interval
+
+
+def get_configured_disk_ids():
+    """Returns identifiers of configured rotation disks as reported by arrival events"""
+    if platform.system() == "Linux":
+        return {entry.split('_')[-1] for entry in CONFIG.get('disk_rotation', {}).get('linux', [])}
+    return set(CONFIG.get('disk_rotation', {}).get('windows', []))
+
+
+def watch_disks_linux(arrivals):
+    """Puts UUIDs of newly attached filesystems into arrivals queue (inotify, idle without CPU use)"""
+    disk_dir = os.path.dirname(DISK_BY_UUID_DIR)
+    try:
+        watcher = InotifyWatcher()
+        # /dev/disk/by-uuid disappears with the last filesystem, so /dev/disk is watched too
+        watcher.add_watch(disk_dir)
+    except OSError as e:
+        log_message(f"Hotplug: inotify on {disk_dir} unavailable ({e}), polling every "
+                    f"{HOTPLUG_POLL_INTERVAL}s instead", "WARN")
+        return poll_disks(arrivals)
+
+    def watch_uuid_dir(report_existing):
+        try:
+            watcher.add_watch(DISK_BY_UUID_DIR)
+            # Links created before the watch was in place
+            if report_existing:
+                for name in os.listdir(DISK_BY_UUID_DIR):
+                    arrivals.put(decode_udev_name(name))
+        except OSError:
+            pass
+
+    watch_uuid_dir(report_existing=False)
+    while True:
+        for directory, name in watcher.read_events():
+            if directory == disk_dir and name == os.path.basename(DISK_BY_UUID_DIR):
+                watch_uuid_dir(report_existing=True)
+            elif directory == DISK_BY_UUID_DIR:
+                arrivals.put(decode_udev_name(name))
+
+
+def watch_volumes_windows(arrivals):
+    """Puts labels of newly mounted volumes into arrivals queue (WMI volume arrival events)"""
+    def on_line(stream_name, line):
+        if stream_name == 'stdout' and '|' in line:
+            arrivals.put(line.split('|', 1)[1].strip())
+
+    while True:
+        result = stream_command(['powershell', '-NoProfile', '-Command', WINDOWS_VOLUME_WATCH_SCRIPT], on_line)
+        log_message(f"Hotplug: volume watcher exited ({result.returncode}), restarting in "
+                    f"{HOTPLUG_POLL_INTERVAL}s", "WARN")
+        time.sleep(HOTPLUG_POLL_INTERVAL)
+
+
+def poll_disks(arrivals):
+    """Fallback event source: reports configured disks that became present"""
+    present = set()
+    while True:
+        if platform.system() == "Linux":
+            now_present = {uuid for uuid in get_configured_disk_ids() if lookup_disk_by_uuid(uuid)}
+        else:
+            now_present = {disk['value'] for disk in get_available_disks_windows()}
+        for disk_id in now_present - present:
+            arrivals.put(disk_id)
+        present = now_present
+        time.sleep(HOTPLUG_POLL_INTERVAL)
+
+
+def run_hotplug_agent():
+    """Waits for configured rotation disks to be attached and runs the backup right away"""
+    load_config()
+    start_change_journal()
+    debounce, min_interval = get_hotplug_settings()
+    arrivals = queue.Queue()
+    source = watch_disks_linux if platform.system() == "Linux" else watch_volumes_windows
+    threading.Thread(target=source, args=(arrivals,), name="rotup-hotplug", daemon=True).start()
+    print(f"[DEBUG] Hotplug agent started (debounce {debounce}s, min interval {min_interval / 60:g} min)")
+
+    last_run = None
+    while True:
+        disk_id = arrivals.get()  # Blocks - no CPU use while idle
+        load_config()
+        if disk_id not in get_configured_disk_ids():
+            print(f"[DEBUG] Hotplug: ignoring {disk_id} (not a rotation disk)")
+            continue
+
+        # Let the disk settle: more links/partitions appear within a few seconds
+        while True:
+            try:
+                arrivals.get(timeout=debounce)
+            except queue.Empty:
+                break
+
+        if last_run is not None and time.monotonic() - last_run < min_interval:
+            print(f"[DEBUG] Hotplug: {disk_id} attached, but last backup ran "
+                  f"{(time.monotonic() - last_run) / 60:.0f} min ago - skipping")
+            continue
+        last_run = time.monotonic()
+        print(f"[DEBUG] Hotplug: rotation disk {disk_id} attached - starting backup")
+        run_process()
+
+# --- DAEMON ---
+
+DEFAULT_DAEMON_PORT = 47800  # Control port on 127.0.0.1 where Unix sockets are not available
+DAEMON_SOCKET_NAME = "rotup.sock"
+DAEMON_TOKEN_FILE = "daemon.token"  # TCP control socket: shared secret next to config.json, readable by the owner only
+CRON_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+DAEMON_STATE = {'state': 'idle', 'started': None, 'last_run': None, 'last_result': None,
+                'next_run': None, 'runs': 0}
+DAEMON_LOCK = threading.Lock()
+DAEMON_WAKE = threading.Event()
+DAEMON_RELOAD = threading.Event()  # 'reload' requested - done once no backup is running
+DEFAULT_BACKUP_HOUR = 2
+DEFAULT_BACKUP_MINUTE = 0
+SCHEDULE_WARNINGS = set()  # Invalid (key, value) pairs reported already - the loop checks every few seconds
+
+
+def parse_cron_field(field, low, high):
+    """Parses one cron field ('*', '5', '1-5', '*/15', '1,3', '0-30/10') into a set of values"""
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/', 1)
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(v) for v in part.split('-', 1))
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"cron field '{field}' out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron_expression(expression):
+    """Parses 'minute hour day month weekday' into (minutes, hours, days, months, weekdays, day_rule)"""
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f"cron expression '{expression}' must have 5 fields")
+    minutes, hours, days, months, weekdays = (parse_cron_field(f, low, high)
+                                              for f, (low, high) in zip(fields, CRON_FIELD_RANGES))
+    if 7 in weekdays:
+        weekdays.add(0)  # 0 and 7 are both Sunday
+    # Like cron: when both day fields are restricted, either of them may match
+    day_rule = 'or' if fields[2] != '*' and fields[4] != '*' else 'and'
+    return minutes, hours, days, months, weekdays, day_rule
+
+
+def next_cron_time(schedule, after):
+    """Returns first datetime after 'after' matching parsed cron schedule (None within 4 years)"""
+    minutes, hours, days, months, weekdays, day_rule = schedule
+    t = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+    limit = t + datetime.timedelta(days=4 * 366)
+    while t < limit:
+        if t.month not in months:
+            t = (t.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            continue
+        day_ok = t.day in days
+        weekday_ok = (t.weekday() + 1) % 7 in weekdays
+        if not ((day_ok or weekday_ok) if day_rule == 'or' else (day_ok and weekday_ok)):
+            t = t.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            continue
+        if t.hour not in hours:
+            t = t.replace(minute=0) + datetime.timedelta(hours=1)
+            continue
+        if t.minute not in minutes:
+            t += datetime.timedelta(minutes=1)
+            continue
+        return t
+    return None
+
+
+def get_schedule_value(key, default, maximum):
+    """Returns backup_hour/backup_minute as int, default (with a warning) when it is not valid"""
+    value = CONFIG.get(key, default)
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = -1
+    if not 0 <= number <= maximum:
+        report_schedule_problem(key, value, f"Invalid {key} '{value}', using {default:02d}", "WARN")
+        return default
+    return number
+
+
+def report_schedule_problem(key, value, message, level):
+    """Logs a schedule config problem once, not on every check of the main loop"""
+    if (key, str(value)) not in SCHEDULE_WARNINGS:
+        SCHEDULE_WARNINGS.add((key, str(value)))
+        log_message(message, level)
+
+
+def get_daemon_schedules():
+    """Returns parsed schedules: daily backup_hour:backup_minute plus cron expressions from 'schedule'"""
+    expressions = []
+    if CONFIG.get('backup_hour') is not None:
+        hour = get_schedule_value('backup_hour', DEFAULT_BACKUP_HOUR, 23)
+        minute = get_schedule_value('backup_minute', DEFAULT_BACKUP_MINUTE, 59)
+        expressions.append(f"{minute} {hour} * * *")
+    extra = CONFIG.get('schedule', [])
+    if isinstance(extra, str):
+        expressions.append(extra)
+    elif isinstance(extra, list):
+        expressions.extend(extra)
+    else:
+        report_schedule_problem('schedule', extra, f"Ignoring schedule '{extra}': "
+                                "expected a cron string or a list of them", "ERROR")
+
+    schedules = []
+    for expression in expressions:
+        if not isinstance(expression, str):
+            report_schedule_problem('schedule', expression,
+                                    f"Ignoring schedule '{expression}': not a cron string", "ERROR")
+            continue
+        try:
+            schedules.append(parse_cron_expression(expression))
+        except ValueError as e:
+            report_schedule_problem('schedule', expression, f"Ignoring schedule: {e}", "WARN")
+    return schedules
+
+
+def next_scheduled_run(now):
+    """Returns earliest upcoming run time of all schedules, None when nothing is scheduled"""
+    times = [t for t in (next_cron_time(s, now) for s in get_daemon_schedules()) if t]
+    return min(times) if times else None
+
+
+def start_daemon_run(reason):
+    """Starts run_process in a background thread unless a backup is already running"""
+    with DAEMON_LOCK:
+        if DAEMON_STATE['state'] == 'running':
+            return False
+        DAEMON_STATE['state'] = 'running'
+        DAEMON_STATE['last_run'] = datetime.datetime.now().isoformat(timespec='seconds')
+
+    def run():
+        print(f"[DEBUG] Daemon: starting backup ({reason})")
+        ok = False
+        try:
+            ok = run_process()
+        except Exception as e:
+            log_message(f"Daemon run failed: {e}", "ERROR")
+            traceback.print_exc()
+        with DAEMON_LOCK:
+            DAEMON_STATE.update(state='idle', last_result='success' if ok else 'failed',
+                                runs=DAEMON_STATE['runs'] + 1)
+        DAEMON_WAKE.set()  # Deferred config reload can happen now
+
+    threading.Thread(target=run, name="rotup-daemon-run", daemon=True).start()
+    return True
+
+
+def handle_daemon_request(request):
+    """Executes one control command, returns JSON-serializable reply"""
+    if not isinstance(request, dict):
+        return {'ok': False, 'error': "request must be a JSON object"}
+    command = request.get('cmd')
+    if command == 'status':
+        with DAEMON_LOCK:
+            return dict(DAEMON_STATE, ok=True, progress=format_progress(get_progress()))
+    if command == 'run':
+        started = start_daemon_run("requested")
+        return {'ok': True, 'started': started, 'state': DAEMON_STATE['state']}
+    if command == 'cancel':
+        cancel_running_commands()
+        return {'ok': True, 'cancelled': DAEMON_STATE['state'] == 'running'}
+    if command == 'reload':
+        # Main loop reloads - never under a running backup
+        DAEMON_RELOAD.set()
+        DAEMON_WAKE.set()
+        return {'ok': True, 'deferred': DAEMON_STATE['state'] == 'running'}
+    return {'ok': False, 'error': f"unknown command: {command}"}
+
+
+def get_daemon_token_path():
+    """Token file of the TCP control socket (daemon_token_file to change)"""
+    return CONFIG.get('daemon_token_file', os.path.join(BASE_DIR, DAEMON_TOKEN_FILE))
+
+
+def read_daemon_token():
+    """Returns token of the running daemon, None when the file cannot be read"""
+    try:
+        with open(get_daemon_token_path(), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def write_daemon_token():
+    """Creates a new random token for this daemon run, file is readable by the owner only"""
+    import secrets
+    token = secrets.token_hex(32)
+    path = get_daemon_token_path()
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token + "\n")
+    os.replace(tmp_path, path)
+    return token
+
+
+def get_daemon_address():
+    """Returns (socket family, address) of the daemon control socket"""
+    import socket
+    if hasattr(socket, 'AF_UNIX') and platform.system() != "Windows":
+        return socket.AF_UNIX, CONFIG.get('daemon_socket', os.path.join(BASE_DIR, DAEMON_SOCKET_NAME))
+    return socket.AF_INET, ('127.0.0.1', int(CONFIG.get('daemon_port', DEFAULT_DAEMON_PORT)))
+
+
+def daemon_request(request, timeout=2.0):
+    """Sends one command to a running daemon, returns its reply or None when no daemon runs"""
+    import socket
+    family, address = get_daemon_address()
+    try:
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            if family != getattr(socket, 'AF_UNIX', None):
+                # Any local user can reach a TCP port - prove access to the token file
+                request = dict(request, token=read_daemon_token())
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with sock.makefile('r', encoding='utf-8') as reply:
+                return json.loads(reply.readline())
+    except (OSError, ValueError):
+        return None
+
+
+def serve_control_socket(server, token=None):
+    """Accepts control connections: one JSON request line, one JSON reply line"""
+    # token: required in every request (TCP socket), None on Unix sockets (file permissions)
+    import hmac
+    while True:
+        conn, _ = server.accept()
+        with conn:
+            try:
+                conn.settimeout(5)
+                with conn.makefile('rb') as stream:
+                    line = stream.readline(64 * 1024)
+                request = json.loads(line)
+                if token is not None and not (isinstance(request, dict) and isinstance(request.get('token'), str)
+                                              and hmac.compare_digest(request['token'], token)):
+                    reply = {'ok': False, 'error': "invalid token"}
+                else:
+                    reply = handle_daemon_request(request)
+            except (OSError, ValueError) as e:
+                reply = {'ok': False, 'error': str(e)}
+            except Exception as e:
+                # One bad request must not stop the control thread for the daemon's lifetime
+                log_message(f"Daemon control request failed: {e}", "ERROR")
+                reply = {'ok': False, 'error': str(e)}
+            try:
+                conn.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+            except OSError:
+                pass
+
+
+def open_control_socket():
+    """Binds daemon control socket (local only), returns (server, address, token or None)"""
+    import socket
+    family, address = get_daemon_address()
+    if daemon_request({'cmd': 'status'}) is not None:
+        raise RuntimeError(f"Another ROTUP daemon is already listening on {address}")
+    server = socket.socket(family, socket.SOCK_STREAM)
+    token = None
+    if family == socket.AF_UNIX:
+        if os.path.exists(address):
+            os.remove(address)  # Stale socket of a daemon that did not exit cleanly
+        # Socket is created with 0660 - no window with umask permissions before a chmod
+        old_umask = os.umask(0o117)
+        try:
+            server.bind(address)
+        finally:
+            os.umask(old_umask)
+    else:
+        token = write_daemon_token()
+        server.bind(address)
+    server.listen(5)
+    return server, address, token
+
+
+def run_daemon():
+    """Long-running scheduler: runs backups on schedule, keeps caches warm, serves control socket"""
+    core.WARM_CACHE = {}
+    load_config()
+    start_change_journal()
+    config_signature = file_signature(CONFIG_FILE)
+
+    server, address, token = open_control_socket()
+    threading.Thread(target=serve_control_socket, args=(server, token), name="rotup-control", daemon=True).start()
+    DAEMON_STATE['started'] = datetime.datetime.now().isoformat(timespec='seconds')
+    print(f"[DEBUG] Daemon started, control socket: {address}")
+
+    while True:
+        now = datetime.datetime.now()
+        next_run = next_scheduled_run(now)
+        DAEMON_STATE['next_run'] = next_run.isoformat(timespec='minutes') if next_run else None
+        timeout = CONFIG_POLL_INTERVAL
+        if next_run:
+            timeout = min(timeout, max((next_run - now).total_seconds(), 0))
+        DAEMON_WAKE.wait(timeout)
+        DAEMON_WAKE.clear()
+
+        if next_run and datetime.datetime.now() >= next_run:
+            if not start_daemon_run(f"scheduled {next_run:%H:%M}"):
+                log_message("Scheduled backup skipped - previous backup still running", "WARN")
+
+        signature = file_signature(CONFIG_FILE)
+        if signature != config_signature or DAEMON_RELOAD.is_set():
+            config_signature = signature
+            # Never swap config under a running backup
+            if DAEMON_STATE['state'] != 'running' and load_config():
+                DAEMON_RELOAD.clear()
+                print("[DEBUG] Daemon: config.json reloaded")
+            else:
+                config_signature = None  # Retry on next check
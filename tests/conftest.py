@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+# Modules live in the repository root next to rotup.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rotup_core as core  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_config(tmp_path):
+    """Runs each test on its own CONFIG with state files in tmp_path, never touching config.json"""
+    saved = dict(core.CONFIG)
+    saved_log, saved_backup = core.LOG_FILE, core.BACKUP_FILENAME
+    core.CONFIG.clear()
+    core.CONFIG.update({
+        'compression_codec': 'deflate',  # 'auto' would save its benchmark to config.json
+        'compression_workers': 1,
+        'scan_cache_file': str(tmp_path / "scan_cache.json.gz"),
+        'change_journal_dir': str(tmp_path / "journal"),
+        'size_history_file': str(tmp_path / "size_history.json"),
+    })
+    core.LOG_FILE = ""
+    core.BACKUP_FILENAME = "backup_2026_10_17.zip"
+    core.CANCEL_EVENT.clear()
+    yield core.CONFIG
+    core.CANCEL_EVENT.clear()
+    core.CONFIG.clear()
+    core.CONFIG.update(saved)
+    core.LOG_FILE, core.BACKUP_FILENAME = saved_log, saved_backup
+
+
+@pytest.fixture
+def source_tree(tmp_path):
+    """Small source tree: compressible and random files, above and below the small-file batch limit"""
+    root = tmp_path / "source"
+    (root / "docs" / "nested").mkdir(parents=True)
+    (root / "data").mkdir()
+    contents = {}
+    for i in range(6):
+        contents[root / "docs" / f"note{i}.txt"] = (f"line {i}\n" * (200 * (i + 1))).encode()
+    contents[root / "docs" / "nested" / "empty.txt"] = b""
+    for i in range(4):
+        contents[root / "data" / f"blob{i}.bin"] = os.urandom(150 * 1024 + i)
+    for path, data in contents.items():
+        path.write_bytes(data)
+    return root, {str(path): data for path, data in contents.items()}
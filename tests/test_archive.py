@@ -0,0 +1,89 @@
+import os
+import zipfile
+
+import pytest
+
+import rotup_archive
+from rotup_archive import CHECKPOINT_SUFFIX, CHECKSUMS_MEMBER, create_zip_archive, get_arcname
+from rotup_backup import verify_backup
+
+
+def read_members(target):
+    """Returns {member name: data} of file members, checking the archive with testzip() first"""
+    with zipfile.ZipFile(target) as zf:
+        assert zf.testzip() is None
+        names = [name for name in zf.namelist() if not name.endswith("/") and name != CHECKSUMS_MEMBER]
+        assert len(names) == len(set(names))
+        return {name: zf.read(name) for name in names}
+
+
+def record_streamed(monkeypatch, fail_at=None):
+    """Records paths passed to add_file_to_zip(), raising OSError on call number fail_at"""
+    add_file_to_zip = rotup_archive.add_file_to_zip
+    calls = []
+
+    def recording_add(zf, path, *args, **kwargs):
+        calls.append(path)
+        if len(calls) == fail_at:
+            raise OSError("disk unplugged")
+        return add_file_to_zip(zf, path, *args, **kwargs)
+
+    monkeypatch.setattr(rotup_archive, 'add_file_to_zip', recording_add)
+    return calls
+
+
+def run_interrupted(target, root, monkeypatch):
+    """Runs create_zip_archive() failing on the third streamed file, returns paths it got through"""
+    calls = record_streamed(monkeypatch, fail_at=3)
+    with pytest.raises(OSError, match="disk unplugged"):
+        create_zip_archive(target, [str(root)])
+    monkeypatch.undo()
+    assert os.path.exists(target + CHECKPOINT_SUFFIX)
+    return calls[:2]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_archive_round_trip(tmp_path, isolated_config, source_tree, workers):
+    isolated_config['compression_workers'] = workers
+    root, contents = source_tree
+    target = str(tmp_path / "backup.zip")
+
+    stats = create_zip_archive(target, [str(root)])
+
+    assert stats['files'] == len(contents)
+    assert stats['skipped'] == 0
+    assert read_members(target) == {get_arcname(path): data for path, data in contents.items()}
+    assert verify_backup(target)
+
+
+def test_resume_after_injected_failure(tmp_path, isolated_config, source_tree, monkeypatch):
+    isolated_config['checkpoint_interval_mb'] = 0.0001  # Checkpoint after every member
+    root, contents = source_tree
+    target = str(tmp_path / "backup.zip")
+    written = run_interrupted(target, root, monkeypatch)
+
+    calls = record_streamed(monkeypatch)
+    stats = create_zip_archive(target, [str(root)])
+
+    assert not os.path.exists(target + CHECKPOINT_SUFFIX)
+    assert not set(written) & set(calls)  # Members of the interrupted run are kept, not written again
+    assert stats['files'] == len(contents)
+    assert read_members(target) == {get_arcname(path): data for path, data in contents.items()}
+    assert verify_backup(target)
+
+
+def test_resume_rewrites_changed_file(tmp_path, isolated_config, source_tree, monkeypatch):
+    isolated_config['checkpoint_interval_mb'] = 0.0001
+    root, contents = source_tree
+    target = str(tmp_path / "backup.zip")
+    changed = run_interrupted(target, root, monkeypatch)[0]
+    contents[changed] = os.urandom(len(contents[changed]) + 1)
+    with open(changed, 'wb') as f:
+        f.write(contents[changed])
+
+    calls = record_streamed(monkeypatch)
+    create_zip_archive(target, [str(root)])
+
+    assert changed in calls
+    assert read_members(target) == {get_arcname(path): data for path, data in contents.items()}
+    assert verify_backup(target)
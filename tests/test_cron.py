@@ -0,0 +1,57 @@
+import datetime
+
+import pytest
+
+from rotup_service import next_cron_time, parse_cron_expression, parse_cron_field
+
+
+@pytest.mark.parametrize("field, low, high, expected", [
+    ("*", 1, 5, {1, 2, 3, 4, 5}),
+    ("7", 0, 59, {7}),
+    ("1-3", 0, 59, {1, 2, 3}),
+    ("*/15", 0, 59, {0, 15, 30, 45}),
+    ("0-30/10", 0, 59, {0, 10, 20, 30}),
+    ("1,3,5-6", 0, 23, {1, 3, 5, 6}),
+])
+def test_parse_cron_field(field, low, high, expected):
+    assert parse_cron_field(field, low, high) == expected
+
+
+@pytest.mark.parametrize("field", ["60", "5-2", "*/0", "x", "1-", ""])
+def test_parse_cron_field_rejects_invalid(field):
+    with pytest.raises(ValueError):
+        parse_cron_field(field, 0, 59)
+
+
+@pytest.mark.parametrize("expression", ["0 2 * *", "0 2 * * * *", "0 24 * * *", "0 2 32 * *", "0 2 * 13 *"])
+def test_parse_cron_expression_rejects_invalid(expression):
+    with pytest.raises(ValueError):
+        parse_cron_expression(expression)
+
+
+def test_sunday_is_0_and_7():
+    assert 0 in parse_cron_expression("0 2 * * 7")[4]
+
+
+@pytest.mark.parametrize("expression, after, expected", [
+    # Daily at 02:00: later the same day, else the next day
+    ("0 2 * * *", "2026-10-17 01:30", "2026-10-17 02:00"),
+    ("0 2 * * *", "2026-10-17 02:00", "2026-10-18 02:00"),
+    # Every 15 minutes
+    ("*/15 * * * *", "2026-10-17 10:07", "2026-10-17 10:15"),
+    # Weekdays only: Saturday 2026-10-17 -> Monday
+    ("30 3 * * 1-5", "2026-10-17 12:00", "2026-10-19 03:30"),
+    # Month and year rollover
+    ("0 0 1 * *", "2026-12-15 00:00", "2027-01-01 00:00"),
+    # Day of month and weekday both set: either matches (Sunday 10-18 comes before the 20th)
+    ("0 4 20 * 0", "2026-10-17 00:00", "2026-10-18 04:00"),
+    # 29 February comes only in a leap year
+    ("0 0 29 2 *", "2026-03-01 00:00", "2028-02-29 00:00"),
+])
+def test_next_cron_time(expression, after, expected):
+    parse = lambda text: datetime.datetime.strptime(text, "%Y-%m-%d %H:%M")
+    assert next_cron_time(parse_cron_expression(expression), parse(after)) == parse(expected)
+
+
+def test_next_cron_time_without_match_returns_none():
+    assert next_cron_time(parse_cron_expression("0 0 31 2 *"), datetime.datetime(2026, 10, 17)) is None
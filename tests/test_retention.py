@@ -0,0 +1,71 @@
+import datetime
+
+from rotup_preflight import list_backup_chains, select_retained
+
+
+def day(text):
+    return datetime.datetime.strptime(text, "%Y_%m_%d").date()
+
+
+def full(date):
+    return day(date), f"backup_{date}.zip"
+
+
+def incremental(date, run_time):
+    return day(date), f"backup_{date}_{run_time}_incr.zip"
+
+
+def test_no_rules_keeps_newest_chain_and_todays_backup(isolated_config):
+    chains = [[full("2026_10_01")], [full("2026_10_08"), incremental("2026_10_09", "020000")]]
+
+    assert select_retained(chains) == {
+        "backup_2026_10_08.zip", "backup_2026_10_09_020000_incr.zip", "backup_2026_10_17.zip"}
+
+
+def test_keep_last_keeps_full_backup_of_kept_incrementals(isolated_config):
+    isolated_config['retention_keep_last'] = 2
+    chains = [[full("2026_10_01"), incremental("2026_10_02", "020000")],
+              [full("2026_10_08"), incremental("2026_10_09", "020000"), incremental("2026_10_10", "020000")]]
+
+    retained = select_retained(chains)
+
+    assert retained == {"backup_2026_10_08.zip", "backup_2026_10_09_020000_incr.zip",
+                        "backup_2026_10_10_020000_incr.zip", "backup_2026_10_17.zip"}
+
+
+def test_daily_rule_keeps_newest_backup_of_each_day(isolated_config):
+    isolated_config['retention_daily'] = 2
+    chains = [[full("2026_10_01")], [full("2026_10_02")],
+              [full("2026_10_03"), incremental("2026_10_03", "120000"), incremental("2026_10_03", "180000")]]
+
+    retained = select_retained(chains)
+
+    # Newest of 10-03 needs the whole chain; 10-02 stays as the newest backup of its day
+    assert "backup_2026_10_01.zip" not in retained
+    assert {"backup_2026_10_02.zip", "backup_2026_10_03.zip",
+            "backup_2026_10_03_180000_incr.zip"} <= retained
+
+
+def test_gfs_rules_keep_weekly_and_monthly_points(isolated_config):
+    isolated_config.update({'retention_weekly': 2, 'retention_monthly': 2})
+    dates = ["2026_08_20", "2026_08_28", "2026_09_15", "2026_09_22", "2026_09_24", "2026_10_05"]
+    chains = [[full(date)] for date in dates]
+
+    retained = select_retained(chains)
+
+    # Weeks: 2026-W41 (10-05), 2026-W39 (09-24); months: October (10-05), September (09-24)
+    assert retained == {"backup_2026_10_05.zip", "backup_2026_09_24.zip", "backup_2026_10_17.zip"}
+
+
+def test_list_backup_chains_groups_incrementals_by_full_backup(tmp_path, isolated_config):
+    names = ["backup_2026_10_01.zip", "backup_2026_10_02_020000_incr.zip", "backup_2026_10_08.zip",
+             "backup_2026_10_09_020000_incr.zip", "other.zip", "backup_2026_10_10.zip.checkpoint",
+             "backup_2026_10_10.zip"]
+    for name in names:
+        (tmp_path / name).write_bytes(b"")
+
+    chains = list_backup_chains(str(tmp_path))
+
+    assert [[name for _, name in chain] for chain in chains] == [
+        ["backup_2026_10_01.zip", "backup_2026_10_02_020000_incr.zip"],
+        ["backup_2026_10_08.zip", "backup_2026_10_09_020000_incr.zip"]]